@@ -0,0 +1,90 @@
+"""
+Comparaison de débit : appel Groq bloquant vs moteur asynchrone
+
+Simule une complétion de LATENCY secondes et lance CONCURRENCY requêtes
+simultanées dans une même event loop (= un worker uvicorn).
+
+Usage : python bench/bench_async_engine.py [--requests 64] [--concurrency 32] [--latency 1.0]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services.llm_engine import LLMEngine  # noqa: E402
+
+
+def _fake_completion():
+    message = SimpleNamespace(content='{"severity": "moderate"}')
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+class BlockingClient:
+    """Équivalent du client Groq synchrone : bloque le thread appelant."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        time.sleep(self.latency)
+        return _fake_completion()
+
+
+class AsyncClient:
+    """Équivalent d'AsyncGroq : rend la main à l'event loop pendant l'attente."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        await asyncio.sleep(self.latency)
+        return _fake_completion()
+
+    async def close(self):
+        pass
+
+
+async def run_blocking(n, latency):
+    client = BlockingClient(latency)
+
+    async def handler():
+        # Ce que faisait main.py : un appel synchrone dans un `async def`
+        return client.chat.completions.create(model="x", messages=[])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(handler() for _ in range(n)))
+    return time.perf_counter() - start
+
+
+async def run_async(n, latency, concurrency):
+    engine = LLMEngine(api_key="bench", max_concurrency=concurrency, client=AsyncClient(latency))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(engine.complete(model="x", messages=[]) for _ in range(n)))
+    return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=1.0)
+    args = parser.parse_args()
+
+    blocking = await run_blocking(args.requests, args.latency)
+    non_blocking = await run_async(args.requests, args.latency, args.concurrency)
+
+    print(f"Requêtes: {args.requests}  latence simulée: {args.latency}s  concurrence: {args.concurrency}")
+    print(f"  Bloquant (Groq sync)   : {blocking:7.2f}s  -> {args.requests / blocking:7.2f} req/s")
+    print(f"  Asynchrone (AsyncGroq) : {non_blocking:7.2f}s  -> {args.requests / non_blocking:7.2f} req/s")
+    print(f"  Gain                   : x{blocking / non_blocking:.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,96 @@
+"""
+Index spatial des centres de santé vs parcours complet
+
+Génère N centres de santé aléatoires sur le Mali, vérifie que l'index
+(grille + NumPy) renvoie les mêmes k plus proches qu'un parcours complet
+(Haversine sur chaque ligne puis tri, comme getRecommendedHealthCenters côté
+Node) et compare la latence par requête.
+
+Usage : python bench/bench_geo_index.py [--centers 5000] [--queries 2000] [--k 3]
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services.geo_index import FACILITY_TIERS, GeoIndex, infer_facility_type  # noqa: E402
+
+NAMES = ["CSCOM de {}", "CSRéf {}", "Hôpital de {}", "Clinique {}", "Pharmacie {}", "Cabinet médical {}", "Dispensaire de {}"]
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    d_lat = math.radians(lat2 - lat1)
+    d_lon = math.radians(lon2 - lon1)
+    a = math.sin(d_lat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(d_lon / 2) ** 2
+    return 6371 * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def brute_force(centers, lat, lon, k, accepted):
+    rows = [
+        (haversine_km(lat, lon, c["latitude"], c["longitude"]), i)
+        for i, c in enumerate(centers)
+        if accepted is None or infer_facility_type(c["name"]) in accepted
+    ]
+    rows.sort()
+    return [i for _, i in rows[:k]]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--centers", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # Mali : ~10°N-25°N, 12°W-4°E ; la moitié des centres autour de Bamako
+    centers = []
+    for i in range(args.centers):
+        if i % 2:
+            lat, lon = rng.gauss(12.64, 0.15), rng.gauss(-8.0, 0.15)
+        else:
+            lat, lon = rng.uniform(10.2, 24.5), rng.uniform(-12.0, 4.0)
+        centers.append({"id": i, "name": rng.choice(NAMES).format(i), "latitude": lat, "longitude": lon})
+    queries = [
+        (rng.gauss(12.64, 0.2), rng.gauss(-8.0, 0.2)) if q % 2 else (rng.uniform(10.2, 24.5), rng.uniform(-12.0, 4.0))
+        for q in range(args.queries)
+    ]
+    types = [None, "URGENCES", "CENTRE_SANTE", "PHARMACIE"]
+
+    start = time.perf_counter()
+    index = GeoIndex(centers)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    mismatches = 0
+    for q, (lat, lon) in enumerate(queries[:200]):
+        accepted = FACILITY_TIERS[types[q % len(types)]][0] if types[q % len(types)] else None
+        expected = brute_force(centers, lat, lon, args.k, accepted)
+        got = [i for i, _ in index.nearest(lat, lon, args.k, accepted)]
+        if got != expected:
+            mismatches += 1
+
+    start = time.perf_counter()
+    for q, (lat, lon) in enumerate(queries):
+        index.nearest(lat, lon, args.k, FACILITY_TIERS[types[q % len(types)]][0] if types[q % len(types)] else None)
+    index_us = (time.perf_counter() - start) / len(queries) * 1e6
+
+    scan_queries = queries[: max(1, args.queries // 20)]
+    start = time.perf_counter()
+    for q, (lat, lon) in enumerate(scan_queries):
+        brute_force(centers, lat, lon, args.k, None)
+    scan_us = (time.perf_counter() - start) / len(scan_queries) * 1e6
+
+    print(f"{args.centers} centres, {index.cell_count} cellules, construction {build_ms:.1f} ms")
+    print(f"Exactitude vs parcours complet : {200 - mismatches}/200")
+    print(f"Parcours complet (Haversine + tri) : {scan_us:10.1f} µs/requête")
+    print(f"Index spatial                      : {index_us:10.1f} µs/requête  (x{scan_us / index_us:.0f})")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
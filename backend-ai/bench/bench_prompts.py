@@ -0,0 +1,141 @@
+"""
+Comparaison des variantes de prompt (full vs compact)
+
+Hors ligne : tokens estimés par requête (préfixe statique + texte du patient)
+et coût de construction des messages. Avec --live : chaque cas du corpus est
+envoyé à Groq (ou au faux serveur via GROQ_BASE_URL) avec chaque variante ;
+latence, tokens facturés (usage) et accord avec la variante de référence
+(triage : gravité et structure ; assistant : premier diagnostic, red flags).
+
+Usage : python bench/bench_prompts.py [--kind triage|medical_assistant] [--variants full,compact]
+                                      [--live] [--model llama-3.1-8b-instant]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services.prompts import get_prompt  # noqa: E402
+from services.structured_output import JSON_MODE, AssistantOutput, TriageOutput, loads_object  # noqa: E402
+from services.triage_cache import fold_accents  # noqa: E402
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "prompt_corpus.json")
+
+
+def _fields(kind, case):
+    if kind == "triage":
+        return {"symptoms": case["symptoms"]}
+    return {
+        "symptoms": case["symptoms"],
+        "patient_info": case.get("patient_info") or "Non renseigné",
+        "medical_history": case.get("medical_history") or "Non renseigné",
+        "current_findings": case.get("current_findings") or "Non renseigné",
+    }
+
+
+def offline(kind, variants, corpus, iterations):
+    print(f"== {kind} : tokens estimés par requête ==")
+    for variant in variants:
+        template = get_prompt(kind, variant)
+        variable = [template.token_split(template.render(**_fields(kind, case)))[1] for case in corpus]
+        start = time.perf_counter()
+        for _ in range(iterations):
+            for case in corpus:
+                template.render(**_fields(kind, case))
+        render_us = (time.perf_counter() - start) / (iterations * len(corpus)) * 1e6
+        print(
+            f"{variant:<8} statique={template.static_tokens:>5}  variable~{statistics.mean(variable):>5.0f}  "
+            f"total~{template.static_tokens + statistics.mean(variable):>5.0f}  rendu={render_us:.1f} µs"
+        )
+
+
+def _signature(kind, result):
+    """Éléments comparés entre variantes."""
+    if kind == "triage":
+        validated = TriageOutput.model_validate(result)
+        return {"severity": validated.severity, "facility": validated.recommended_facility_type}
+    validated = AssistantOutput.model_validate(result)
+    return {
+        "top_diagnosis": fold_accents(validated.differential_diagnosis[0]).split("(")[0].strip(),
+        "red_flags": bool(validated.red_flags),
+    }
+
+
+async def live(kind, variants, corpus, model):
+    from groq import AsyncGroq
+
+    client = AsyncGroq(api_key=os.getenv("GROQ_API_KEY", "stub"), base_url=os.getenv("GROQ_BASE_URL") or None)
+    max_tokens = 600 if kind == "triage" else 1200
+    runs = {variant: [] for variant in variants}
+    try:
+        for case in corpus:
+            for variant in variants:
+                template = get_prompt(kind, variant)
+                start = time.perf_counter()
+                completion = await client.chat.completions.create(
+                    model=model,
+                    messages=template.render(**_fields(kind, case)),
+                    temperature=0.2,
+                    max_tokens=max_tokens,
+                    response_format=JSON_MODE,
+                )
+                latency = time.perf_counter() - start
+                try:
+                    signature = _signature(kind, loads_object(completion.choices[0].message.content)[0])
+                except ValueError:
+                    signature = None
+                usage = completion.usage
+                runs[variant].append({
+                    "latency": latency,
+                    "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+                    "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+                    "signature": signature,
+                })
+    finally:
+        await client.close()
+
+    reference = runs[variants[0]]
+    print(f"== {kind} : appels réels ({model}, {len(corpus)} cas, référence {variants[0]}) ==")
+    for variant in variants:
+        rows = runs[variant]
+        latencies = sorted(r["latency"] for r in rows)
+        agreement = {}
+        for key in (reference[0]["signature"] or {}):
+            same = sum(
+                1 for r, ref in zip(rows, reference)
+                if r["signature"] and ref["signature"] and r["signature"][key] == ref["signature"][key]
+            )
+            agreement[key] = f"{same / len(rows):.0%}"
+        print(
+            f"{variant:<8} p50={latencies[len(latencies) // 2] * 1000:.0f}ms  "
+            f"prompt={statistics.mean(r['prompt_tokens'] for r in rows):.0f} tok  "
+            f"completion={statistics.mean(r['completion_tokens'] for r in rows):.0f} tok  "
+            f"JSON invalide={sum(1 for r in rows if r['signature'] is None)}  accord={json.dumps(agreement)}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--kind", default="triage", choices=["triage", "medical_assistant"])
+    parser.add_argument("--variants", default="full,compact", help="la première sert de référence")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--live", action="store_true", help="appels Groq réels (GROQ_API_KEY, GROQ_BASE_URL)")
+    parser.add_argument("--model", default=os.getenv("GROQ_MODEL_SMALL", "llama-3.1-8b-instant"))
+    args = parser.parse_args()
+
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        corpus = json.load(f)
+    variants = [v.strip() for v in args.variants.split(",") if v.strip()]
+
+    offline(args.kind, variants, corpus, args.iterations)
+    if args.live:
+        asyncio.run(live(args.kind, variants, corpus, args.model))
+
+
+if __name__ == "__main__":
+    main()
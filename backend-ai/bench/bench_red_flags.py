@@ -0,0 +1,66 @@
+"""
+Corpus et latence du détecteur local d'urgences vitales
+
+Vérifie chaque phrase du corpus (règles attendues vs détectées), puis que
+des textes aux mêmes mots mais de sens opposé n'ont pas la même clé de cache
+de triage (sinon un triage bénin en cache masquerait une urgence), et mesure
+la latence moyenne par appel de match_red_flags.
+
+Usage : python bench/bench_red_flags.py [--iterations 2000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services.red_flags import match_red_flags  # noqa: E402
+from services.triage_cache import normalize_symptoms  # noqa: E402
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "red_flags_corpus.json")
+
+# (texte bénin, texte urgent) : mêmes mots, portée de la négation différente
+CACHE_KEY_PAIRS = [
+    ("Pas de convulsions, beaucoup de fièvre", "Convulsions, pas beaucoup de fièvre"),
+    ("Fièvre, pas de douleur thoracique ni essoufflement", "Douleur thoracique et essoufflement, pas de fièvre"),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        corpus = json.load(f)
+
+    failures = 0
+    for case in corpus:
+        detected = [rule.rule_id for rule in match_red_flags(case["text"])]
+        if detected != case["expected"]:
+            failures += 1
+            print(f"❌ {case['text']!r}: attendu {case['expected']}, obtenu {detected}")
+    print(f"Corpus : {len(corpus) - failures}/{len(corpus)} cas conformes")
+
+    for benign, urgent in CACHE_KEY_PAIRS:
+        if match_red_flags(benign) or not match_red_flags(urgent) or normalize_symptoms(benign) == normalize_symptoms(urgent):
+            failures += 1
+            print(f"❌ clé de cache partagée ou détection inattendue : {benign!r} / {urgent!r}")
+    print(f"Clés de cache : {len(CACHE_KEY_PAIRS)} paires vérifiées")
+
+    texts = [case["text"] for case in corpus]
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        for text in texts:
+            match_red_flags(text)
+    elapsed = time.perf_counter() - start
+    calls = args.iterations * len(texts)
+    print(f"Latence moyenne : {elapsed / calls * 1e6:.1f} µs/appel ({calls} appels)")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Coalescence singleflight : scénarios d'annulation et surcoût
+
+Vérifie que :
+- l'annulation du premier appelant (client déconnecté) laisse les suiveurs
+  recevoir le résultat, sans second appel amont ;
+- l'annulation d'un suiveur n'affecte pas les autres appelants ;
+- quand tous les appelants sont annulés, l'appel amont l'est aussi ;
+- une erreur amont est transmise à chaque appelant ;
+puis mesure le surcoût par appel quand N requêtes identiques arrivent ensemble.
+
+Usage : python bench/bench_singleflight.py [--callers 64] [--rounds 200]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services.singleflight import SingleFlight  # noqa: E402
+
+
+class Upstream:
+    """Faux appel amont : compte les appels, les annulations, et attend `delay` s."""
+
+    def __init__(self, delay=0.05, error=None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.cancelled = 0
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error is not None:
+            raise self.error
+        return {"severity": "moderate", "recommendations": ["Repos"]}
+
+
+async def leader_cancelled():
+    flight, upstream = SingleFlight(), Upstream()
+    leader = asyncio.create_task(flight.do("k", upstream))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flight.do("k", upstream))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+    result = await follower
+    assert leader.cancelled(), "le premier appelant devait être annulé"
+    assert result["severity"] == "moderate", result
+    assert upstream.calls == 1 and upstream.cancelled == 0, vars(upstream)
+
+
+async def follower_cancelled():
+    flight, upstream = SingleFlight(), Upstream()
+    leader = asyncio.create_task(flight.do("k", upstream))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flight.do("k", upstream))
+    await asyncio.sleep(0.01)
+    follower.cancel()
+    result = await leader
+    assert follower.cancelled() and result["severity"] == "moderate"
+    assert upstream.calls == 1 and upstream.cancelled == 0, vars(upstream)
+
+
+async def everyone_cancelled():
+    flight, upstream = SingleFlight(), Upstream()
+    callers = [asyncio.create_task(flight.do("k", upstream)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    for caller in callers:
+        caller.cancel()
+    await asyncio.gather(*callers, return_exceptions=True)
+    await asyncio.sleep(0)
+    assert upstream.cancelled == 1, vars(upstream)
+    assert flight.stats()["in_flight"] == 0 and flight.abandoned == 1
+    # Nouvel appel après abandon : nouvel appel amont, pas la tâche annulée
+    result = await flight.do("k", upstream)
+    assert result["severity"] == "moderate" and upstream.calls == 2
+
+
+async def error_shared():
+    flight, upstream = SingleFlight(), Upstream(error=ConnectionError("groq down"))
+    results = await asyncio.gather(*(flight.do("k", upstream) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(r, ConnectionError) for r in results), results
+    assert upstream.calls == 1
+
+
+async def copies_isolated():
+    flight, upstream = SingleFlight(), Upstream()
+    first, second = await asyncio.gather(flight.do("k", upstream), flight.do("k", upstream))
+    first["recommendations"].append("modifié")
+    assert second["recommendations"] == ["Repos"], second
+
+
+SCENARIOS = [leader_cancelled, follower_cancelled, everyone_cancelled, error_shared, copies_isolated]
+
+
+async def overhead(callers, rounds):
+    flight, upstream = SingleFlight(), Upstream(delay=0)
+    start = time.perf_counter()
+    for round_ in range(rounds):
+        await asyncio.gather(*(flight.do(str(round_), upstream) for _ in range(callers)))
+    elapsed = time.perf_counter() - start
+    print(
+        f"Surcoût : {elapsed / (callers * rounds) * 1e6:.1f} µs/appel "
+        f"({callers} appelants x {rounds} tours, {upstream.calls} appels amont)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--callers", type=int, default=64)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    failures = 0
+    for scenario in SCENARIOS:
+        try:
+            asyncio.run(scenario())
+        except (AssertionError, asyncio.CancelledError) as e:
+            failures += 1
+            print(f"❌ {scenario.__name__}: {type(e).__name__} {e}")
+        else:
+            print(f"✅ {scenario.__name__}")
+    asyncio.run(overhead(args.callers, args.rounds))
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
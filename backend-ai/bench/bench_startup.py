@@ -0,0 +1,179 @@
+"""
+Démarrage à froid et mode multi-workers
+
+Mesure, sur des processus réels :
+- l'import de main.py (python -c "import main") ;
+- le lancement en production préforké (APP_ENV=production, python main.py) :
+  délai jusqu'au premier 200 sur /health, `ready_ms` de chaque worker (depuis
+  le fork), délai de relance d'un worker tué, durée de l'arrêt (SIGTERM) ;
+- la référence `uvicorn --workers N`, où chaque worker réimporte l'application.
+
+Groq n'est pas contacté (GROQ_BASE_URL pointe vers un port fermé) et les index
+locaux sont désactivés : seul le coût de démarrage du service est mesuré.
+
+Usage : python bench/bench_startup.py [--workers 4] [--imports 5] [--port 8790]
+"""
+import argparse
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def _env(workers):
+    env = dict(os.environ)
+    env.setdefault("GROQ_API_KEY", "gsk_bench")
+    env.update(
+        GROQ_BASE_URL="http://127.0.0.1:9",
+        GEO_INDEX="0",
+        DOCTOR_INDEX="0",
+        JOB_STORE_PATH=os.path.join(tempfile.mkdtemp(), "jobs.sqlite3"),
+        LOG_LEVEL="WARNING",
+        APP_ENV="production",
+        WEB_CONCURRENCY=str(workers),
+    )
+    return env
+
+
+def _free_port(port):
+    with socket.socket() as s:
+        return s.connect_ex(("127.0.0.1", port)) != 0
+
+
+def bench_import(runs):
+    walls, imports = [], []
+    code = "import main; print(main.STARTUP['import_ms'])"
+    for _ in range(runs):
+        start = time.perf_counter()
+        out = subprocess.run(
+            [sys.executable, "-c", code], cwd=BACKEND_DIR, env=_env(1), capture_output=True, text=True, check=True
+        )
+        walls.append((time.perf_counter() - start) * 1000)
+        imports.append(float(out.stdout.strip().splitlines()[-1]))
+    print("== Import de main.py ==")
+    print(f"processus complet : médiane {statistics.median(walls):.0f} ms  (interpréteur + import + sortie)")
+    print(f"import du module  : médiane {statistics.median(imports):.0f} ms")
+
+
+def _wait_healthy(url, timeout_s=30.0):
+    deadline = time.perf_counter() + timeout_s
+    while time.perf_counter() < deadline:
+        try:
+            if httpx.get(f"{url}/health", timeout=0.5).status_code == 200:
+                return True
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.005)
+    return False
+
+
+def _workers_seen(url, expected, timeout_s=10.0):
+    """pid -> section startup ; une connexion par requête pour toucher chaque worker."""
+    seen = {}
+    deadline = time.perf_counter() + timeout_s
+    while len(seen) < expected and time.perf_counter() < deadline:
+        startup = httpx.get(f"{url}/api/ai/stats", timeout=2).json()["startup"]
+        seen[startup.get("pid")] = startup
+    return seen
+
+
+def _stop(proc):
+    start = time.perf_counter()
+    proc.send_signal(signal.SIGTERM)
+    try:
+        code = proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        code = proc.wait()
+    return (time.perf_counter() - start) * 1000, code
+
+
+def bench_prefork(workers, port):
+    url = f"http://127.0.0.1:{port}"
+    env = _env(workers)
+    env["PORT"] = str(port)
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "main.py"], cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        if not _wait_healthy(url):
+            print("❌ le service n'a pas démarré")
+            return
+        first_ok = (time.perf_counter() - start) * 1000
+        seen = _workers_seen(url, workers)
+        ready = sorted(s["ready_ms"] for s in seen.values())
+        print(f"== Production préforkée ({workers} workers) ==")
+        print(f"premier 200 sur /health : {first_ok:.0f} ms après le lancement")
+        print(f"import dans le parent   : {next(iter(seen.values()))['import_ms']:.0f} ms (une seule fois)")
+        print(f"worker prêt après fork  : {', '.join(f'{r:.1f}' for r in ready)} ms  ({len(seen)}/{workers} vus)")
+
+        victim = next(iter(seen))
+        killed_at = time.perf_counter()
+        os.kill(victim, signal.SIGKILL)
+        replacement = None
+        while replacement is None and time.perf_counter() - killed_at < 10:
+            startup = httpx.get(f"{url}/api/ai/stats", timeout=2).json()["startup"]
+            if startup["pid"] not in seen:
+                replacement = startup
+        if replacement:
+            # Le délai avant d'être servi dépend surtout du worker qui gagne l'accept() : ready_ms fait foi
+            print(
+                f"worker tué -> relancé  : prêt {replacement['ready_ms']:.1f} ms après son fork "
+                f"(vu {(time.perf_counter() - killed_at) * 1000:.0f} ms après le SIGKILL)"
+            )
+    finally:
+        stop_ms, code = _stop(proc)
+        print(f"arrêt (SIGTERM)         : {stop_ms:.0f} ms, code de sortie {code}")
+
+
+def bench_uvicorn_workers(workers, port):
+    url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=_env(workers),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        if not _wait_healthy(url):
+            print("❌ uvicorn n'a pas démarré")
+            return
+        first_ok = (time.perf_counter() - start) * 1000
+        seen = _workers_seen(url, workers)
+        ready = sorted(s["ready_ms"] for s in seen.values())
+        print(f"== Référence : uvicorn --workers {workers} (réimport par worker) ==")
+        print(f"premier 200 sur /health : {first_ok:.0f} ms après le lancement")
+        print(f"worker prêt (import compris) : {', '.join(f'{r:.0f}' for r in ready)} ms")
+    finally:
+        _stop(proc)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--imports", type=int, default=5, help="nombre d'imports mesurés")
+    parser.add_argument("--port", type=int, default=8790)
+    args = parser.parse_args()
+    if not _free_port(args.port) or not _free_port(args.port + 1):
+        sys.exit(f"Ports {args.port}/{args.port + 1} occupés")
+
+    bench_import(args.imports)
+    print()
+    bench_prefork(args.workers, args.port)
+    print()
+    bench_uvicorn_workers(args.workers, args.port + 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Faux serveur Groq (API compatible OpenAI) pour les tests de charge
+
+Sert /openai/v1/chat/completions (JSON et streaming SSE), /openai/v1/models et
+/openai/v1/audio/transcriptions (texte fixe).
+Latence réglable : délai fixe avant le premier token (+ gigue) puis débit en
+tokens/s. Injection de 429 (avec Retry-After) et de JSON tronqué selon des
+probabilités (en mode JSON, réponse 400 json_validate_failed comme Groq).
+Le contenu renvoyé suit le schéma attendu par main.py (triage ou assistant
+médical, déduit du prompt système).
+
+Usage : python bench/groq_stub.py [--port 18001] [--latency 0.3] [--token-rate 500]
+                                  [--rate-429 0.0] [--malformed 0.0]
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+
+from fastapi import FastAPI, File, Form, Request, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
+
+TRIAGE_CONTENT = {
+    "severity": "low",
+    "diagnosis": "Rhume probable, sans signe de gravité.",
+    "recommendations": ["Boire beaucoup d'eau", "Se reposer", "Consulter si la fièvre dure plus de 3 jours"],
+    "specialties": ["Médecine générale"],
+    "urgency_level": 1,
+    "recommended_facility_type": "CENTRE_SANTE",
+    "facility_reason": "Consultation simple au centre de santé",
+}
+
+ASSISTANT_CONTENT = {
+    "differential_diagnosis": ["Infection virale des voies respiratoires hautes", "Rhinite allergique"],
+    "recommended_tests": ["Examen clinique", "Température"],
+    "treatment_suggestions": ["Paracétamol si fièvre", "Hydratation"],
+    "red_flags": ["Difficulté respiratoire"],
+    "precautions": ["Surveiller la température"],
+    "follow_up": "Réévaluation à 72h si persistance",
+    "confidence_level": "élevé",
+    "explanation": "Tableau typique d'une infection virale bénigne.",
+}
+
+
+class StubConfig:
+    def __init__(self, latency_s=0.3, jitter=0.2, token_rate=500.0, rate_429=0.0, retry_after_s=1.0, malformed=0.0, seed=None):
+        self.latency_s = latency_s
+        self.jitter = jitter
+        self.token_rate = token_rate
+        self.rate_429 = rate_429
+        self.retry_after_s = retry_after_s
+        self.malformed = malformed
+        self.random = random.Random(seed)
+
+
+def _approx_tokens(text: str) -> int:
+    return max(1, math.ceil(len(text) / 4))
+
+
+def _pick_content(messages, config: StubConfig) -> str:
+    system = next((m.get("content") or "" for m in messages if m.get("role") == "system"), "")
+    payload = TRIAGE_CONTENT if "triage" in system.lower() else ASSISTANT_CONTENT
+    content = json.dumps(payload, ensure_ascii=False)
+    if config.random.random() < config.malformed:
+        # Sortie coupée en plein milieu (max_tokens atteint, hallucination de format...)
+        content = content[: len(content) // 2]
+    return content
+
+
+def create_app(config: StubConfig) -> FastAPI:
+    app = FastAPI(title="Groq stub")
+    counters = {"requests": 0, "streams": 0, "rate_limited_429": 0, "malformed": 0, "models": 0, "transcriptions": 0}
+
+    def _first_token_delay() -> float:
+        return max(0.0, config.latency_s * (1 + config.random.uniform(-config.jitter, config.jitter)))
+
+    @app.get("/openai/v1/models")
+    async def models():
+        counters["models"] += 1
+        return {"object": "list", "data": [{"id": "llama-3.3-70b-versatile", "object": "model", "created": 0, "owned_by": "stub"}]}
+
+    @app.post("/openai/v1/audio/transcriptions")
+    async def transcriptions(file: UploadFile = File(...), model: str = Form("whisper-large-v3-turbo")):
+        counters["transcriptions"] += 1
+        audio = await file.read()
+        await asyncio.sleep(_first_token_delay())
+        return {"text": f"J'ai de la fièvre depuis deux jours ({file.filename}, {len(audio)} octets)."}
+
+    @app.get("/stub/stats")
+    async def stats():
+        return counters
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        counters["requests"] += 1
+        if config.random.random() < config.rate_429:
+            counters["rate_limited_429"] += 1
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached (stub)", "type": "requests", "code": "rate_limit_exceeded"}},
+                status_code=429,
+                headers={"retry-after": str(config.retry_after_s)},
+            )
+
+        messages = body.get("messages") or []
+        model = body.get("model", "stub")
+        content = _pick_content(messages, config)
+        if not content.endswith("}"):
+            counters["malformed"] += 1
+        prompt_tokens = sum(_approx_tokens(m.get("content") or "") for m in messages)
+        completion_tokens = _approx_tokens(content)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        token_delay = 1.0 / config.token_rate if config.token_rate > 0 else 0.0
+
+        if body.get("stream"):
+            counters["streams"] += 1
+
+            async def chunks():
+                await asyncio.sleep(_first_token_delay())
+                for i in range(0, len(content), 4):
+                    delta = {"role": "assistant", "content": content[i:i + 4]} if i == 0 else {"content": content[i:i + 4]}
+                    chunk = {
+                        "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                        "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+                    }
+                    yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                    if token_delay:
+                        await asyncio.sleep(token_delay)
+                final = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                }
+                yield f"data: {json.dumps(final)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(chunks(), media_type="text/event-stream")
+
+        await asyncio.sleep(_first_token_delay() + completion_tokens * token_delay)
+        if not content.endswith("}") and (body.get("response_format") or {}).get("type") == "json_object":
+            # Mode JSON : Groq refuse la sortie invalide (400) et la renvoie dans failed_generation
+            return JSONResponse(
+                {"error": {
+                    "message": "Failed to generate JSON. Please adjust your prompt. See 'failed_generation' for more details.",
+                    "type": "invalid_request_error",
+                    "code": "json_validate_failed",
+                    "failed_generation": content,
+                }},
+                status_code=400,
+            )
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    return app
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency", type=float, default=0.3, help="délai avant le premier token (s)")
+    parser.add_argument("--jitter", type=float, default=0.2, help="gigue relative sur la latence (0.2 = ±20%%)")
+    parser.add_argument("--token-rate", type=float, default=500.0, help="tokens générés par seconde (0 = instantané)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="probabilité de répondre 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After des 429 (s)")
+    parser.add_argument("--malformed", type=float, default=0.0, help="probabilité de JSON tronqué")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def config_from_args(args: argparse.Namespace) -> StubConfig:
+    return StubConfig(
+        latency_s=args.latency,
+        jitter=args.jitter,
+        token_rate=args.token_rate,
+        rate_429=args.rate_429,
+        retry_after_s=args.retry_after,
+        malformed=args.malformed,
+        seed=args.seed,
+    )
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18001)
+    add_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
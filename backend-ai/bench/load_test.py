@@ -0,0 +1,381 @@
+"""
+Test de charge hors ligne du Backend IA
+
+Démarre le faux Groq (bench/groq_stub.py), le faux Backend API
+(bench/node_stub.py) puis main.py pointé dessus (GROQ_BASE_URL,
+BACKEND_API_URL), et envoie des requêtes /api/ai/triage et
+/api/ai/medical-assistant à chaque niveau de concurrence demandé.
+
+Pour chaque (endpoint, concurrence) : RPS, latences p50/p95/p99, codes HTTP,
+taux de fallback (réponse de repli au lieu d'une analyse IA) et de rejet
+(503), succès du cache de triage (lus sur /api/ai/stats). Chaque texte porte
+un suffixe propre au lancement et au niveau : sans --repeat, aucun niveau
+n'est servi par le cache rempli par le précédent. Les fallbacks sont reconnus au contenu des réponses pour pouvoir
+comparer des versions qui n'exposent pas /metrics. Résultats en JSON dans
+bench/results/ ; --compare affiche l'écart avec un fichier précédent.
+
+Taille des réponses : un même triage (avec position, donc médecins et centres)
+est demandé complet et compact (?compact=true), sans compression, en gzip et
+en Brotli ; octets décodés et octets reçus sur le réseau, réduction par rapport
+à la réponse complète non compressée. Puis deux interrogations d'une tâche
+terminée, la seconde avec If-None-Match (304 attendu).
+
+Usage : python bench/load_test.py [--concurrency 1,8,32] [--requests 200]
+                                  [--endpoints triage,medical-assistant]
+                                  [--latency 0.3] [--rate-429 0.05] [--malformed 0.05]
+                                  [--compact]
+                                  [--compare bench/results/avant.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from groq_stub import add_arguments as add_stub_arguments  # noqa: E402
+
+SYMPTOMS = [
+    "J'ai de la fièvre et mal à la tête",
+    "Toux sèche et nez qui coule",
+    "Mal au ventre après les repas",
+    "Diarrhée et fatigue",
+    "Démangeaisons sur les bras",
+    "Mal de dos en bas",
+    "Douleur à l'oreille droite",
+    "Mal de gorge et difficulté à avaler",
+    "Vomissements chez mon enfant",
+    "Brûlures en urinant",
+    "Yeux rouges qui grattent",
+    "Douleurs aux articulations des genoux",
+]
+
+ENDPOINTS = {
+    "triage": "/api/ai/triage",
+    "medical-assistant": "/api/ai/medical-assistant",
+}
+
+
+def _form(endpoint: str, i: int, args: argparse.Namespace, nonce: str) -> dict:
+    # Texte unique par requête (et par lancement / niveau) sauf pour la part --repeat (touche le cache de triage)
+    base = SYMPTOMS[i % len(SYMPTOMS)]
+    unique = random.random() >= args.repeat
+    symptoms = f"{base} depuis {i} jours ({nonce})" if unique else base
+    data = {"symptoms": symptoms}
+    if endpoint == "triage" and args.with_location:
+        data.update({"latitude": "12.65", "longitude": "-7.99"})
+    if endpoint == "medical-assistant":
+        data["patient_info"] = "Adulte, 35 ans"
+    return data
+
+
+def classify(endpoint: str, status: int, body: dict) -> str:
+    """ok / rejected (503) / error (HTTP) / fallback_parse / fallback_upstream."""
+    if status == 503:
+        return "rejected"
+    if status != 200:
+        return "error"
+    if endpoint == "triage":
+        diagnosis = body.get("diagnosis", "")
+        if diagnosis.startswith("Service IA temporairement indisponible"):
+            return "fallback_upstream"
+        if diagnosis.startswith("L'IA n'a pas pu analyser"):
+            return "fallback_parse"
+    else:
+        if body.get("confidence_label") == "Service indisponible":
+            return "fallback_upstream"
+        if body.get("explanation") == "Erreur lors de l'analyse IA":
+            return "fallback_parse"
+    return "ok"
+
+
+def _percentile(ordered, p):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+async def _cache_counts(client: httpx.AsyncClient) -> Optional[dict]:
+    """Compteurs du cache de triage du Backend IA (None si /api/ai/stats ne les expose pas)."""
+    try:
+        cache = (await client.get("/api/ai/stats")).json().get("triage_cache") or {}
+    except (httpx.HTTPError, ValueError):
+        return None
+    if "hits" not in cache:
+        return None
+    return {"hits": cache["hits"] + cache.get("shared_hits", 0), "misses": cache["misses"] - cache.get("shared_hits", 0)}
+
+
+async def run_level(client: httpx.AsyncClient, endpoint: str, concurrency: int, total: int, args, run_id: str) -> dict:
+    path = ENDPOINTS[endpoint]
+    nonce = f"r{run_id}-c{concurrency}"
+    cache_before = await _cache_counts(client)
+    if endpoint == "triage" and args.compact:
+        path += "?compact=true"
+    latencies = []
+    outcomes = {}
+    statuses = {}
+    counter = iter(range(total))
+
+    async def worker():
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                response = await client.post(path, data=_form(endpoint, i, args, nonce))
+                status = response.status_code
+                try:
+                    body = response.json()
+                except ValueError:
+                    body = {}
+            except httpx.HTTPError:
+                status, body = 0, {}
+            latencies.append(time.perf_counter() - start)
+            outcome = classify(endpoint, status, body)
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - start
+    cache_after = await _cache_counts(client)
+    cache = None
+    if cache_before is not None and cache_after is not None:
+        cache = {key: cache_after[key] - cache_before[key] for key in ("hits", "misses")}
+
+    ordered = sorted(latencies)
+    fallbacks = outcomes.get("fallback_parse", 0) + outcomes.get("fallback_upstream", 0)
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": total,
+        "duration_s": round(duration, 3),
+        "rps": round(total / duration, 2) if duration else 0.0,
+        "latency_ms": {
+            "mean": round(1000 * sum(ordered) / len(ordered), 1) if ordered else 0.0,
+            "p50": round(1000 * _percentile(ordered, 0.50), 1),
+            "p95": round(1000 * _percentile(ordered, 0.95), 1),
+            "p99": round(1000 * _percentile(ordered, 0.99), 1),
+            "max": round(1000 * ordered[-1], 1) if ordered else 0.0,
+        },
+        "status_codes": statuses,
+        "outcomes": outcomes,
+        "fallback_rate": round(fallbacks / total, 4) if total else 0.0,
+        "rejected_rate": round(outcomes.get("rejected", 0) / total, 4) if total else 0.0,
+        "triage_cache": cache,
+    }
+
+
+PAYLOAD_ENCODINGS = ("identity", "gzip", "br")
+
+
+async def measure_payloads(client: httpx.AsyncClient) -> dict:
+    """Octets d'une même réponse de triage selon le mode (complet / compact) et l'encodage."""
+    form = {"symptoms": SYMPTOMS[0], "latitude": "12.65", "longitude": "-7.99"}
+    # Premier appel : remplit le cache de triage, les suivants renvoient le même résultat
+    await client.post(ENDPOINTS["triage"], data=form)
+    rows = []
+    for mode, path in (("complet", ENDPOINTS["triage"]), ("compact", ENDPOINTS["triage"] + "?compact=true")):
+        for encoding in PAYLOAD_ENCODINGS:
+            response = await client.post(path, data=form, headers={"Accept-Encoding": encoding})
+            rows.append({
+                "mode": mode,
+                "encoding": response.headers.get("content-encoding", "identity"),
+                "requested": encoding,
+                "decoded_bytes": len(response.content),
+                "wire_bytes": response.num_bytes_downloaded,
+            })
+    reference = rows[0]["wire_bytes"] or 1
+    print("\nTaille d'une réponse de triage (avec position) :")
+    print(f"{'mode':<10}{'demandé':<10}{'appliqué':<10}{'décodé':>9}{'réseau':>9}{'réduction':>11}")
+    for row in rows:
+        row["reduction"] = round(1 - row["wire_bytes"] / reference, 4)
+        # Sous COMPRESSION_MIN_BYTES, la réponse part non compressée (appliqué = identity)
+        print(
+            f"{row['mode']:<10}{row['requested']:<10}{row['encoding']:<10}{row['decoded_bytes']:>9}{row['wire_bytes']:>9}"
+            f"{row['reduction']:>11.1%}"
+        )
+
+    poll = {}
+    job = await client.post("/api/ai/medical-assistant/jobs", data={"symptoms": SYMPTOMS[1]})
+    if job.status_code in (200, 202):
+        url = job.json()["poll_url"]
+        first = await client.get(url, params={"wait": 30})
+        again = await client.get(url, headers={"If-None-Match": first.headers.get("etag", "")})
+        poll = {
+            "first_status": first.status_code,
+            "first_wire_bytes": first.num_bytes_downloaded,
+            "repeat_status": again.status_code,
+            "repeat_wire_bytes": again.num_bytes_downloaded,
+        }
+        print(
+            f"tâche interrogée à nouveau : {again.status_code}, {again.num_bytes_downloaded} octets "
+            f"(au lieu de {first.num_bytes_downloaded})"
+        )
+    return {"triage": rows, "job_poll": poll}
+
+
+def _spawn(cmd, env=None, cwd=None):
+    return subprocess.Popen(cmd, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def _wait_ready(url: str, timeout_s: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout_s
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"Service non démarré : {url}")
+
+
+def start_services(args):
+    """Lance les deux stubs et le Backend IA ; retourne (processus, URL du Backend IA)."""
+    groq_url = f"http://127.0.0.1:{args.groq_port}"
+    node_url = f"http://127.0.0.1:{args.node_port}"
+    stub_cmd = [
+        sys.executable, os.path.join(BENCH_DIR, "groq_stub.py"), "--port", str(args.groq_port),
+        "--latency", str(args.latency), "--jitter", str(args.jitter), "--token-rate", str(args.token_rate),
+        "--rate-429", str(args.rate_429), "--retry-after", str(args.retry_after), "--malformed", str(args.malformed),
+    ]
+    if args.seed is not None:
+        stub_cmd += ["--seed", str(args.seed)]
+    env = {
+        **os.environ,
+        "GROQ_API_KEY": "stub-key",
+        "GROQ_BASE_URL": groq_url,
+        "BACKEND_API_URL": node_url,
+        "GROQ_RPM": str(args.rpm),
+        "GROQ_TPM": str(args.tpm),
+        "LOG_LEVEL": "WARNING",
+    }
+    processes = [
+        _spawn(stub_cmd),
+        _spawn([sys.executable, os.path.join(BENCH_DIR, "node_stub.py"), "--port", str(args.node_port), "--latency", str(args.node_latency)]),
+        _spawn(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(args.app_port), "--log-level", "warning"],
+            env=env, cwd=APP_DIR,
+        ),
+    ]
+    return processes, groq_url, f"http://127.0.0.1:{args.app_port}"
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results: dict, baseline_path: str) -> None:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    previous = {(r["endpoint"], r["concurrency"]): r for r in baseline["results"]}
+    print(f"\nComparaison avec {baseline_path} ({baseline['meta'].get('git_commit')})")
+    print(f"{'endpoint':<20}{'conc.':>6}{'RPS':>18}{'p95 ms':>22}{'fallback':>18}")
+    for r in results["results"]:
+        old = previous.get((r["endpoint"], r["concurrency"]))
+        if old is None:
+            continue
+        print(
+            f"{r['endpoint']:<20}{r['concurrency']:>6}"
+            f"{old['rps']:>9} → {r['rps']:<7}"
+            f"{old['latency_ms']['p95']:>11} → {r['latency_ms']['p95']:<9}"
+            f"{old['fallback_rate']:>8} → {r['fallback_rate']:<7}"
+        )
+
+
+async def main_async(args):
+    processes, groq_url, app_url = start_services(args) if not args.target else ([], None, args.target)
+    try:
+        await _wait_ready(f"{app_url}/")
+        # Suffixe des textes : un lancement ne relit pas le cache d'un lancement précédent (--target)
+        run_id = f"{random.getrandbits(32):08x}"
+        results = []
+        limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+        async with httpx.AsyncClient(base_url=app_url, timeout=args.timeout, limits=limits) as client:
+            for endpoint in args.endpoints:
+                for n, concurrency in enumerate(args.concurrency):
+                    level = await run_level(client, endpoint, concurrency, args.requests, args, f"{run_id}.{n}")
+                    results.append(level)
+                    lat = level["latency_ms"]
+                    cache = level["triage_cache"]
+                    print(
+                        f"{endpoint:<18} c={concurrency:<4} {level['rps']:>8.1f} req/s  "
+                        f"p50={lat['p50']:.0f}ms p95={lat['p95']:.0f}ms p99={lat['p99']:.0f}ms  "
+                        f"fallback={level['fallback_rate']:.1%} rejet={level['rejected_rate']:.1%}"
+                        + (f"  cache={cache['hits']}/{cache['hits'] + cache['misses']}" if cache else "  cache=n/a")
+                    )
+            payloads = await measure_payloads(client) if "triage" in args.endpoints else None
+            stub_stats = None
+            if groq_url:
+                stub_stats = (await client.get(f"{groq_url}/stub/stats")).json()
+        return {
+            "meta": {
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "git_commit": _git_commit(),
+                "python": platform.python_version(),
+                "target": app_url,
+                "run_id": run_id,
+                "args": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+            },
+            "results": results,
+            "payloads": payloads,
+            "groq_stub": stub_stats,
+        }
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=lambda s: [int(c) for c in s.split(",")], default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="requêtes par niveau de concurrence")
+    parser.add_argument("--endpoints", type=lambda s: s.split(","), default=list(ENDPOINTS))
+    parser.add_argument("--repeat", type=float, default=0.0, help="part des requêtes au texte déjà vu (cache)")
+    parser.add_argument("--with-location", action="store_true", help="triage avec latitude/longitude (enrichissement)")
+    parser.add_argument("--compact", action="store_true", help="triage en mode compact (?compact=true)")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--target", default=None, help="Backend IA déjà lancé (pas de stubs démarrés)")
+    parser.add_argument("--app-port", type=int, default=18000)
+    parser.add_argument("--groq-port", type=int, default=18001)
+    parser.add_argument("--node-port", type=int, default=18002)
+    parser.add_argument("--node-latency", type=float, default=0.02)
+    parser.add_argument("--rpm", type=float, default=0, help="GROQ_RPM du Backend IA (0 = illimité)")
+    parser.add_argument("--tpm", type=float, default=0, help="GROQ_TPM du Backend IA (0 = illimité)")
+    parser.add_argument("--output", default=None, help="fichier JSON (défaut : bench/results/<date>-<commit>.json)")
+    parser.add_argument("--compare", default=None, help="résultats précédents à comparer")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+
+    output = args.output or os.path.join(
+        BENCH_DIR, "results", f"{datetime.now():%Y%m%d-%H%M%S}-{results['meta']['git_commit']}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\nRésultats : {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Faux Backend API (Node) pour les tests de charge
+
+Sert les deux recherches d'enrichissement appelées par BackendClient
+(/api/ai/doctors et /api/ai/health-centers) avec une latence réglable, et
+les exports lus par les index locaux (/api/healthcenters/export,
+/api/ai/doctors/export).
+
+Usage : python bench/node_stub.py [--port 18002] [--latency 0.02]
+"""
+import argparse
+import asyncio
+import random
+from datetime import datetime, timezone
+
+from fastapi import FastAPI
+
+DOCTORS = [
+    {
+        "id": i,
+        "name": f"Dr Stub {i}",
+        "specialty": specialty,
+        "healthCenter": f"Centre de santé {i % 5}",
+        "phone": f"+223 70 00 00 {i:02d}",
+        "doctorPhone": None,
+        "available": True,
+    }
+    for i, specialty in enumerate(
+        ["Médecine générale", "Pédiatrie", "Cardiologie", "Dermatologie", "Gynécologie", "Urgences et traumatologie"] * 3
+    )
+]
+
+HEALTH_CENTERS = [
+    {
+        "id": i,
+        "name": name,
+        "address": f"Quartier {i}, Bamako",
+        "latitude": 12.64 + i * 0.01,
+        "longitude": -8.0 + i * 0.01,
+        "phone": f"+223 20 00 00 {i:02d}",
+    }
+    for i, name in enumerate(
+        ["CSCOM de Banconi", "CSRéf Commune IV", "Hôpital Gabriel Touré", "Hôpital du Point G", "Clinique Pasteur", "CSCOM de Sogoniko"]
+    )
+]
+
+
+def create_app(latency_s: float = 0.02, jitter: float = 0.2) -> FastAPI:
+    app = FastAPI(title="Backend API stub")
+    rng = random.Random()
+
+    async def _delay():
+        await asyncio.sleep(max(0.0, latency_s * (1 + rng.uniform(-jitter, jitter))))
+
+    @app.get("/api/ai/doctors")
+    async def doctors(specialties: str = ""):
+        await _delay()
+        wanted = {s.strip() for s in specialties.split(",") if s.strip()}
+        matching = [d for d in DOCTORS if not wanted or d["specialty"] in wanted]
+        return {"doctors": matching[:5]}
+
+    @app.get("/api/ai/health-centers")
+    async def health_centers(latitude: float = 12.64, longitude: float = -8.0):
+        await _delay()
+        nearest = sorted(HEALTH_CENTERS, key=lambda c: (c["latitude"] - latitude) ** 2 + (c["longitude"] - longitude) ** 2)
+        return {"healthCenters": nearest[:3]}
+
+    @app.get("/api/ai/doctors/export")
+    async def export_doctors(since: str = None):
+        await _delay()
+        return {
+            # Données figées : un export incrémental ne renvoie aucune modification
+            "doctors": [] if since else DOCTORS,
+            "ids": [d["id"] for d in DOCTORS],
+            "incremental": bool(since),
+            "generatedAt": datetime.now(timezone.utc).isoformat(),
+        }
+
+    @app.get("/api/healthcenters/export")
+    async def export_health_centers():
+        await _delay()
+        return {"healthCenters": HEALTH_CENTERS, "count": len(HEALTH_CENTERS)}
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18002)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
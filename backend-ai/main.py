@@ -1,16 +1,193 @@
-from fastapi import FastAPI, Form
+import time
+
+# Début de l'import : mesure du démarrage à froid (section "startup" de /api/ai/stats)
+IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, File, Form, Header, HTTPException, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from groq import Groq
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from contextlib import asynccontextmanager
+import asyncio
+import copy
+import logging
+import math
 import os
-import json
-import requests
-from typing import Optional
+from typing import List, Optional, Tuple
 from dotenv import load_dotenv
+from pydantic import BaseModel, Field
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from services.backend_client import BackendClient
+from services.cascade import ModelCascade
+from services.compression import CompressionMiddleware
+from services.doctor_index import DoctorIndex
+from services.fallback_model import FallbackModel, OutcomeLog
+from services.geo_index import HealthCenterIndex, valid_coordinates
+from services.health_probe import GroqHealthProbe
+from services.http_cache import json_response
+from services.json_stream import JsonFieldStream
+from services.job_queue import (
+    DONE as JOB_DONE,
+    FAILED as JOB_FAILED,
+    IdempotencyConflict,
+    JobFailed,
+    JobQueue,
+    JobQueueFull,
+)
+from services.llm_engine import LLMEngine
+from services.observability import (
+    FALLBACKS,
+    JSON_PARSE_OUTCOMES,
+    PARSE_FAILURES,
+    REGISTRY,
+    REQUEST_DURATION,
+    UPSTREAM_ERRORS,
+    StatsCollector,
+    record_prompt,
+    record_usage,
+    setup_logging,
+    shutdown_logging,
+    stage,
+)
+from services import prefork
+from services.prompts import get_prompt
+from services.rate_limiter import (
+    PRIORITY_ASSISTANT,
+    PRIORITY_BACKGROUND,
+    PRIORITY_TRIAGE,
+    SchedulerOverloaded,
+)
+from services.red_flags import apply_red_flag_floor, match_red_flags, red_flag_result
+from services.shared_state import SharedState
+from services.singleflight import SingleFlight, fingerprint
+from services.structured_output import (
+    ASSISTANT_REQUIRED,
+    JSON_MODE,
+    TRIAGE_REQUIRED,
+    AssistantOutput,
+    TriageOutput,
+    dumps,
+    failed_generation,
+    loads_object,
+)
+from services.transcription import AudioTooLong, Transcriber
+from services.triage_cache import SharedTriageCache, TTLCache, normalize_symptoms
 
 # Charger les variables d'environnement depuis .env
 load_dotenv()
 
-app = FastAPI(title="Santé Kènè AI - Groq")
+# Logs structurés écrits par un thread dédié (LOG_LEVEL, LOG_FORMAT)
+setup_logging()
+logger = logging.getLogger("santekene.ai")
+
+# Configuration Groq (ULTRA-RAPIDE)
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+if not GROQ_API_KEY:
+    raise ValueError("⚠️  GROQ_API_KEY manquante ! Ajoutez-la dans le fichier .env")
+
+# Lancement : development (un processus, rechargement) ou production (WEB_CONCURRENCY workers préforkés)
+APP_ENV = os.getenv("APP_ENV", "development")
+WORKERS = max(1, int(os.getenv("WEB_CONCURRENCY") or os.cpu_count() or 1)) if APP_ENV == "production" else 1
+# État partagé entre workers (STATE_BACKEND=memory|redis) : cache de triage, quota Groq, disjoncteur
+shared_state = SharedState.from_env()
+distributed_state = shared_state if shared_state.distributed else None
+
+# Client AsyncGroq partagé (créé au premier appel) : ne bloque plus l'event loop pendant les complétions
+llm = LLMEngine.from_env(GROQ_API_KEY, shared=distributed_state)
+if WORKERS > 1 and distributed_state is None and llm.scheduler is not None:
+    # Sans Redis, chaque worker a sa part du quota ; cache et disjoncteur restent par worker
+    llm.scheduler.share_between(WORKERS)
+    logger.warning("⚠️  Plusieurs workers sans état partagé (STATE_BACKEND=redis recommandé)", extra={"workers": WORKERS})
+# Sonde Groq en arrière-plan : alimente /health et le disjoncteur
+health_probe = GroqHealthProbe.from_env(llm.client, llm.breaker)
+# Client HTTP keep-alive vers le Backend API (médecins, centres de santé)
+backend = BackendClient.from_env()
+# Index spatial local des centres de santé (rechargé depuis le Backend API)
+GEO_INDEX_ENABLED = os.getenv("GEO_INDEX", "1") == "1"
+geo_index = HealthCenterIndex.from_env(backend.export_health_centers)
+# Index local spécialité -> médecins (rechargé de façon incrémentale)
+DOCTOR_INDEX_ENABLED = os.getenv("DOCTOR_INDEX", "1") == "1"
+doctor_index = DoctorIndex.from_env(backend.export_doctors)
+# Cascade 8B -> 70B (MODEL_CASCADE=1)
+cascade = ModelCascade.from_env()
+# Prompts précompilés (PROMPT_VARIANT_TRIAGE, PROMPT_VARIANT_MEDICAL_ASSISTANT)
+TRIAGE_PROMPT = get_prompt("triage")
+ASSISTANT_PROMPT = get_prompt("medical_assistant")
+# Coalescence des complétions identiques en vol
+llm_inflight = SingleFlight()
+# Cache des réponses de triage (symptômes normalisés -> JSON du modèle), L2 partagé entre workers
+triage_cache = SharedTriageCache(
+    TTLCache(
+        max_size=int(os.getenv("TRIAGE_CACHE_SIZE", "1024")),
+        ttl_s=float(os.getenv("TRIAGE_CACHE_TTL_S", "3600")),
+    ),
+    distributed_state,
+)
+# Transcription audio découpée aux silences (Groq Whisper ou TRANSCRIBE_BACKEND=stub)
+transcriber = Transcriber.from_env(llm.client)
+TRANSCRIBE_MAX_BYTES = int(os.getenv("TRANSCRIBE_MAX_BYTES", str(25 * 1024 * 1024)))
+# Classifieur de secours hors ligne (artefact mappé en mémoire) et journal d'entraînement
+FALLBACK_MODEL_PATH = os.getenv("FALLBACK_MODEL_PATH", "models/fallback")
+FALLBACK_MODEL_MIN_CONFIDENCE = float(os.getenv("FALLBACK_MODEL_MIN_CONFIDENCE", "0.6"))
+fallback_model = None
+if os.path.exists(os.path.join(FALLBACK_MODEL_PATH, "meta.json")):
+    try:
+        fallback_model = FallbackModel.load(FALLBACK_MODEL_PATH)
+        logger.info("🧮 Classifieur de secours chargé", extra={"path": FALLBACK_MODEL_PATH, **fallback_model.stats()})
+    except Exception as e:
+        logger.warning("⚠️  Classifieur de secours illisible", extra={"path": FALLBACK_MODEL_PATH, "error": str(e)})
+TRIAGE_OUTCOME_LOG = os.getenv("TRIAGE_OUTCOME_LOG", "")
+TRIAGE_OUTCOME_LOG_ENABLED = bool(TRIAGE_OUTCOME_LOG)
+outcome_log = OutcomeLog(TRIAGE_OUTCOME_LOG)
+# Affiner en arrière-plan (LLM) les triages urgents détectés localement
+RED_FLAG_REFINE = os.getenv("RED_FLAG_REFINE", "1") == "1"
+# Triage par lot : taille maximale et appels LLM simultanés par lot
+TRIAGE_BATCH_MAX_ITEMS = int(os.getenv("TRIAGE_BATCH_MAX_ITEMS", "100"))
+TRIAGE_BATCH_CONCURRENCY = int(os.getenv("TRIAGE_BATCH_CONCURRENCY", "4"))
+# Compression Brotli / gzip des réponses JSON (RESPONSE_COMPRESSION=0 pour la désactiver)
+RESPONSE_COMPRESSION = os.getenv("RESPONSE_COMPRESSION", "1") == "1"
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "512"))
+# Mode tâche : attente maximale d'un long-poll, nouvelles tentatives si la file Groq est saturée
+JOB_MAX_WAIT_S = float(os.getenv("JOB_MAX_WAIT_S", "30"))
+JOB_OVERLOAD_RETRIES = int(os.getenv("JOB_OVERLOAD_RETRIES", "3"))
+_background_tasks = set()
+# Démarrage à froid : import du module, puis prêt = fin du lifespan (depuis le fork pour un worker préforké)
+STARTUP = {
+    "mode": "prefork" if APP_ENV == "production" else "single",
+    "workers": WORKERS,
+    "import_ms": round((time.perf_counter() - IMPORT_STARTED) * 1000, 1),
+    "ready_ms": None,
+}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    health_probe.start()
+    if GEO_INDEX_ENABLED:
+        geo_index.start()
+    if DOCTOR_INDEX_ENABLED:
+        doctor_index.start()
+    await jobs.start()
+    started = prefork.forked_at if prefork.forked_at is not None else IMPORT_STARTED
+    STARTUP.update(
+        worker=prefork.worker_id,
+        pid=os.getpid(),
+        ready_ms=round((time.perf_counter() - started) * 1000, 1),
+    )
+    logger.info("✅ Worker prêt", extra=STARTUP)
+    yield
+    await jobs.stop()
+    await health_probe.stop()
+    await geo_index.stop()
+    await doctor_index.stop()
+    await llm.aclose()
+    await backend.aclose()
+    await shared_state.aclose()
+    shutdown_logging()
+
+
+# Réponses sérialisées par orjson
+app = FastAPI(title="Santé Kènè AI - Groq", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # CORS
 app.add_middleware(
@@ -19,13 +196,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # ETag lisible par le frontend (fetch) pour les requêtes conditionnelles
+    expose_headers=["ETag"],
 )
+if RESPONSE_COMPRESSION:
+    app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_BYTES)
+
+
+@app.middleware("http")
+async def observe_request_duration(request: Request, call_next):
+    """Durée par endpoint (gabarit de route) et code HTTP ; jusqu'aux en-têtes pour le SSE."""
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    endpoint = getattr(route, "path", "unmatched")
+    REQUEST_DURATION.labels(endpoint, str(response.status_code)).observe(time.perf_counter() - start)
+    return response
 
-# Configuration Groq (ULTRA-RAPIDE)
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-if not GROQ_API_KEY:
-    raise ValueError("⚠️  GROQ_API_KEY manquante ! Ajoutez-la dans le fichier .env")
-client = Groq(api_key=GROQ_API_KEY)
 
 @app.get("/")
 async def root():
@@ -36,334 +223,727 @@ async def root():
         "model": "llama-3.3-70b-versatile"
     }
 
+def _collect_stats() -> dict:
+    return {
+        "startup": STARTUP,
+        "shared_state": shared_state.stats(),
+        "triage_cache": triage_cache.stats(),
+        "llm_singleflight": llm_inflight.stats(),
+        "groq_scheduler": llm.scheduler.stats() if llm.scheduler else None,
+        "model_cascade": cascade.stats(),
+        "circuit_breaker": llm.breaker.stats() if llm.breaker else None,
+        "geo_index": geo_index.stats(),
+        "doctor_index": doctor_index.stats(),
+        "jobs": jobs.stats(),
+        "transcription": transcriber.stats(),
+        "fallback_model": fallback_model.stats() if fallback_model else None,
+        "triage_outcome_log": {"enabled": TRIAGE_OUTCOME_LOG_ENABLED, "recorded": outcome_log.recorded},
+        "prompts": {
+            template.kind: {"variant": template.variant, "static_tokens": template.static_tokens}
+            for template in (TRIAGE_PROMPT, ASSISTANT_PROMPT)
+        }
+    }
+
+
+# Les compteurs internes sont aussi exportés en jauges sur /metrics
+REGISTRY.register(StatsCollector(_collect_stats))
+
+
+@app.get("/api/ai/stats")
+async def ai_stats():
+    """Compteurs internes (cache de triage, coalescence LLM, file Groq, cascade, disjoncteur, index géo / médecins, tâches)"""
+    return _collect_stats()
+
+@app.get("/metrics")
+async def metrics():
+    """Métriques Prometheus (latences par étape, fallbacks, erreurs amont, tokens Groq)"""
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
 @app.get("/health")
 async def health_check():
+    """Statut Groq mis en cache par la sonde de fond (aucun appel amont ici)"""
+    return {
+        **health_probe.status,
+        "circuit": llm.breaker.state if llm.breaker else None
+    }
+
+class AIResponseParseError(Exception):
+    """Le modèle a répondu mais son JSON est inexploitable."""
+
+
+def _service_overloaded(e: SchedulerOverloaded) -> HTTPException:
+    """503 immédiat quand la file Groq est saturée (plutôt qu'un 429 en aval)."""
+    logger.warning("⏳ Requête rejetée: file Groq saturée", extra={"reason": str(e)})
+    return HTTPException(
+        status_code=503,
+        detail="Service IA saturé, veuillez réessayer dans quelques instants",
+        headers={"Retry-After": str(max(1, math.ceil(e.retry_after_s)))}
+    )
+
+
+def _parse_json_object(ai_text: str, endpoint: str, required: Tuple[str, ...] = ()) -> dict:
+    """Parse la réponse du modèle (réparée si tronquée) ; lève AIResponseParseError si inexploitable."""
     try:
-        # Test rapide de la clé API
-        print(f"🔍 Test clé API Groq: {GROQ_API_KEY[:20]}...")
-        
-        response = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[{"role": "user", "content": "test"}],
-            max_tokens=10
+        result, repaired = loads_object(ai_text, required)
+    except ValueError as parse_error:
+        PARSE_FAILURES.labels(endpoint).inc()
+        JSON_PARSE_OUTCOMES.labels(endpoint, "unrecoverable").inc()
+        logger.warning(
+            "⚠️  Erreur parsing JSON",
+            extra={"endpoint": endpoint, "error": str(parse_error), "text_preview": ai_text.strip()[:200]}
         )
-        
-        print(f"✅ Groq fonctionne ! Réponse test reçue.")
+        raise AIResponseParseError(str(parse_error)) from parse_error
+    JSON_PARSE_OUTCOMES.labels(endpoint, "repaired" if repaired else "clean").inc()
+    if repaired:
+        logger.info("🩹 JSON tronqué réparé", extra={"endpoint": endpoint, "fields": len(result)})
+    return result
+
+
+async def _complete_and_parse(endpoint: str, required: Tuple[str, ...], **params) -> dict:
+    try:
+        with stage(endpoint, "upstream_completion"):
+            completion = await llm.complete(**params)
+    except Exception as e:
+        UPSTREAM_ERRORS.labels("groq", type(e).__name__).inc()
+        # Mode JSON : Groq rejette (400) une sortie invalide mais la renvoie, on tente de la réparer
+        rejected = failed_generation(e)
+        if rejected is None:
+            raise
+        logger.warning("⚠️  Sortie rejetée par le mode JSON Groq", extra={"endpoint": endpoint, "model": params["model"]})
+        with stage(endpoint, "json_extraction"):
+            return _parse_json_object(rejected, endpoint, required)
+    record_usage(endpoint, params["model"], getattr(completion, "usage", None))
+    logger.info("✅ Réponse Groq reçue", extra={"endpoint": endpoint, "model": params["model"]})
+    with stage(endpoint, "json_extraction"):
+        return _parse_json_object(completion.choices[0].message.content, endpoint, required)
+
+
+async def _complete_json(endpoint: str, required: Tuple[str, ...] = (), **params) -> dict:
+    """
+    Complétion Groq + parsing JSON. Les appels concurrents au prompt identique
+    partagent un seul appel amont (singleflight) et une copie du résultat parsé.
+    `required` : champs qu'une sortie tronquée doit avoir conservés après réparation.
+    """
+    key = fingerprint(**params)
+    return await llm_inflight.do(key, lambda: _complete_and_parse(endpoint, required, **params))
+
+
+def _triage_escalation_reason(result: dict) -> Optional[str]:
+    """Raison de passer au grand modèle pour le triage (None = réponse du 8B conservée)."""
+    severity = result.get("severity")
+    if severity not in ("low", "moderate", "high", "urgent") or not result.get("diagnosis"):
+        return "invalid_schema"
+    if severity in ("high", "urgent") or result.get("urgency_level") in (3, 4):
+        return f"severity_{severity}"
+    return None
+
+
+async def _analyze_symptoms(symptoms: str, priority: int = PRIORITY_TRIAGE) -> dict:
+    """Appel Groq pour le triage : retourne le JSON validé du modèle (sans champs UI)."""
+    with stage("triage", "prompt_build"):
+        messages = TRIAGE_PROMPT.render(symptoms=symptoms)
+    record_prompt("triage", TRIAGE_PROMPT.variant, *TRIAGE_PROMPT.token_split(messages))
+
+    logger.info("🔄 Analyse des symptômes avec Groq...")
+
+    # Appel Groq (ULTRA-RAPIDE), coalescé avec les requêtes identiques en vol
+    async def call(model: str) -> dict:
+        return await _complete_json(
+            "triage",
+            TRIAGE_REQUIRED,
+            model=model,
+            messages=messages,
+            temperature=0.2,
+            max_tokens=600,
+            response_format=JSON_MODE,
+            priority=priority
+        )
+
+    # Cascade : 8B d'abord, 70B si réponse invalide ou grave (si MODEL_CASCADE=1)
+    parsed = await cascade.run("triage", call, _triage_escalation_reason, (AIResponseParseError,))
+    
+    try:
+        with stage("triage", "validation"):
+            # Valeurs par défaut et coercition des types (modèle Pydantic)
+            result = TriageOutput.model_validate(parsed).model_dump()
+    except Exception as validation_error:
+        PARSE_FAILURES.labels("triage").inc()
+        logger.warning("⚠️  Erreur validation JSON", extra={"error": str(validation_error)})
+        raise AIResponseParseError(str(validation_error)) from validation_error
+
+    return result
+
+
+async def _refine_red_flag_triage(symptoms: str, cache_key: str, red_flags: list) -> None:
+    """Affine en arrière-plan un triage urgent local ; le LLM tranche, au moins HIGH."""
+    try:
+        result = await _analyze_symptoms(symptoms, priority=PRIORITY_BACKGROUND)
+        triage_cache.set(cache_key, apply_red_flag_floor(result, red_flags))
+        logger.info("🔁 Triage urgent affiné par le LLM")
+    except Exception as e:
+        logger.warning("⚠️  Affinage du triage urgent impossible", extra={"error": str(e)})
+
+
+def _spawn(coro) -> None:
+    """Lance une tâche de fond en gardant une référence jusqu'à sa fin."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+# Champs d'affichage par niveau de gravité (frontend)
+SEVERITY_DISPLAY = {
+    "urgent": {
+        "label": "🚨 URGENT",
+        "color": "red",
+        "consultation_type": "URGENCE",
+        "consultation_label": "Consulter les urgences immédiatement"
+    },
+    "high": {
+        "label": "⚠️  Élevé",
+        "color": "orange",
+        "consultation_type": "RAPIDE",
+        "consultation_label": "Consultation médicale dans les 24h"
+    },
+    "moderate": {
+        "label": "🟡 Modéré",
+        "color": "yellow",
+        "consultation_type": "STANDARD",
+        "consultation_label": "Consultation sous 2-3 jours"
+    },
+    "low": {
+        "label": "✅ Faible",
+        "color": "green",
+        "consultation_type": "SURVEILLANCE",
+        "consultation_label": "Surveillance et conseils"
+    }
+}
+
+# Libellé français du type de structure recommandé
+FACILITY_LABELS = {
+    "URGENCES": "🚨 Service d'Urgences",
+    "HOPITAL": "🏥 Hôpital/Clinique",
+    "CENTRE_SANTE": "🏥 Centre de Santé",
+    "CABINET": "👨‍⚕️ Cabinet Médical",
+    "PHARMACIE": "💊 Pharmacie"
+}
+
+
+def _add_triage_ui_fields(result: dict) -> dict:
+    """Ajoute les champs d'affichage (libellés, couleurs, résumé) au JSON du modèle."""
+    severity_info = SEVERITY_DISPLAY.get(result["severity"], SEVERITY_DISPLAY["moderate"])
+
+    result["urgency_label"] = severity_info["label"]
+    result["urgency_color"] = severity_info["color"]
+    result["consultation_type"] = severity_info["consultation_type"]
+    result["consultation_type_label"] = severity_info["consultation_label"]
+    result["summary"] = result["diagnosis"]
+    result["precautions"] = result["recommendations"][:2] if len(result["recommendations"]) > 2 else result["recommendations"]
+    result["explanation"] = f"Niveau d'urgence : {severity_info['label']}. {result['facility_reason']}"
+    result["recommended_facility_label"] = FACILITY_LABELS.get(
+        result["recommended_facility_type"],
+        FACILITY_LABELS["CENTRE_SANTE"]
+    )
+    return result
+
+
+# Champs recalculables par le client (à partir de severity, diagnosis, recommendations,
+# facility_reason et recommended_facility_type) : omis en mode compact
+TRIAGE_DERIVED_FIELDS = frozenset({
+    "urgency_label",
+    "urgency_color",
+    "consultation_type",
+    "consultation_type_label",
+    "summary",
+    "precautions",
+    "explanation",
+    "recommended_facility_label",
+})
+
+
+def _compact_triage(result: dict) -> dict:
+    """Mode compact : champs canoniques seulement, médecins et centres réduits à leurs identifiants."""
+    compact = {
+        key: value
+        for key, value in result.items()
+        if key not in TRIAGE_DERIVED_FIELDS and key not in ("recommended_doctors", "health_centers")
+    }
+    compact["recommended_doctor_ids"] = [d.get("id") for d in result.get("recommended_doctors") or []]
+    compact["health_center_ids"] = [c.get("id") for c in result.get("health_centers") or []]
+    return compact
+
+
+def _local_enrichment(specialties: list, latitude: str, longitude: str, facility_type: Optional[str]) -> dict:
+    """Recherches servies par les index locaux prêts ; les autres partent au Backend API."""
+    local = {}
+    if doctor_index.ready:
+        with stage("triage", "doctor_lookup"):
+            local["recommended_doctors"] = doctor_index.lookup(specialties, limit=5)
+    if geo_index.ready:
+        try:
+            lat, lon = float(latitude), float(longitude)
+        except (TypeError, ValueError):
+            return local
+        if not valid_coordinates(lat, lon):
+            return local
+        with stage("triage", "geo_lookup"):
+            local["health_centers"] = geo_index.nearest(lat, lon, facility_type, k=3)
+    return local
+
+
+def _triage_parse_fallback() -> dict:
+    """Réponse de triage par défaut quand le JSON du modèle est inexploitable."""
+    return {
+        "severity": "moderate",
+        "diagnosis": "L'IA n'a pas pu analyser complètement les symptômes. Consultation recommandée.",
+        "recommendations": [
+            "Consulter un professionnel de santé pour une évaluation complète",
+            "Décrire vos symptômes en détail au médecin",
+            "Noter l'évolution de vos symptômes"
+        ],
+        "specialties": ["Médecine générale"],
+        "urgency_level": 2,
+        "recommended_facility_type": "CENTRE_SANTE",
+        "facility_reason": "Consultation médicale recommandée pour évaluation",
+        "urgency_label": "🟡 Modéré",
+        "urgency_color": "yellow",
+        "consultation_type": "STANDARD",
+        "consultation_type_label": "Consultation sous 2-3 jours",
+        "summary": "L'IA n'a pas pu analyser complètement les symptômes. Consultation recommandée.",
+        "precautions": ["Consulter un professionnel de santé"],
+        "explanation": "Niveau d'urgence : 🟡 Modéré. Consultation médicale recommandée pour évaluation",
+        "recommended_facility_label": "🏥 Centre de Santé"
+    }
+
+
+def _triage_unavailable_fallback(e: Exception) -> dict:
+    """Réponse de triage par défaut quand le service Groq est en erreur."""
+    return {
+        "severity": "moderate",
+        "diagnosis": "Service IA temporairement indisponible",
+        "recommendations": [
+            "Consulter un médecin généraliste",
+            "Décrire vos symptômes en détail",
+            "Surveiller votre état"
+        ],
+        "specialties": ["Médecine générale"],
+        "urgency_level": 2,
+        "recommended_facility_type": "CENTRE_SANTE",
+        "facility_reason": "Le service IA est temporairement indisponible",
+        "urgency_label": "🟡 Modéré",
+        "urgency_color": "yellow",
+        "consultation_type": "STANDARD",
+        "consultation_type_label": "Consultation médicale recommandée",
+        "summary": "Service IA temporairement indisponible",
+        "precautions": ["Consulter un professionnel de santé"],
+        "explanation": "Le service IA est temporairement indisponible. Veuillez consulter un professionnel de santé.",
+        "recommended_facility_label": "🏥 Centre de Santé",
+        "recommended_doctors": [],
+        "health_centers": [],
+        "error": str(e)
+    }
+
+
+def _local_model_triage(symptoms: str, endpoint: str) -> Optional[dict]:
+    """Prédiction du classifieur de secours (None si aucun artefact n'est chargé)."""
+    if fallback_model is None:
+        return None
+    with stage(endpoint, "local_model"):
+        result = fallback_model.triage(symptoms, FALLBACK_MODEL_MIN_CONFIDENCE)
+    result = _add_triage_ui_fields(result)
+    result["fast_path"] = "local_model"
+    return result
+
+
+def _fallback_triage(symptoms: str, endpoint: str, default: dict) -> dict:
+    """Triage sans LLM : classifieur local si assez sûr, sinon réponse par défaut à faire revoir."""
+    local = _local_model_triage(symptoms, endpoint)
+    if local is None:
+        return default
+    if not local["fallback_model"]["needs_review"]:
+        logger.info("🧮 Triage servi par le classifieur local", extra={"confidence": local["fallback_model"]["confidence"]})
+        return local
+    # Modèle peu sûr : réponse prudente, estimation jointe pour un professionnel de santé
+    default["fallback_model"] = dict(
+        local["fallback_model"],
+        severity=local["severity"],
+        recommended_facility_type=local["recommended_facility_type"],
+    )
+    return default
+
+
+async def _triage_result(symptoms: str, priority: int = PRIORITY_TRIAGE, endpoint: str = "triage") -> dict:
+    """Triage sans enrichissement : cache, urgences locales, puis LLM."""
+    # Signes d'urgence vitale détectés localement (sans attendre le LLM)
+    red_flags = match_red_flags(symptoms)
+
+    # Cache : clé = symptômes normalisés, seul le JSON du modèle est stocké
+    cache_key = normalize_symptoms(symptoms)
+    cached = await triage_cache.get(cache_key) if cache_key else None
+    # Avec un signe d'urgence, seule l'entrée affinée pour ce signe (red_flags) est servie ;
+    # toute autre entrée de même clé laisse place à la réponse URGENT locale
+    if cached is not None and (not red_flags or cached.get("red_flags")):
+        logger.info("⚡ Triage servi depuis le cache")
+        if red_flags:
+            cached = apply_red_flag_floor(cached, red_flags)
+        return _add_triage_ui_fields(cached)
+
+    if red_flags:
+        logger.info("🚨 Urgence détectée localement", extra={"red_flags": [r.rule_id for r in red_flags]})
+        result = _add_triage_ui_fields(red_flag_result(red_flags))
+        result["fast_path"] = "red_flag"
+        if RED_FLAG_REFINE and cache_key:
+            _spawn(_refine_red_flag_triage(symptoms, cache_key, red_flags))
+        return result
+
+    model_result = None
+    try:
+        model_result = await _analyze_symptoms(symptoms, priority=priority)
+        if cache_key:
+            triage_cache.set(cache_key, model_result)
+        return _add_triage_ui_fields(model_result)
+    except AIResponseParseError:
+        # Fallback si parsing échoue
+        FALLBACKS.labels(endpoint, "parse_error").inc()
+        return _fallback_triage(symptoms, endpoint, _triage_parse_fallback())
+    finally:
+        if TRIAGE_OUTCOME_LOG_ENABLED and model_result is not None:
+            # Journal d'entraînement du classifieur de secours (écrit hors event loop)
+            _spawn(asyncio.to_thread(outcome_log.record, symptoms, model_result))
+
+
+async def _enrich_triage(
+    result: dict,
+    latitude: Optional[str],
+    longitude: Optional[str],
+    endpoint: str = "triage",
+    memo: Optional[dict] = None,
+) -> dict:
+    """Ajoute recommandations médecins/centres (index locaux, sinon Backend API en parallèle)."""
+    if not (latitude and longitude):
+        result["recommended_doctors"] = []
+        result["health_centers"] = []
+        return result
+
+    specialties = result.get("specialties") or ["Médecine générale"]
+    local = _local_enrichment(specialties, latitude, longitude, result.get("recommended_facility_type"))
+    lookups = tuple(key for key in ("recommended_doctors", "health_centers") if key not in local)
+    with stage(endpoint, "enrichment"):
+        enrichment = await backend.enrich(specialties, latitude, longitude, lookups=lookups, memo=memo)
+    for lookup, error in enrichment.pop("enrichment_errors", {}).items():
+        UPSTREAM_ERRORS.labels(f"backend_api_{lookup}", error.split(":")[0].split(" ")[0]).inc()
+        logger.warning("⚠️  Enrichissement indisponible", extra={"lookup": lookup, "error": error})
+    enrichment.update(local)
+    result.update(enrichment)
+    return result
+
+
+async def _triage_response(
+    symptoms: str,
+    latitude: Optional[str],
+    longitude: Optional[str],
+    endpoint: str = "triage",
+) -> dict:
+    """Triage enrichi ; réponse de repli si Groq est en erreur (SchedulerOverloaded remonte)."""
+    try:
+        result = await _triage_result(symptoms, endpoint=endpoint)
+    except SchedulerOverloaded:
+        # Budget Groq épuisé : le classifieur local répond s'il est sûr, sinon 503
+        result = _local_model_triage(symptoms, endpoint)
+        if result is None or result["fallback_model"]["needs_review"]:
+            raise
+        FALLBACKS.labels(endpoint, "overloaded").inc()
+    except Exception as e:
+        FALLBACKS.labels(endpoint, "upstream_error").inc()
+        logger.exception("❌ Erreur triage", extra={"endpoint": endpoint, "error_type": type(e).__name__})
+        result = _fallback_triage(symptoms, endpoint, _triage_unavailable_fallback(e))
+        if "fallback_model" not in result or result["fallback_model"]["needs_review"]:
+            return result
+    # Ajouter recommandations médecins/centres (en parallèle, budget commun)
+    return await _enrich_triage(result, latitude, longitude, endpoint=endpoint)
+
+
+@app.post("/api/ai/triage")
+async def triage_symptoms(
+    request: Request,
+    symptoms: str = Form(...),
+    latitude: Optional[str] = Form(None),
+    longitude: Optional[str] = Form(None),
+    compact: bool = False
+):
+    """
+    Analyse des symptômes avec Groq (ultra-rapide). `?compact=true` : champs
+    canoniques et identifiants des médecins / centres (clients mobiles, 2G/3G).
+    """
+    logger.info("🩺 Nouvelle analyse de symptômes", extra={"symptoms_preview": symptoms[:100]})
+    try:
+        result = await _triage_response(symptoms, latitude, longitude)
+    except SchedulerOverloaded as e:
+        raise _service_overloaded(e)
+    return json_response(request, _compact_triage(result) if compact else result, "triage")
+
+
+class TriageBatchItem(BaseModel):
+    symptoms: str
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+
+
+def _batch_key(symptoms: str) -> str:
+    """Deux rapports aux symptômes identiques (une fois normalisés) partagent un seul triage."""
+    return normalize_symptoms(symptoms) or symptoms.strip()
+
+
+async def _triage_batch_item(
+    index: int,
+    item: TriageBatchItem,
+    triages: dict,
+    memo: dict,
+    compact: bool = False,
+) -> dict:
+    """Un élément du lot ; ses erreurs restent locales à l'élément."""
+    try:
+        result = copy.deepcopy(await asyncio.shield(triages[_batch_key(item.symptoms)]))
+        latitude = None if item.latitude is None else str(item.latitude)
+        longitude = None if item.longitude is None else str(item.longitude)
+        result = await _enrich_triage(result, latitude, longitude, endpoint="triage_batch", memo=memo)
+        return {"index": index, "ok": True, "result": _compact_triage(result) if compact else result}
+    except SchedulerOverloaded as e:
         return {
-            "status": "ok", 
-            "groq": "connected",
-            "model": "llama-3.1-8b-instant",
-            "api_key_preview": f"{GROQ_API_KEY[:10]}...{GROQ_API_KEY[-5:]}"
+            "index": index,
+            "ok": False,
+            "error": str(e),
+            "error_type": "SchedulerOverloaded",
+            "retry_after": max(1, math.ceil(e.retry_after_s)),
         }
     except Exception as e:
-        print(f"❌ Erreur test Groq: {e}")
-        import traceback
-        traceback.print_exc()
+        FALLBACKS.labels("triage_batch", "upstream_error").inc()
+        logger.warning("❌ Erreur triage (lot)", extra={"index": index, "error_type": type(e).__name__, "error": str(e)})
         return {
-            "status": "error", 
-            "groq": "disconnected", 
+            "index": index,
+            "ok": False,
             "error": str(e),
-            "error_type": type(e).__name__
+            "error_type": type(e).__name__,
+            "result": _triage_unavailable_fallback(e),
         }
 
-@app.post("/api/ai/triage")
-async def triage_symptoms(
-    symptoms: str = Form(...),
+
+@app.post("/api/ai/triage/batch")
+async def triage_batch(items: List[TriageBatchItem], stream: bool = False, compact: bool = False):
+    """
+    Triage d'un lot de rapports (synchronisation hors ligne des relais communautaires).
+    Symptômes identiques dédoublonnés, appels LLM limités à TRIAGE_BATCH_CONCURRENCY,
+    recherches d'enrichissement partagées ; résultats dans l'ordre du lot, en un bloc
+    ou en NDJSON (?stream=true), complets ou compacts (?compact=true). Chaque
+    élément réussit ou échoue indépendamment.
+    """
+    if len(items) > TRIAGE_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Lot trop volumineux ({len(items)} éléments, maximum {TRIAGE_BATCH_MAX_ITEMS})"
+        )
+    logger.info("🩺 Triage par lot", extra={"items": len(items)})
+
+    limit = asyncio.Semaphore(TRIAGE_BATCH_CONCURRENCY)
+
+    async def bounded(symptoms: str) -> dict:
+        async with limit:
+            return await _triage_result(symptoms, priority=PRIORITY_BACKGROUND, endpoint="triage_batch")
+
+    triages = {}
+    for item in items:
+        key = _batch_key(item.symptoms)
+        if key not in triages:
+            triages[key] = asyncio.create_task(bounded(item.symptoms))
+    memo = {}
+    tasks = [asyncio.create_task(_triage_batch_item(i, item, triages, memo, compact)) for i, item in enumerate(items)]
+
+    def cleanup() -> None:
+        for task in [*tasks, *triages.values(), *memo.values()]:
+            task.cancel()
+
+    if stream:
+        async def lines():
+            try:
+                for task in tasks:
+                    yield dumps(await task) + "\n"
+            finally:
+                cleanup()
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    try:
+        results = await asyncio.gather(*tasks)
+    finally:
+        cleanup()
+    return {
+        "count": len(results),
+        "unique": len(triages),
+        "failed": sum(1 for r in results if not r["ok"]),
+        "results": results
+    }
+
+@app.post("/api/ai/transcribe")
+async def transcribe_audio(
+    audio_file: UploadFile = File(...),
+    triage: bool = Form(False),
     latitude: Optional[str] = Form(None),
-    longitude: Optional[str] = Form(None)
+    longitude: Optional[str] = Form(None),
+    compact: bool = False
 ):
-    """Analyse des symptômes avec Groq (ultra-rapide)"""
-    try:
-        print(f"\n{'='*60}")
-        print(f"🩺 NOUVELLE ANALYSE DE SYMPTÔMES")
-        print(f"📝 Symptômes: {symptoms[:100]}...")
-        print(f"🔑 Clé API: {GROQ_API_KEY[:15]}...{GROQ_API_KEY[-5:]}")
-        print(f"{'='*60}\n")
-        
-        # Prompt médical simplifié et accessible
-        prompt = f"""Tu es un assistant médical bienveillant qui aide les patients à comprendre leurs symptômes de façon SIMPLE et RASSURANTE.
-
-Analyse ces symptômes : {symptoms}
-
-IMPORTANT : Utilise un langage SIMPLE, ACCESSIBLE, sans termes techniques compliqués.
-
-DOMAINES D'EXPERTISE :
-- Urgences et traumatologie
-- Cardiologie et maladies cardiovasculaires
-- Pneumologie et troubles respiratoires
-- Neurologie (maux de tête, vertiges, troubles neurologiques)
-- Gastro-entérologie et troubles digestifs
-- Dermatologie (problèmes de peau, allergies cutanées)
-- ORL (gorge, oreilles, nez)
-- Orthopédie et traumatologie
-- Pédiatrie (si symptômes d'enfant)
-- Gynécologie (si symptômes féminins)
-- Ophtalmologie (troubles visuels)
-- Psychiatrie et santé mentale
-- Infectiologie et maladies infectieuses
-- Endocrinologie (diabète, thyroïde)
-- Rhumatologie (douleurs articulaires, arthrose)
-
-STRUCTURES DE SANTÉ À RECOMMANDER :
-- Urgences hospitalières : traumas graves, douleurs thoraciques, difficultés respiratoires sévères
-- Hôpital/Clinique : chirurgie, hospitalisations, examens spécialisés
-- Centre de santé : consultations générales, suivi médical
-- Cabinet médical : consultations de spécialistes
-- Pharmacie : conseils, médicaments sans ordonnance pour cas légers
-
-RÈGLES D'ÉVALUATION (sois RAISONNABLE, pas alarmiste) :
-
-1. URGENT (urgency_level: 4) : VRAIE urgence vitale → URGENCES
-   - Douleur thoracique intense + essoufflement
-   - Hémorragie grave qui ne s'arrête pas
-   - Perte de conscience, convulsions
-   - Fracture ouverte, brûlure grave (>10% du corps)
-   
-2. HIGH (urgency_level: 3) : Consulter sous 24h → HÔPITAL/CLINIQUE
-   - Fièvre très élevée >39.5°C avec confusion
-   - Douleur abdominale intense + vomissements
-   - Plaie profonde nécessitant sutures
-   
-3. MODERATE (urgency_level: 2) : Consulter sous 3-7 jours → CENTRE DE SANTÉ
-   - Fièvre modérée qui dure >3 jours
-   - Migraine, mal de gorge, toux qui persiste
-   - Douleurs supportables mais gênantes
-   
-4. LOW (urgency_level: 1) : Pas urgent, automédication possible → PHARMACIE
-   - Petit rhume, légère fatigue
-   - Migraine occasionnelle légère
-   - Petite douleur musculaire
-
-STRUCTURE À RECOMMANDER selon gravité :
-{{
-  "recommended_facility_type": "URGENCES|HOPITAL|CENTRE_SANTE|CABINET|PHARMACIE",
-  "facility_reason": "Explication courte pourquoi cette structure"
-}}
-
-Réponds UNIQUEMENT avec ce JSON (LANGAGE SIMPLE ET RASSURANT) :
-{{
-  "severity": "low|moderate|high|urgent",
-  "diagnosis": "Explication SIMPLE et CLAIRE en 1-2 phrases (SANS termes médicaux compliqués)",
-  "recommendations": [
-    "Conseil pratique 1 (simple et actionnable)",
-    "Conseil pratique 2",
-    "Conseil pratique 3"
-  ],
-  "specialties": ["Spécialité adaptée"],
-  "urgency_level": 1-4,
-  "recommended_facility_type": "URGENCES|HOPITAL|CENTRE_SANTE|CABINET|PHARMACIE",
-  "facility_reason": "Raison simple pourquoi cette structure (max 10 mots)"
-}}
-
-EXEMPLES DE BON DIAGNOSTIC (simple) :
-- "Probablement une migraine. Repos et hydratation recommandés."
-- "Symptômes de grippe. Besoin de repos et surveillance de la fièvre."
-- "Possible entorse. Repos, glace et consultation si douleur persiste."
-
-EXEMPLES DE MAUVAIS DIAGNOSTIC (trop technique, À ÉVITER) :
-- "Migraine caractérisée par des céphalées unilatérales avec photophobie et phonophobie"
-- "Syndrome grippal avec hyperthermie et asthénie généralisée"
-
-JSON uniquement, LANGAGE SIMPLE."""
-
-        print(f"🔄 Analyse des symptômes avec Groq...")
-        
-        # Appel Groq (ULTRA-RAPIDE)
-        completion = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",  # Nouveau modèle (l'ancien est décommissionné)
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Tu es un médecin urgentiste expert en triage médical. Tu analyses les symptômes avec précision et donnes des recommandations adaptées. IMPORTANT : Réponds UNIQUEMENT en JSON strict, sans texte avant ou après."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            temperature=0.2,
-            max_tokens=600
+    """
+    Transcription audio (Groq Whisper). L'enregistrement est découpé aux silences
+    et les segments transcrits en parallèle. Avec `triage=true`, le texte est
+    directement analysé et le triage renvoyé dans la même réponse (compact
+    avec `?compact=true`).
+    """
+    size = audio_file.size
+    if size is None:
+        audio_file.file.seek(0, os.SEEK_END)
+        size = audio_file.file.tell()
+    if size == 0:
+        raise HTTPException(status_code=400, detail="Fichier audio vide")
+    if size > TRANSCRIBE_MAX_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Fichier audio trop volumineux (max {TRANSCRIBE_MAX_BYTES // (1024 * 1024)} Mo)"
         )
-        
-        ai_text = completion.choices[0].message.content.strip()
-        print(f"✅ Réponse Groq reçue")
-        
-        # Nettoyer le JSON si besoin
-        if "```json" in ai_text:
-            ai_text = ai_text.split("```json")[1].split("```")[0]
-        elif "```" in ai_text:
-            ai_text = ai_text.split("```")[1].split("```")[0]
-        
-        # Nettoyer les espaces et lignes
-        ai_text = ai_text.strip()
-        
-        # Parser le JSON
+
+    logger.info("🎙️ Transcription audio", extra={"audio_bytes": size, "content_type": audio_file.content_type})
+    try:
+        with stage("transcribe", "transcription"):
+            response = await transcriber.transcribe(audio_file.file, audio_file.filename or "recording.webm")
+    except AudioTooLong as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        UPSTREAM_ERRORS.labels("groq_whisper", type(e).__name__).inc()
+        logger.exception("❌ Erreur transcription", extra={"error_type": type(e).__name__})
+        raise HTTPException(status_code=502, detail="Erreur de transcription audio, veuillez réessayer")
+    finally:
+        await audio_file.close()
+
+    if not response["transcription"]:
+        raise HTTPException(status_code=422, detail="Aucune parole détectée dans l'enregistrement")
+    logger.info("✅ Transcription terminée", extra={"chunks": response["chunks"], "duration_s": response["duration_s"]})
+
+    if triage:
+        # Évite au client un second aller-retour vers /api/ai/triage
         try:
-            result = json.loads(ai_text)
-            
-            # Validation et correction des champs
-            if "severity" not in result:
-                result["severity"] = "moderate"
-            if "diagnosis" not in result or not result["diagnosis"]:
-                result["diagnosis"] = "Évaluation médicale recommandée"
-            if "recommendations" not in result or not isinstance(result["recommendations"], list):
-                result["recommendations"] = ["Consulter un professionnel de santé"]
-            if "specialties" not in result or not isinstance(result["specialties"], list):
-                result["specialties"] = ["Médecine générale"]
-            if "urgency_level" not in result:
-                result["urgency_level"] = 2
-            if "recommended_facility_type" not in result:
-                result["recommended_facility_type"] = "CENTRE_SANTE"
-            if "facility_reason" not in result:
-                result["facility_reason"] = "Consultation médicale recommandée"
-            
-            # Ajouter les champs UI pour le frontend
-            severity_map = {
-                "urgent": {
-                    "label": "🚨 URGENT",
-                    "color": "red",
-                    "consultation_type": "URGENCE",
-                    "consultation_label": "Consulter les urgences immédiatement"
-                },
-                "high": {
-                    "label": "⚠️  Élevé",
-                    "color": "orange",
-                    "consultation_type": "RAPIDE",
-                    "consultation_label": "Consultation médicale dans les 24h"
-                },
-                "moderate": {
-                    "label": "🟡 Modéré",
-                    "color": "yellow",
-                    "consultation_type": "STANDARD",
-                    "consultation_label": "Consultation sous 2-3 jours"
-                },
-                "low": {
-                    "label": "✅ Faible",
-                    "color": "green",
-                    "consultation_type": "SURVEILLANCE",
-                    "consultation_label": "Surveillance et conseils"
-                }
-            }
-            
-            severity_info = severity_map.get(result["severity"], severity_map["moderate"])
-            
-            result["urgency_label"] = severity_info["label"]
-            result["urgency_color"] = severity_info["color"]
-            result["consultation_type"] = severity_info["consultation_type"]
-            result["consultation_type_label"] = severity_info["consultation_label"]
-            result["summary"] = result["diagnosis"]
-            result["precautions"] = result["recommendations"][:2] if len(result["recommendations"]) > 2 else result["recommendations"]
-            result["explanation"] = f"Niveau d'urgence : {severity_info['label']}. {result['facility_reason']}"
-            
-            # Mapper le type de structure en français
-            facility_map = {
-                "URGENCES": "🚨 Service d'Urgences",
-                "HOPITAL": "🏥 Hôpital/Clinique",
-                "CENTRE_SANTE": "🏥 Centre de Santé",
-                "CABINET": "👨‍⚕️ Cabinet Médical",
-                "PHARMACIE": "💊 Pharmacie"
-            }
-            result["recommended_facility_label"] = facility_map.get(
-                result["recommended_facility_type"], 
-                "🏥 Centre de Santé"
+            result = await _triage_response(
+                response["transcription"], latitude, longitude, endpoint="transcribe_triage"
             )
-                
-        except Exception as parse_error:
-            print(f"⚠️  Erreur parsing JSON: {parse_error}")
-            print(f"Texte reçu: {ai_text[:200]}")
-            # Fallback si parsing échoue
-            result = {
-                "severity": "moderate",
-                "diagnosis": "L'IA n'a pas pu analyser complètement les symptômes. Consultation recommandée.",
-                "recommendations": [
-                    "Consulter un professionnel de santé pour une évaluation complète",
-                    "Décrire vos symptômes en détail au médecin",
-                    "Noter l'évolution de vos symptômes"
-                ],
-                "specialties": ["Médecine générale"],
-                "urgency_level": 2,
-                "recommended_facility_type": "CENTRE_SANTE",
-                "facility_reason": "Consultation médicale recommandée pour évaluation",
-                "urgency_label": "🟡 Modéré",
-                "urgency_color": "yellow",
-                "consultation_type": "STANDARD",
-                "consultation_type_label": "Consultation sous 2-3 jours",
-                "summary": "L'IA n'a pas pu analyser complètement les symptômes. Consultation recommandée.",
-                "precautions": ["Consulter un professionnel de santé"],
-                "explanation": "Niveau d'urgence : 🟡 Modéré. Consultation médicale recommandée pour évaluation",
-                "recommended_facility_label": "🏥 Centre de Santé"
-            }
-        
-        # Ajouter recommandations médecins/centres
-        if latitude and longitude:
-            try:
-                backend_url = "http://localhost:3001"
-                specialties = ",".join(result.get("specialties", ["Médecine générale"]))
-                
-                # Médecins
-                doctors_response = requests.get(
-                    f"{backend_url}/api/ai/doctors?specialties={specialties}",
-                    timeout=5
-                )
-                
-                # Centres de santé
-                health_centers_response = requests.get(
-                    f"{backend_url}/api/ai/health-centers?latitude={latitude}&longitude={longitude}",
-                    timeout=5
-                )
-                
-                if doctors_response.status_code == 200:
-                    result["recommended_doctors"] = doctors_response.json().get("doctors", [])
-                
-                if health_centers_response.status_code == 200:
-                    result["health_centers"] = health_centers_response.json().get("healthCenters", [])
-            except:
-                result["recommended_doctors"] = []
-                result["health_centers"] = []
-        else:
-            result["recommended_doctors"] = []
-            result["health_centers"] = []
+        except SchedulerOverloaded as e:
+            raise _service_overloaded(e)
+        response["triage"] = _compact_triage(result) if compact else result
+    return response
+
+
+def _build_assistant_messages(
+    symptoms: str, patient_info, medical_history, current_findings, endpoint: str = "medical_assistant"
+) -> list:
+    """Messages Groq pour l'assistant médical (diagnostic différentiel)."""
+    messages = ASSISTANT_PROMPT.render(
+        symptoms=symptoms,
+        patient_info=patient_info or "Non renseigné",
+        medical_history=medical_history or "Non renseigné",
+        current_findings=current_findings or "Non renseigné",
+    )
+    record_prompt(endpoint, ASSISTANT_PROMPT.variant, *ASSISTANT_PROMPT.token_split(messages))
+    return messages
+
+
+def _assistant_escalation_reason(result: dict) -> Optional[str]:
+    """Raison de passer au grand modèle pour l'assistant médical (None = réponse du 8B conservée)."""
+    if not isinstance(result.get("differential_diagnosis"), list) or not result["differential_diagnosis"]:
+        return "invalid_schema"
+    if result.get("red_flags"):
+        return "red_flags"
+    if str(result.get("confidence_level", "")).lower() == "faible":
+        return "low_confidence"
+    return None
+
+
+def _validate_assistant_result(result: dict) -> dict:
+    """Complète et normalise les champs de la réponse de l'assistant médical."""
+    return AssistantOutput.model_validate(result).model_dump()
+
+
+def _assistant_parse_fallback() -> dict:
+    """Réponse par défaut quand le JSON du modèle est inexploitable."""
+    return {
+        "differential_diagnosis": ["Erreur d'analyse - Veuillez réessayer"],
+        "recommended_tests": ["Examens cliniques de routine"],
+        "treatment_suggestions": ["Consultation médicale recommandée"],
+        "red_flags": [],
+        "precautions": ["Surveillance du patient"],
+        "follow_up": "Réévaluation nécessaire",
+        "confidence_level": "faible",
+        "confidence_label": "Confiance faible",
+        "explanation": "Erreur lors de l'analyse IA",
+        "disclaimer": "Cette analyse est une aide à la décision. Le diagnostic final reste de la responsabilité du médecin."
+    }
+
+
+def _assistant_unavailable_fallback(e: Exception) -> dict:
+    """Réponse par défaut quand le service Groq est en erreur."""
+    return {
+        "differential_diagnosis": ["Service IA temporairement indisponible"],
+        "recommended_tests": ["Évaluation clinique standard"],
+        "treatment_suggestions": ["Consultation en personne recommandée"],
+        "red_flags": [],
+        "precautions": ["Surveillance du patient"],
+        "follow_up": "Suivi régulier",
+        "confidence_level": "faible",
+        "confidence_label": "Service indisponible",
+        "explanation": f"Erreur technique: {str(e)}",
+        "disclaimer": "Service IA temporairement indisponible. Veuillez vous baser sur votre jugement clinique."
+    }
+
+
+def _sse(event: str, data) -> str:
+    """Formate un événement Server-Sent Events."""
+    return f"event: {event}\ndata: {dumps(data)}\n\n"
+
+
+async def _medical_assistant_result(
+    symptoms: str,
+    patient_info: Optional[str],
+    medical_history: Optional[str],
+    current_findings: Optional[str],
+    endpoint: str = "medical_assistant",
+) -> dict:
+    """Analyse de l'assistant médical ; lève SchedulerOverloaded et les erreurs Groq."""
+    with stage(endpoint, "prompt_build"):
+        messages = _build_assistant_messages(symptoms, patient_info, medical_history, current_findings, endpoint)
+
+    logger.info("🔄 Analyse médicale avec Groq...")
+    
+    # Appel Groq (coalescé avec les requêtes identiques en vol)
+    async def call(model: str) -> dict:
+        return await _complete_json(
+            endpoint,
+            ASSISTANT_REQUIRED,
+            model=model,
+            messages=messages,
+            temperature=0.2,
+            max_tokens=1200,
+            response_format=JSON_MODE,
+            priority=PRIORITY_ASSISTANT
+        )
+
+    try:
+        # Cascade : 8B d'abord, 70B si réponse invalide, grave ou peu sûre
+        result = await cascade.run(endpoint, call, _assistant_escalation_reason, (AIResponseParseError,))
+        with stage(endpoint, "validation"):
+            result = _validate_assistant_result(result)
         
+        logger.info("✅ Assistant médical IA - Analyse terminée")
         return result
         
-    except Exception as e:
-        import traceback
-        print(f"❌ ERREUR COMPLÈTE: {e}")
-        print(f"❌ Type d'erreur: {type(e).__name__}")
-        print(f"❌ Traceback complet:")
-        traceback.print_exc()
-        return {
-            "severity": "moderate",
-            "diagnosis": "Service IA temporairement indisponible",
-            "recommendations": [
-                "Consulter un médecin généraliste",
-                "Décrire vos symptômes en détail",
-                "Surveiller votre état"
-            ],
-            "specialties": ["Médecine générale"],
-            "urgency_level": 2,
-            "recommended_facility_type": "CENTRE_SANTE",
-            "facility_reason": "Le service IA est temporairement indisponible",
-            "urgency_label": "🟡 Modéré",
-            "urgency_color": "yellow",
-            "consultation_type": "STANDARD",
-            "consultation_type_label": "Consultation médicale recommandée",
-            "summary": "Service IA temporairement indisponible",
-            "precautions": ["Consulter un professionnel de santé"],
-            "explanation": "Le service IA est temporairement indisponible. Veuillez consulter un professionnel de santé.",
-            "recommended_facility_label": "🏥 Centre de Santé",
-            "recommended_doctors": [],
-            "health_centers": [],
-            "error": str(e)
-        }
+    except AIResponseParseError:
+        FALLBACKS.labels(endpoint, "parse_error").inc()
+        return _assistant_parse_fallback()
 
-@app.post("/api/ai/transcribe")
-async def transcribe_audio():
-    """Transcription audio - disponible avec Groq"""
-    return {
-        "error": "Transcription non implémentée dans cette version rapide",
-        "detail": "Pour la transcription, installer Whisper ou utiliser Groq Whisper API"
-    }
 
 @app.post("/api/ai/medical-assistant")
 async def medical_assistant(
@@ -374,168 +954,159 @@ async def medical_assistant(
 ):
     """Assistant médical IA pour les médecins - Aide au diagnostic"""
     try:
-        print(f"\n{'='*60}")
-        print(f"🩺 ASSISTANT MÉDICAL IA")
-        print(f"📝 Symptômes: {symptoms[:100]}...")
-        print(f"👤 Patient: {patient_info}")
-        print(f"{'='*60}\n")
-        
-        # Prompt médical pour diagnostic différentiel
-        prompt = f"""Tu es un médecin expert expérimenté qui assiste un confrère dans son diagnostic.
-
-INFORMATIONS DU PATIENT :
-{patient_info}
-
-ANTÉCÉDENTS MÉDICAUX :
-{medical_history}
-
-SYMPTÔMES ACTUELS :
-{symptoms}
-
-OBSERVATIONS CLINIQUES :
-{current_findings}
-
-RÈGLES IMPORTANTES :
-- Sois PRAGMATIQUE et ÉQUILIBRÉ (pas alarmiste)
-- Base-toi sur les PROBABILITÉS CLINIQUES (diagnostic le plus probable en premier)
-- Les "red_flags" doivent être RÉELLEMENT GRAVES (pas de sur-diagnostic)
-- Propose des examens PERTINENTS (pas tout le catalogue)
-- Les traitements doivent être ADAPTÉS et RÉALISTES
-- Niveau de confiance basé sur les éléments fournis
-
-EXEMPLES DE BON RAISONNEMENT :
-- Si "mal de tête" → penser migraine/céphalée de tension AVANT tumeur cérébrale
-- Si "toux + fièvre" → infection respiratoire haute AVANT pneumonie
-- Ne mettre en "red_flags" QUE les signes vraiment inquiétants
-
-Réponds UNIQUEMENT avec ce JSON :
-{{
-  "differential_diagnosis": [
-    "Diagnostic le plus probable (60-70%)",
-    "Diagnostic alternatif plausible (20-30%)",
-    "Diagnostic rare à écarter (5-10%)"
-  ],
-  "recommended_tests": [
-    "Examen de première intention pertinent",
-    "Examen de confirmation si nécessaire",
-    "Examen complémentaire si doute"
-  ],
-  "treatment_suggestions": [
-    "Traitement de première ligne adapté",
-    "Alternative thérapeutique si contre-indication",
-    "Mesures symptomatiques"
-  ],
-  "red_flags": [
-    "Signe d'alerte VRAIMENT inquiétant UNIQUEMENT si présent dans les symptômes"
-  ],
-  "precautions": [
-    "Précaution pratique 1",
-    "Précaution pratique 2"
-  ],
-  "follow_up": "Suivi adapté à la gravité (ne pas systématiquement dramatiser)",
-  "confidence_level": "élevé|moyen|faible",
-  "confidence_label": "Confiance élevée|moyenne|faible (selon les éléments fournis)",
-  "explanation": "Raisonnement médical CONCIS et CLAIR (3-4 phrases max)",
-  "disclaimer": "Aide à la décision médicale. Le diagnostic final relève du médecin."
-}}
-
-IMPORTANT : Si les symptômes sont BÉNINS, ne pas dramatiser. Si GRAVES, être clair.
-
-JSON uniquement."""
-
-        print(f"🔄 Analyse médicale avec Groq...")
-        
-        # Appel Groq
-        completion = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Tu es un médecin expérimenté et PRAGMATIQUE qui aide un confrère. Tu analyses les symptômes de façon ÉQUILIBRÉE, en te basant sur les PROBABILITÉS CLINIQUES réelles. Tu n'es NI alarmiste, NI négligent. Tu proposes des diagnostics différentiels RÉALISTES, des examens PERTINENTS et des traitements ADAPTÉS. Tu ne dramatises pas les cas bénins, mais tu identifies clairement les situations graves."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            temperature=0.2,
-            max_tokens=1200
-        )
-        
-        ai_text = completion.choices[0].message.content.strip()
-        print(f"✅ Réponse Groq reçue")
-        
-        # Nettoyer le JSON
-        if "```json" in ai_text:
-            ai_text = ai_text.split("```json")[1].split("```")[0]
-        elif "```" in ai_text:
-            ai_text = ai_text.split("```")[1].split("```")[0]
-        
-        ai_text = ai_text.strip()
-        
-        # Parser le JSON
-        try:
-            result = json.loads(ai_text)
-            
-            # Validation des champs
-            if "differential_diagnosis" not in result:
-                result["differential_diagnosis"] = ["Analyse insuffisante - Veuillez fournir plus de détails"]
-            if "recommended_tests" not in result:
-                result["recommended_tests"] = ["Examens cliniques standards"]
-            if "treatment_suggestions" not in result:
-                result["treatment_suggestions"] = ["Consultation recommandée"]
-            if "red_flags" not in result:
-                result["red_flags"] = []
-            if "precautions" not in result:
-                result["precautions"] = ["Surveillance clinique"]
-            if "follow_up" not in result:
-                result["follow_up"] = "Suivi à déterminer selon évolution"
-            if "confidence_level" not in result:
-                result["confidence_level"] = "moyen"
-            if "confidence_label" not in result:
-                result["confidence_label"] = "Confiance moyenne"
-            if "explanation" not in result:
-                result["explanation"] = "Analyse basée sur les symptômes fournis"
-            if "disclaimer" not in result:
-                result["disclaimer"] = "Cette analyse est une aide à la décision. Le diagnostic final reste de la responsabilité du médecin."
-            
-            print(f"✅ Assistant médical IA - Analyse terminée")
-            return result
-            
-        except Exception as parse_error:
-            print(f"⚠️  Erreur parsing JSON: {parse_error}")
-            return {
-                "differential_diagnosis": ["Erreur d'analyse - Veuillez réessayer"],
-                "recommended_tests": ["Examens cliniques de routine"],
-                "treatment_suggestions": ["Consultation médicale recommandée"],
-                "red_flags": [],
-                "precautions": ["Surveillance du patient"],
-                "follow_up": "Réévaluation nécessaire",
-                "confidence_level": "faible",
-                "confidence_label": "Confiance faible",
-                "explanation": "Erreur lors de l'analyse IA",
-                "disclaimer": "Cette analyse est une aide à la décision. Le diagnostic final reste de la responsabilité du médecin."
-            }
+        logger.info("🩺 Assistant médical IA", extra={"symptoms_preview": symptoms[:100]})
+        return await _medical_assistant_result(symptoms, patient_info, medical_history, current_findings)
         
+    except SchedulerOverloaded as e:
+        raise _service_overloaded(e)
     except Exception as e:
-        import traceback
-        print(f"❌ Erreur assistant médical: {e}")
-        traceback.print_exc()
-        return {
-            "differential_diagnosis": ["Service IA temporairement indisponible"],
-            "recommended_tests": ["Évaluation clinique standard"],
-            "treatment_suggestions": ["Consultation en personne recommandée"],
-            "red_flags": [],
-            "precautions": ["Surveillance du patient"],
-            "follow_up": "Suivi régulier",
-            "confidence_level": "faible",
-            "confidence_label": "Service indisponible",
-            "explanation": f"Erreur technique: {str(e)}",
-            "disclaimer": "Service IA temporairement indisponible. Veuillez vous baser sur votre jugement clinique."
-        }
+        FALLBACKS.labels("medical_assistant", "upstream_error").inc()
+        logger.exception("❌ Erreur assistant médical", extra={"error_type": type(e).__name__})
+        return _assistant_unavailable_fallback(e)
+
+
+async def _medical_assistant_job(request: dict) -> dict:
+    """Tâche assistant médical : file Groq saturée -> on patiente au lieu de rejeter."""
+    for attempt in range(JOB_OVERLOAD_RETRIES + 1):
+        try:
+            return await _medical_assistant_result(**request, endpoint="medical_assistant_job")
+        except SchedulerOverloaded as e:
+            if attempt == JOB_OVERLOAD_RETRIES:
+                raise JobFailed(str(e), _assistant_unavailable_fallback(e))
+            await asyncio.sleep(e.retry_after_s)
+        except Exception as e:
+            FALLBACKS.labels("medical_assistant_job", "upstream_error").inc()
+            logger.exception("❌ Erreur assistant médical (tâche)", extra={"error_type": type(e).__name__})
+            raise JobFailed(str(e), _assistant_unavailable_fallback(e))
+
+
+jobs = JobQueue.from_env({"medical_assistant": _medical_assistant_job})
+
+
+def _job_response(job: dict) -> dict:
+    response = {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+        "expires_at": job["expires_at"],
+        "poll_url": f"/api/ai/jobs/{job['id']}"
+    }
+    if job["status"] in (JOB_DONE, JOB_FAILED):
+        response["result"] = job["result"]
+    if job["error"]:
+        response["error"] = job["error"]
+    return response
+
+
+@app.post("/api/ai/medical-assistant/jobs", status_code=202)
+async def medical_assistant_job(
+    response: Response,
+    symptoms: str = Form(...),
+    patient_info: str = Form(None),
+    medical_history: str = Form(None),
+    current_findings: str = Form(None),
+    idempotency_key: Optional[str] = Header(None)
+):
+    """
+    Mode tâche de l'assistant médical : renvoie un job_id tout de suite, le
+    résultat se récupère sur GET /api/ai/jobs/{job_id}?wait=<s>. Avec
+    l'en-tête Idempotency-Key, une resoumission rejoint la tâche existante.
+    """
+    payload = {
+        "symptoms": symptoms,
+        "patient_info": patient_info,
+        "medical_history": medical_history,
+        "current_findings": current_findings
+    }
+    try:
+        job, created = await jobs.submit("medical_assistant", payload, idempotency_key)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except IdempotencyConflict:
+        raise HTTPException(status_code=409, detail="Idempotency-Key déjà utilisée pour une autre requête")
+    if not created:
+        response.status_code = 200
+    logger.info("📥 Tâche assistant médical", extra={"job_id": job["id"], "attached": not created})
+    return _job_response(job)
+
+
+@app.get("/api/ai/jobs/{job_id}")
+async def get_job(request: Request, job_id: str, wait: float = 0):
+    """
+    État / résultat d'une tâche ; `wait` (s) attend la fin de la tâche (long-poll).
+    Avec If-None-Match = ETag déjà reçu : 304 sans corps si rien n'a changé.
+    """
+    job = await jobs.get(job_id, wait_s=min(max(wait, 0.0), JOB_MAX_WAIT_S))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Tâche inconnue ou expirée")
+    return json_response(request, _job_response(job), "jobs")
+
+@app.post("/api/ai/medical-assistant/stream")
+async def medical_assistant_stream(
+    symptoms: str = Form(...),
+    patient_info: str = Form(None),
+    medical_history: str = Form(None),
+    current_findings: str = Form(None)
+):
+    """
+    Assistant médical IA en streaming (Server-Sent Events).
+    Un événement `field` par champ JSON dès qu'il est complet, puis un événement
+    `result` avec l'objet validé identique à /api/ai/medical-assistant.
+    """
+    logger.info("🩺 Assistant médical IA (streaming)", extra={"symptoms_preview": symptoms[:100]})
+    messages = _build_assistant_messages(
+        symptoms, patient_info, medical_history, current_findings, "medical_assistant_stream"
+    )
+
+    async def events():
+        parser = JsonFieldStream()
+        try:
+            async for delta in llm.stream(
+                model=cascade.large_model,
+                messages=messages,
+                temperature=0.2,
+                max_tokens=1200,
+                priority=PRIORITY_ASSISTANT
+            ):
+                for name, value in parser.feed(delta):
+                    yield _sse("field", {"name": name, "value": value})
+
+            try:
+                result = _validate_assistant_result(
+                    _parse_json_object(parser.buffer, "medical_assistant_stream", ASSISTANT_REQUIRED)
+                )
+            except AIResponseParseError:
+                FALLBACKS.labels("medical_assistant_stream", "parse_error").inc()
+                result = _assistant_parse_fallback()
+            yield _sse("result", result)
+        except SchedulerOverloaded as e:
+            logger.warning("⏳ Assistant médical (streaming) rejeté", extra={"reason": str(e)})
+            yield _sse("error", {"error": str(e), "error_type": "SchedulerOverloaded", "retry_after": math.ceil(e.retry_after_s)})
+            yield _sse("result", _assistant_unavailable_fallback(e))
+        except Exception as e:
+            FALLBACKS.labels("medical_assistant_stream", "upstream_error").inc()
+            UPSTREAM_ERRORS.labels("groq", type(e).__name__).inc()
+            logger.exception("❌ Erreur assistant médical (streaming)", extra={"error_type": type(e).__name__})
+            yield _sse("error", {"error": str(e), "error_type": type(e).__name__})
+            yield _sse("result", _assistant_unavailable_fallback(e))
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 if __name__ == "__main__":
     import uvicorn
+    HOST = os.getenv("HOST", "0.0.0.0")
+    PORT = int(os.getenv("PORT", "8000"))
     print("🚀 Démarrage Backend IA (Groq - Ultra-rapide)")
-    print("🔗 API Docs: http://localhost:8000/docs")
-    uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
+    print(f"🔗 API Docs: http://localhost:{PORT}/docs")
+    if APP_ENV == "production":
+        # Workers forkés après l'import : prêts en quelques millisecondes
+        prefork.serve(app, host=HOST, port=PORT, workers=WORKERS, log_level=os.getenv("LOG_LEVEL", "info").lower())
+    else:
+        # Le rechargement exige une chaîne d'import (l'objet app seul l'ignore)
+        uvicorn.run("main:app", host=HOST, port=PORT, reload=True)
@@ -0,0 +1,66 @@
+"""
+Entraînement du classifieur de secours (services/fallback_model.py)
+
+Lit un ou plusieurs journaux de triages du LLM (TRIAGE_OUTCOME_LOG, JSONL),
+entraîne les têtes gravité / structure / spécialité et écrit l'artefact
+(meta.json + .npy) chargé au démarrage via FALLBACK_MODEL_PATH. Une partie
+des cas est gardée de côté pour mesurer la précision et la latence.
+
+Usage : python scripts/train_fallback_model.py triage_outcomes.jsonl [...] [--out models/fallback]
+                                              [--holdout 0.2] [--epochs 300]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services.fallback_model import HEADS, FallbackModel, read_outcomes, train  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("logs", nargs="+", help="journaux JSONL des triages du LLM")
+    parser.add_argument("--out", default="models/fallback")
+    parser.add_argument("--holdout", type=float, default=0.2, help="part des cas réservée à l'évaluation")
+    parser.add_argument("--epochs", type=int, default=300)
+    parser.add_argument("--features", type=int, default=1 << 15)
+    parser.add_argument("--min-confidence", type=float, default=float(os.getenv("FALLBACK_MODEL_MIN_CONFIDENCE", "0.6")))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    records = read_outcomes(args.logs)
+    random.Random(args.seed).shuffle(records)
+    cut = int(len(records) * (1 - args.holdout)) if args.holdout > 0 and len(records) >= 10 else len(records)
+    train_set, test_set = records[:cut], records[cut:]
+    print(f"{len(records)} triages distincts : {len(train_set)} entraînement, {len(test_set)} évaluation")
+
+    start = time.perf_counter()
+    meta = train(train_set, args.out, n_features=args.features, epochs=args.epochs)
+    print(f"Artefact écrit dans {args.out} en {time.perf_counter() - start:.1f} s (précision entraînement {meta['train_accuracy']})")
+
+    if not test_set:
+        return
+    model = FallbackModel.load(args.out)
+    correct = {head: 0 for head in HEADS}
+    confident = confident_correct = 0
+    start = time.perf_counter()
+    for record in test_set:
+        predictions = model.predict(record["symptoms"])
+        for head in HEADS:
+            correct[head] += predictions[head][0] == record[head]
+        if min(predictions["severity"][1], predictions["facility"][1]) >= args.min_confidence:
+            confident += 1
+            confident_correct += predictions["severity"][0] == record["severity"]
+    latency_us = (time.perf_counter() - start) / len(test_set) * 1e6
+    print("Précision évaluation : " + ", ".join(f"{h}={correct[h] / len(test_set):.1%}" for h in HEADS))
+    print(
+        f"Confiance >= {args.min_confidence} : {confident / len(test_set):.1%} des cas, "
+        f"gravité exacte {confident_correct / max(confident, 1):.1%} ; latence {latency_us:.0f} µs/prédiction"
+    )
+
+
+if __name__ == "__main__":
+    main()
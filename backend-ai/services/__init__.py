@@ -0,0 +1 @@
+"""Services internes du Backend IA Santé Kènè."""
@@ -0,0 +1,128 @@
+"""
+Client HTTP vers le Backend API (Node)
+
+Un seul httpx.AsyncClient avec keep-alive pour tout le processus. Les deux
+recherches d'enrichissement (médecins + centres de santé) partent en parallèle
+sous un budget de temps commun : on renvoie ce qui est arrivé à temps.
+"""
+import asyncio
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+
+class BackendClient:
+    """Recherches médecins / centres de santé auprès du Backend API."""
+
+    def __init__(
+        self,
+        base_url: str = "http://localhost:3001",
+        budget_s: float = 3.0,
+        max_connections: int = 50,
+        service_token: Optional[str] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.budget_s = budget_s
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={"X-Service-Token": service_token} if service_token else None,
+            timeout=httpx.Timeout(budget_s),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=30,
+            ),
+        )
+
+    @classmethod
+    def from_env(cls) -> "BackendClient":
+        return cls(
+            base_url=os.getenv("BACKEND_API_URL", "http://localhost:3001"),
+            budget_s=float(os.getenv("ENRICHMENT_BUDGET_S", "3")),
+            max_connections=int(os.getenv("BACKEND_MAX_CONNECTIONS", "50")),
+            service_token=os.getenv("AI_SERVICE_TOKEN") or None,
+        )
+
+    async def get_doctors(self, specialties: List[str]) -> List[Dict[str, Any]]:
+        response = await self.client.get(
+            "/api/ai/doctors", params={"specialties": ",".join(specialties)}
+        )
+        response.raise_for_status()
+        return response.json().get("doctors", [])
+
+    async def get_health_centers(self, latitude: str, longitude: str) -> List[Dict[str, Any]]:
+        response = await self.client.get(
+            "/api/ai/health-centers", params={"latitude": latitude, "longitude": longitude}
+        )
+        response.raise_for_status()
+        return response.json().get("healthCenters", [])
+
+    async def export_health_centers(self) -> List[Dict[str, Any]]:
+        """Table HealthCenter complète (géolocalisée) pour l'index spatial local."""
+        response = await self.client.get("/api/healthcenters/export", timeout=30)
+        response.raise_for_status()
+        return response.json().get("healthCenters", [])
+
+    async def export_doctors(self, since: Optional[str] = None) -> Dict[str, Any]:
+        """Médecins modifiés depuis `since` (tous si None) + ids existants, pour l'index local."""
+        response = await self.client.get(
+            "/api/ai/doctors/export", params={"since": since} if since else None, timeout=30
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def enrich(
+        self,
+        specialties: List[str],
+        latitude: str,
+        longitude: str,
+        budget_s: Optional[float] = None,
+        lookups: Sequence[str] = ("recommended_doctors", "health_centers"),
+        memo: Optional[Dict[Tuple, asyncio.Task]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Lance les recherches `lookups` en parallèle et attend au plus `budget_s`.
+        Retourne les résultats disponibles + la liste des étapes en échec.
+
+        `memo` (partagé par les éléments d'un lot) réutilise la même requête
+        pour des paramètres identiques ; l'appelant annule ses tâches restantes.
+        """
+        budget = budget_s if budget_s is not None else self.budget_s
+        calls = {
+            "recommended_doctors": (tuple(specialties), lambda: self.get_doctors(specialties)),
+            "health_centers": ((latitude, longitude), lambda: self.get_health_centers(latitude, longitude)),
+        }
+        tasks = {}
+        for key in lookups:
+            params, call = calls[key]
+            if memo is None:
+                tasks[key] = asyncio.create_task(call())
+            else:
+                if (key, params) not in memo:
+                    memo[(key, params)] = asyncio.create_task(call())
+                tasks[key] = memo[(key, params)]
+        enrichment: Dict[str, Any] = {key: [] for key in lookups}
+        if not tasks:
+            return enrichment
+        done, pending = await asyncio.wait(tasks.values(), timeout=budget)
+        if memo is None:
+            for task in pending:
+                task.cancel()
+
+        errors: Dict[str, str] = {}
+        for key, task in tasks.items():
+            if task in pending:
+                errors[key] = f"timeout ({budget}s)"
+            elif task.exception() is not None:
+                exc = task.exception()
+                errors[key] = f"{type(exc).__name__}: {exc}"
+            else:
+                enrichment[key] = list(task.result())
+
+        if errors:
+            enrichment["enrichment_errors"] = errors
+        return enrichment
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
@@ -0,0 +1,95 @@
+"""
+Cascade de modèles : 8B instantané d'abord, 70B si nécessaire
+
+Le petit modèle répond en premier. On passe au grand modèle seulement si sa
+réponse est invalide, jugée grave (high/urgent, signes d'alerte) ou peu sûre
+(confidence_level "faible"). Les cas urgents gardent ainsi le 70B tandis que
+les cas bénins coûtent une fraction du temps et du quota.
+"""
+import logging
+import os
+import time
+from collections import defaultdict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple, Type
+
+MODEL_SMALL = "llama-3.1-8b-instant"
+MODEL_LARGE = "llama-3.3-70b-versatile"
+
+logger = logging.getLogger("santekene.ai.cascade")
+
+
+class ModelCascade:
+    """Routage petit modèle -> grand modèle, avec décisions et latences par palier."""
+
+    def __init__(self, enabled: bool = False, small_model: str = MODEL_SMALL, large_model: str = MODEL_LARGE):
+        self.enabled = enabled
+        self.small_model = small_model
+        self.large_model = large_model
+        self.decisions: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._latencies: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=1000))
+        self._calls: Dict[str, int] = defaultdict(int)
+
+    @classmethod
+    def from_env(cls) -> "ModelCascade":
+        return cls(
+            enabled=os.getenv("MODEL_CASCADE", "0") == "1",
+            small_model=os.getenv("GROQ_MODEL_SMALL", MODEL_SMALL),
+            large_model=os.getenv("GROQ_MODEL_LARGE", MODEL_LARGE),
+        )
+
+    async def _timed(self, tier: str, call: Callable[[str], Awaitable[dict]], model: str) -> dict:
+        start = time.perf_counter()
+        try:
+            return await call(model)
+        finally:
+            self._latencies[tier].append(time.perf_counter() - start)
+            self._calls[tier] += 1
+
+    async def run(
+        self,
+        endpoint: str,
+        call: Callable[[str], Awaitable[dict]],
+        escalation_reason: Callable[[dict], Optional[str]],
+        invalid_errors: Tuple[Type[BaseException], ...] = (),
+    ) -> dict:
+        """
+        `call(model)` exécute la complétion et retourne le JSON brut.
+        `escalation_reason(result)` retourne None si la réponse du petit
+        modèle suffit, sinon la raison du passage au grand modèle.
+        """
+        if not self.enabled:
+            self.decisions[endpoint]["large_only"] += 1
+            return await self._timed("large", call, self.large_model)
+
+        try:
+            result = await self._timed("small", call, self.small_model)
+            reason = escalation_reason(result)
+        except invalid_errors:
+            reason = "invalid_json"
+
+        if reason is None:
+            self.decisions[endpoint]["served_small"] += 1
+            return result
+
+        self.decisions[endpoint][f"escalated_{reason}"] += 1
+        logger.info(
+            "⬆️  Cascade: passage au grand modèle",
+            extra={"endpoint": endpoint, "model": self.large_model, "reason": reason},
+        )
+        return await self._timed("large", call, self.large_model)
+
+    def stats(self) -> Dict[str, Any]:
+        tiers = {}
+        for tier, samples in self._latencies.items():
+            ordered = sorted(samples)
+            tiers[tier] = {
+                "model": self.small_model if tier == "small" else self.large_model,
+                "calls": self._calls[tier],
+                "latency_s_mean": round(sum(ordered) / len(ordered), 4) if ordered else 0.0,
+                "latency_s_p95": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 4) if ordered else 0.0,
+            }
+        return {
+            "enabled": self.enabled,
+            "decisions": {endpoint: dict(counts) for endpoint, counts in self.decisions.items()},
+            "tiers": tiers,
+        }
@@ -0,0 +1,125 @@
+"""
+Compression des réponses (Brotli / gzip)
+
+Middleware ASGI : une réponse complète (un seul message de corps) de type
+JSON ou texte est compressée selon Accept-Encoding, Brotli si le paquet
+`brotli` est installé et accepté par le client, sinon gzip. Le JSON de
+triage complet (texte français répétitif) perd 60 à 65 % de sa taille
+(bench/load_test.py), ce qui compte sur un lien 2G/3G. Les flux (SSE, NDJSON)
+passent tels quels : compresser par morceaux retarderait les événements que
+le client affiche au fil de l'eau. Les corps trop petits et les 304 (sans
+corps) ne sont pas touchés non plus.
+"""
+import gzip
+from typing import Any, Callable, Dict, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from services.observability import RESPONSE_BYTES
+
+try:
+    import brotli
+except ImportError:  # dépendance optionnelle : gzip seul
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+STREAMING_TYPES = ("text/event-stream", "application/x-ndjson")
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """"br;q=1.0, gzip;q=0.8, *;q=0" -> {"br": 1.0, "gzip": 0.8, "*": 0.0}"""
+    weights: Dict[str, float] = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name] = quality
+    return weights
+
+
+def choose_encoding(header: Optional[str], brotli_available: bool = brotli is not None) -> Optional[str]:
+    """Encodage retenu (br préféré à gzip à qualité égale) ou None pour ne pas compresser."""
+    if not header:
+        return None
+    weights = parse_accept_encoding(header)
+    wildcard = weights.get("*", 0.0)
+    candidates = (["br"] if brotli_available else []) + ["gzip"]
+    best, best_quality = None, 0.0
+    for encoding in candidates:
+        quality = weights.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class CompressionMiddleware:
+    """Compresse les réponses JSON complètes ; laisse passer les flux."""
+
+    def __init__(self, app: Callable, minimum_size: int = 512, gzip_level: int = 6, brotli_quality: int = 5):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    def _eligible(self, headers: MutableHeaders, body: bytes, more_body: bool) -> bool:
+        content_type = headers.get("content-type", "")
+        return (
+            not more_body
+            and len(body) >= self.minimum_size
+            and "content-encoding" not in headers
+            and content_type.startswith(COMPRESSIBLE_TYPES)
+            and not content_type.startswith(STREAMING_TYPES)
+        )
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Dict[str, Any]] = None
+        passthrough = False
+
+        async def send_compressed(message: Dict[str, Any]) -> None:
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                # Retenu jusqu'au premier corps : les en-têtes dépendent de la compression
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough or start is None:
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            if not self._eligible(headers, body, message.get("more_body", False)):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+            compressed = self.compress(body, encoding)
+            RESPONSE_BYTES.labels(encoding, "raw").inc(len(body))
+            RESPONSE_BYTES.labels(encoding, "sent").inc(len(compressed))
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
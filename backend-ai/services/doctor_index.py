@@ -0,0 +1,238 @@
+"""
+Index local spécialité -> médecins
+
+getRecommendedDoctors filtrait la table Doctor par `contains` sur le texte
+libre renvoyé par le LLM : balayage complet et souvent aucun résultat
+("Cardiologie et maladies cardiovasculaires" ne contient pas "Cardiologie"
+côté médecin, etc.). Ici, spécialités du modèle et spécialités déclarées par
+les médecins sont ramenées au même vocabulaire (les 15 domaines du prompt de
+triage + médecine générale, avec synonymes, sans accents) et un index inversé
+vocabulaire -> médecins est tenu en mémoire. Il est rechargé de façon
+incrémentale depuis GET /api/ai/doctors/export?since=...
+"""
+import asyncio
+import os
+import re
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from services.triage_cache import fold_accents
+
+# Clé canonique -> (libellé, synonymes repliés sans accents)
+SPECIALTY_VOCABULARY: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "urgences": ("Urgences et traumatologie", ("urgence", "urgences", "urgentiste", "reanimation", "reanimateur", "samu")),
+    "cardiologie": ("Cardiologie", ("cardiologie", "cardiologue", "cardio", "cardiovasculaire", "cardiovasculaires", "coeur")),
+    "pneumologie": ("Pneumologie", ("pneumologie", "pneumologue", "pneumo", "respiratoire", "respiratoires", "poumon", "poumons")),
+    "neurologie": ("Neurologie", ("neurologie", "neurologue", "neuro", "neurologique", "neurologiques")),
+    "gastro_enterologie": (
+        "Gastro-entérologie",
+        ("gastro enterologie", "gastroenterologie", "gastro enterologue", "gastroenterologue", "gastro", "digestif", "digestifs", "hepato gastro"),
+    ),
+    "dermatologie": ("Dermatologie", ("dermatologie", "dermatologue", "dermato", "peau", "venerologie")),
+    "orl": ("ORL", ("orl", "oto rhino laryngologie", "otorhinolaryngologie", "oto rhino", "otorhino")),
+    "orthopedie": ("Orthopédie et traumatologie", ("orthopedie", "orthopediste", "chirurgie orthopedique", "traumatologie", "traumatologue")),
+    "pediatrie": ("Pédiatrie", ("pediatrie", "pediatre", "neonatologie", "enfant", "enfants")),
+    "gynecologie": ("Gynécologie", ("gynecologie", "gynecologue", "gyneco", "obstetrique", "obstetricien", "sage femme", "maternite")),
+    "ophtalmologie": ("Ophtalmologie", ("ophtalmologie", "ophtalmologue", "ophtalmo", "oculiste", "yeux")),
+    "psychiatrie": ("Psychiatrie", ("psychiatrie", "psychiatre", "sante mentale", "psychologue", "psychologie")),
+    "infectiologie": ("Infectiologie", ("infectiologie", "infectiologue", "maladies infectieuses", "infectieuses", "tropicale", "tropicales")),
+    "endocrinologie": ("Endocrinologie", ("endocrinologie", "endocrinologue", "endocrino", "diabetologie", "diabetologue", "diabete", "thyroide")),
+    "rhumatologie": ("Rhumatologie", ("rhumatologie", "rhumatologue", "rhumato", "articulaire", "articulaires", "arthrose")),
+    "medecine_generale": (
+        "Médecine générale",
+        ("medecine generale", "medecin generaliste", "generaliste", "medecine de famille", "medecin de famille", "medecine interne", "interniste"),
+    ),
+}
+
+GENERAL_PRACTICE = "medecine_generale"
+
+_NON_WORD_RE = re.compile(r"[^a-z0-9]+")
+
+# Libellés complets du prompt ("Cardiologie et maladies cardiovasculaires") -> clé
+_EXACT_LABELS: Dict[str, str] = {}
+_SYNONYMS: Dict[str, str] = {}
+for _key, (_label, _synonyms) in SPECIALTY_VOCABULARY.items():
+    for _synonym in _synonyms:
+        _SYNONYMS[_synonym] = _key
+_PROMPT_DOMAINS = {
+    "Urgences et traumatologie": "urgences",
+    "Cardiologie et maladies cardiovasculaires": "cardiologie",
+    "Pneumologie et troubles respiratoires": "pneumologie",
+    "Gastro-entérologie et troubles digestifs": "gastro_enterologie",
+    "Orthopédie et traumatologie": "orthopedie",
+    "Infectiologie et maladies infectieuses": "infectiologie",
+    "Psychiatrie et santé mentale": "psychiatrie",
+}
+for _label, _key in list(_PROMPT_DOMAINS.items()) + [(label, key) for key, (label, _) in SPECIALTY_VOCABULARY.items()]:
+    _EXACT_LABELS[_NON_WORD_RE.sub(" ", fold_accents(_label)).strip()] = _key
+
+# Synonymes les plus longs d'abord ("medecine interne" avant "interne")
+_SYNONYM_RE = re.compile(
+    r"\b(" + "|".join(re.escape(s) for s in sorted(_SYNONYMS, key=len, reverse=True)) + r")\b"
+)
+
+
+def _normalize(text: str) -> str:
+    return _NON_WORD_RE.sub(" ", fold_accents(text or "")).strip()
+
+
+def resolve_specialties(text: str) -> List[str]:
+    """Clés du vocabulaire citées dans un libellé libre, dans l'ordre d'apparition."""
+    normalized = _normalize(text)
+    if not normalized:
+        return []
+    # Parenthèses du prompt : "Neurologie (maux de tête, vertiges...)" -> "Neurologie"
+    head = _normalize((text or "").split("(")[0])
+    exact = _EXACT_LABELS.get(normalized) or _EXACT_LABELS.get(head)
+    if exact:
+        return [exact]
+    keys: List[str] = []
+    for match in _SYNONYM_RE.finditer(normalized):
+        key = _SYNONYMS[match.group(1)]
+        if key not in keys:
+            keys.append(key)
+    return keys
+
+
+class DoctorSnapshot:
+    """Instantané immuable : fiches par id + index inversé clé -> ids classés."""
+
+    def __init__(self, doctors: Dict[int, Dict[str, Any]]):
+        self.doctors = doctors
+        postings: Dict[str, List[Tuple[int, int, int]]] = defaultdict(list)
+        self.unresolved = 0
+        for doctor_id, doctor in doctors.items():
+            keys = resolve_specialties(doctor.get("specialty") or "")
+            if not keys:
+                self.unresolved += 1
+            has_phone = 0 if (doctor.get("doctorPhone") or doctor.get("phone")) else 1
+            for rank, key in enumerate(keys):
+                # Spécialité principale avant secondaire, puis médecins joignables
+                postings[key].append((min(rank, 1), has_phone, doctor_id))
+        self.index: Dict[str, List[int]] = {key: [d for _, _, d in sorted(p)] for key, p in postings.items()}
+
+    def __len__(self) -> int:
+        return len(self.doctors)
+
+
+class DoctorIndex:
+    """Index rechargé en arrière-plan (complet puis incrémental)."""
+
+    def __init__(
+        self,
+        loader: Callable[[Optional[str]], Awaitable[Dict[str, Any]]],
+        refresh_s: float = 60.0,
+        full_refresh_s: float = 3600.0,
+    ):
+        self.loader = loader
+        self.refresh_s = refresh_s
+        self.full_refresh_s = full_refresh_s
+        self.snapshot: Optional[DoctorSnapshot] = None
+        self.cursor: Optional[str] = None
+        self.refreshed_at = 0.0
+        self.full_refreshed_at = 0.0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.last_changes = 0
+        self.last_error: Optional[str] = None
+        self.lookups = 0
+        self.misses = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls, loader: Callable[[Optional[str]], Awaitable[Dict[str, Any]]]) -> "DoctorIndex":
+        return cls(
+            loader,
+            refresh_s=float(os.getenv("DOCTOR_INDEX_REFRESH_S", "60")),
+            full_refresh_s=float(os.getenv("DOCTOR_INDEX_FULL_REFRESH_S", "3600")),
+        )
+
+    @property
+    def ready(self) -> bool:
+        return self.snapshot is not None and len(self.snapshot) > 0
+
+    async def refresh(self) -> None:
+        full = self.snapshot is None or time.time() - self.full_refreshed_at >= self.full_refresh_s
+        try:
+            payload = await self.loader(None if full else self.cursor)
+            doctors = {} if full else dict(self.snapshot.doctors)
+            changed = payload.get("doctors", [])
+            for doctor in changed:
+                doctors[doctor["id"]] = doctor
+            if "ids" in payload:
+                # Médecins supprimés depuis le dernier passage
+                alive = set(payload["ids"])
+                doctors = {i: d for i, d in doctors.items() if i in alive}
+            if full or changed or len(doctors) != len(self.snapshot.doctors):
+                self.snapshot = await asyncio.to_thread(DoctorSnapshot, doctors)
+        except Exception as e:
+            self.refresh_errors += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+        else:
+            self.cursor = payload.get("generatedAt")
+            self.refreshes += 1
+            self.last_changes = len(changed)
+            self.refreshed_at = time.time()
+            if full:
+                self.full_refreshed_at = self.refreshed_at
+            self.last_error = None
+
+    def lookup(self, specialties: List[str], limit: int = 5) -> List[Dict[str, Any]]:
+        """
+        Meilleurs médecins pour les spécialités du modèle, dans leur ordre ;
+        médecine générale si aucune ne correspond à un médecin connu.
+        """
+        snapshot = self.snapshot
+        if snapshot is None:
+            return []
+        self.lookups += 1
+        keys: List[str] = []
+        for specialty in specialties:
+            keys += [k for k in resolve_specialties(specialty) if k not in keys]
+
+        selected: List[int] = []
+        for key in keys:
+            selected += [d for d in snapshot.index.get(key, []) if d not in selected][: limit - len(selected)]
+            if len(selected) >= limit:
+                break
+        if not selected:
+            self.misses += 1
+            selected = snapshot.index.get(GENERAL_PRACTICE, [])[:limit]
+        return [dict(snapshot.doctors[d]) for d in selected]
+
+    async def _run(self) -> None:
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.refresh_s)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self.snapshot
+        now = time.time()
+        return {
+            "ready": self.ready,
+            "size": len(snapshot) if snapshot is not None else 0,
+            "specialties": len(snapshot.index) if snapshot is not None else 0,
+            "unresolved_specialty": snapshot.unresolved if snapshot is not None else 0,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "last_changes": self.last_changes,
+            "last_error": self.last_error,
+            "age_s": round(now - self.refreshed_at, 1) if self.refreshed_at else None,
+            "full_refresh_age_s": round(now - self.full_refreshed_at, 1) if self.full_refreshed_at else None,
+            "lookups": self.lookups,
+            "fallback_general_practice": self.misses,
+        }
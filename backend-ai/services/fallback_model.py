@@ -0,0 +1,286 @@
+"""
+Classifieur de secours hors ligne pour le triage
+
+Quand Groq est en panne, trop lent ou hors budget, le triage était remplacé
+par la même réponse « moderate / CENTRE_SANTE » pour tout le monde. Ce module
+sert à la place une prédiction locale (gravité, type de structure,
+spécialité) : TF-IDF sur mots et bigrammes hachés + régression logistique
+multinomiale par tête, en NumPy pur. Le modèle est entraîné hors ligne
+(scripts/train_fallback_model.py) à partir des triages du LLM journalisés par
+OutcomeLog, et chargé au démarrage depuis des .npy ouverts en mémoire mappée.
+Chaque prédiction porte sa confiance ; en dessous du seuil, la réponse est
+marquée à revoir par un professionnel de santé.
+"""
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.doctor_index import GENERAL_PRACTICE, SPECIALTY_VOCABULARY, resolve_specialties
+from services.triage_cache import STOPWORDS, fold_accents
+
+SEVERITIES = ("low", "moderate", "high", "urgent")
+FACILITIES = ("PHARMACIE", "CENTRE_SANTE", "CABINET", "HOPITAL", "URGENCES")
+HEADS = ("severity", "facility", "specialty")
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_URGENCY_LEVELS = {"low": 1, "moderate": 2, "high": 3, "urgent": 4}
+_RECOMMENDATIONS = {
+    "urgent": [
+        "Appelez immédiatement les secours ou rendez-vous aux urgences les plus proches",
+        "Ne restez pas seul en attendant les secours",
+    ],
+    "high": [
+        "Consultez un médecin dans les 24 heures",
+        "Retournez aux urgences si les symptômes s'aggravent",
+    ],
+    "moderate": [
+        "Consultez un professionnel de santé dans les prochains jours",
+        "Surveillez l'évolution de vos symptômes",
+    ],
+    "low": [
+        "Reposez-vous et hydratez-vous bien",
+        "Demandez conseil à votre pharmacien",
+        "Consultez si les symptômes persistent ou s'aggravent",
+    ],
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Mots (accents repliés, mots vides retirés) et bigrammes de mots."""
+    words = [w for w in _TOKEN_RE.findall(fold_accents(text or "")) if w not in STOPWORDS]
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+def hash_features(text: str, n_features: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Indices hachés (crc32) et fréquences des termes d'un texte."""
+    counts: Dict[int, int] = {}
+    for token in tokenize(text):
+        index = zlib.crc32(token.encode()) % n_features
+        counts[index] = counts.get(index, 0) + 1
+    indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+    return indices, values
+
+
+def _tfidf(indices: np.ndarray, counts: np.ndarray, idf: np.ndarray) -> np.ndarray:
+    values = np.log1p(counts) * idf[indices]
+    norm = float(np.sqrt(np.dot(values, values)))
+    return values / norm if norm > 0 else values
+
+
+def _softmax(scores: np.ndarray) -> np.ndarray:
+    scores = scores - scores.max(axis=-1, keepdims=True)
+    exp = np.exp(scores)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+def outcome_labels(result: Dict[str, Any]) -> Optional[Dict[str, str]]:
+    """Étiquettes d'entraînement d'un triage du LLM (None si inexploitable)."""
+    severity = result.get("severity")
+    facility = result.get("recommended_facility_type")
+    if severity not in SEVERITIES or facility not in FACILITIES:
+        return None
+    keys: List[str] = []
+    for specialty in result.get("specialties") or []:
+        keys += resolve_specialties(specialty)
+    return {"severity": severity, "facility": facility, "specialty": keys[0] if keys else GENERAL_PRACTICE}
+
+
+class FallbackModel:
+    """Têtes linéaires (gravité, structure, spécialité) sur un TF-IDF haché commun."""
+
+    def __init__(self, idf: np.ndarray, heads: Dict[str, Tuple[List[str], np.ndarray, np.ndarray]], meta: Dict[str, Any]):
+        self.idf = idf
+        self.heads = heads
+        self.meta = meta
+        self.n_features = int(meta["n_features"])
+        self.predictions = 0
+        self.low_confidence = 0
+
+    @classmethod
+    def load(cls, path: str) -> "FallbackModel":
+        """Charge un artefact (meta.json + .npy) ; les matrices restent mappées sur disque."""
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        idf = np.load(os.path.join(path, "idf.npy"), mmap_mode="r")
+        heads = {
+            head: (
+                meta["labels"][head],
+                np.load(os.path.join(path, f"{head}_weights.npy"), mmap_mode="r"),
+                np.load(os.path.join(path, f"{head}_bias.npy"), mmap_mode="r"),
+            )
+            for head in HEADS
+        }
+        return cls(idf, heads, meta)
+
+    def predict(self, text: str) -> Dict[str, Tuple[str, float]]:
+        """(étiquette, probabilité) par tête."""
+        indices, counts = hash_features(text, self.n_features)
+        values = _tfidf(indices, counts, self.idf)
+        predictions = {}
+        for head, (labels, weights, bias) in self.heads.items():
+            scores = values @ weights[indices] + bias if len(indices) else np.array(bias)
+            probabilities = _softmax(scores)
+            best = int(np.argmax(probabilities))
+            predictions[head] = (labels[best], float(probabilities[best]))
+        self.predictions += 1
+        return predictions
+
+    def triage(self, text: str, min_confidence: float) -> Dict[str, Any]:
+        """Résultat au schéma du modèle de triage, avec confiance et drapeau de revue."""
+        predictions = self.predict(text)
+        severity, severity_p = predictions["severity"]
+        facility, facility_p = predictions["facility"]
+        specialty, _ = predictions["specialty"]
+        if severity == "urgent":
+            facility = "URGENCES"
+        confidence = min(severity_p, facility_p)
+        needs_review = confidence < min_confidence
+        if needs_review:
+            self.low_confidence += 1
+        return {
+            "severity": severity,
+            "diagnosis": "Estimation automatique hors ligne (service IA indisponible), à confirmer par un professionnel de santé.",
+            "recommendations": list(_RECOMMENDATIONS[severity]),
+            "specialties": [SPECIALTY_VOCABULARY.get(specialty, SPECIALTY_VOCABULARY[GENERAL_PRACTICE])[0]],
+            "urgency_level": _URGENCY_LEVELS[severity],
+            "recommended_facility_type": facility,
+            "facility_reason": "Estimation locale selon des cas similaires",
+            "fallback_model": {
+                "confidence": round(confidence, 3),
+                "probabilities": {head: round(p, 3) for head, (_, p) in predictions.items()},
+                "needs_review": needs_review,
+                "version": self.meta.get("trained_at"),
+            },
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "samples": self.meta.get("samples"),
+            "trained_at": self.meta.get("trained_at"),
+            "n_features": self.n_features,
+            "predictions": self.predictions,
+            "low_confidence": self.low_confidence,
+        }
+
+
+def _fit_head(
+    rows: Sequence[Tuple[np.ndarray, np.ndarray]],
+    targets: np.ndarray,
+    n_classes: int,
+    n_features: int,
+    epochs: int,
+    learning_rate: float,
+    l2: float,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Régression logistique multinomiale, descente de gradient sur la matrice creuse (CSR)."""
+    n = len(rows)
+    lengths = np.array([len(i) for i, _ in rows])
+    indices = np.concatenate([i for i, _ in rows]) if n else np.zeros(0, dtype=np.int64)
+    values = np.concatenate([v for _, v in rows]) if n else np.zeros(0, dtype=np.float32)
+    row_of = np.repeat(np.arange(n), lengths)
+    # Classes rares (urgences) pondérées à égalité avec les classes fréquentes
+    counts = np.bincount(targets, minlength=n_classes).astype(np.float32)
+    class_weight = np.where(counts > 0, n / (n_classes * np.maximum(counts, 1)), 0.0)
+    sample_weight = class_weight[targets] / n
+    onehot = np.eye(n_classes, dtype=np.float32)[targets]
+
+    weights = np.zeros((n_features, n_classes), dtype=np.float32)
+    bias = np.zeros(n_classes, dtype=np.float32)
+    velocity_w, velocity_b = np.zeros_like(weights), np.zeros_like(bias)
+    for _ in range(epochs):
+        scores = np.zeros((n, n_classes), dtype=np.float32)
+        np.add.at(scores, row_of, values[:, None] * weights[indices])
+        error = (_softmax(scores + bias) - onehot) * sample_weight[:, None]
+        grad_w = np.zeros_like(weights)
+        np.add.at(grad_w, indices, values[:, None] * error[row_of])
+        grad_w += l2 * weights
+        velocity_w = 0.9 * velocity_w - learning_rate * grad_w
+        velocity_b = 0.9 * velocity_b - learning_rate * error.sum(axis=0)
+        weights += velocity_w
+        bias += velocity_b
+    return weights, bias
+
+
+def train(
+    records: Iterable[Dict[str, Any]],
+    path: str,
+    n_features: int = 1 << 15,
+    epochs: int = 300,
+    learning_rate: float = 2.0,
+    l2: float = 1e-4,
+) -> Dict[str, Any]:
+    """Entraîne les trois têtes sur des lignes {"symptoms", "severity", "facility", "specialty"} et écrit l'artefact."""
+    records = [r for r in records if r.get("symptoms")]
+    if not records:
+        raise ValueError("Aucun triage exploitable pour l'entraînement")
+    features = [hash_features(r["symptoms"], n_features) for r in records]
+    document_frequency = np.zeros(n_features, dtype=np.float32)
+    for indices, _ in features:
+        document_frequency[indices] += 1
+    idf = (np.log((1 + len(records)) / (1 + document_frequency)) + 1).astype(np.float32)
+    rows = [(indices, _tfidf(indices, counts, idf).astype(np.float32)) for indices, counts in features]
+
+    labels = {"severity": list(SEVERITIES), "facility": list(FACILITIES), "specialty": list(SPECIALTY_VOCABULARY)}
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, "idf.npy"), idf)
+    accuracy = {}
+    for head in HEADS:
+        targets = np.array([labels[head].index(r[head]) for r in records])
+        weights, bias = _fit_head(rows, targets, len(labels[head]), n_features, epochs, learning_rate, l2)
+        np.save(os.path.join(path, f"{head}_weights.npy"), weights)
+        np.save(os.path.join(path, f"{head}_bias.npy"), bias)
+        scores = np.stack([v @ weights[i] + bias for i, v in rows])
+        accuracy[head] = round(float(np.mean(scores.argmax(axis=1) == targets)), 4)
+
+    meta = {
+        "n_features": n_features,
+        "labels": labels,
+        "samples": len(records),
+        "train_accuracy": accuracy,
+        "trained_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    return meta
+
+
+class OutcomeLog:
+    """Journal JSONL des triages du LLM (symptômes + étiquettes), source d'entraînement."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    def record(self, symptoms: str, result: Dict[str, Any]) -> None:
+        """Ajoute une ligne ; appelé hors de l'event loop (asyncio.to_thread)."""
+        labels = outcome_labels(result)
+        if labels is None:
+            return
+        line = json.dumps({"ts": round(time.time(), 3), "symptoms": symptoms, **labels}, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self.recorded += 1
+
+
+def read_outcomes(paths: Iterable[str]) -> List[Dict[str, Any]]:
+    """Lignes du journal ; le dernier triage d'un même texte l'emporte."""
+    latest: Dict[str, Dict[str, Any]] = {}
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if all(record.get(key) for key in ("symptoms",) + HEADS):
+                    latest[" ".join(tokenize(record["symptoms"]))] = record
+    return list(latest.values())
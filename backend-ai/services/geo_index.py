@@ -0,0 +1,307 @@
+"""
+Index spatial des centres de santé (plus proches voisins en local)
+
+Le Backend API lisait toute la table HealthCenter et calculait la distance de
+Haversine ligne par ligne à chaque triage localisé. Ici, la liste est chargée
+périodiquement (GET /api/healthcenters/export) dans des tableaux NumPy :
+vecteurs unitaires sur la sphère + type d'établissement déduit du nom. Une
+grille régulière en degrés limite les candidats aux cellules voisines ; leurs
+distances sont calculées en un seul produit vectoriel. Les recherches filtrent
+sur `recommended_facility_type` (urgences -> hôpitaux, etc.).
+"""
+import asyncio
+import math
+import os
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.triage_cache import fold_accents
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEG = math.pi * EARTH_RADIUS_KM / 180
+
+# Au-delà, les anneaux de la grille coûtent plus cher (O(rayon²)) qu'un
+# parcours vectorisé de tous les centres : on bascule sur ce dernier
+RING_SCAN_MAX_KM = 300.0
+
+FACILITY_TYPES = ("URGENCES", "HOPITAL", "CENTRE_SANTE", "CABINET", "PHARMACIE")
+
+# Mots du nom (replié, sans accents) -> type d'établissement, dans l'ordre de priorité
+_NAME_KEYWORDS: Sequence[Tuple[str, Tuple[str, ...]]] = (
+    ("URGENCES", ("urgence", "samu", "emergency")),
+    ("HOPITAL", ("hopital", "hospital", " chu ", "csref", "polyclinique", "clinique", "clinic")),
+    ("PHARMACIE", ("pharmacie", "pharmacy", "officine")),
+    ("CABINET", ("cabinet", "dr ", "docteur")),
+    ("CENTRE_SANTE", ("cscom", "centre de sante", "dispensaire", "maternite", "health")),
+)
+
+# Types servis pour chaque recommandation, par paliers : le palier suivant ne
+# complète la liste que s'il manque des établissements (les hôpitaux reçoivent les urgences)
+FACILITY_TIERS: Dict[str, Tuple[Tuple[str, ...], ...]] = {
+    "URGENCES": (("URGENCES", "HOPITAL"),),
+    "HOPITAL": (("HOPITAL", "URGENCES"),),
+    "CENTRE_SANTE": (("CENTRE_SANTE",), ("HOPITAL",)),
+    "CABINET": (("CABINET",), ("CENTRE_SANTE",)),
+    "PHARMACIE": (("PHARMACIE",),),
+}
+
+
+def infer_facility_type(name: str, osm_type: Optional[str] = None) -> str:
+    """Type d'établissement d'après le nom (la table HealthCenter n'a pas de colonne type)."""
+    folded = f" {fold_accents(name or '')} "
+    for facility_type, keywords in _NAME_KEYWORDS:
+        if any(keyword in folded for keyword in keywords):
+            return facility_type
+    if osm_type in ("hospital", "clinic"):
+        return "HOPITAL"
+    if osm_type == "doctors":
+        return "CABINET"
+    if osm_type == "pharmacy":
+        return "PHARMACIE"
+    return "CENTRE_SANTE"
+
+
+def valid_coordinates(latitude: float, longitude: float) -> bool:
+    """Coordonnées finies et dans les bornes WGS84."""
+    return (
+        math.isfinite(latitude) and math.isfinite(longitude)
+        and -90.0 <= latitude <= 90.0 and -180.0 <= longitude <= 180.0
+    )
+
+
+def _unit_vectors(lat_deg: np.ndarray, lon_deg: np.ndarray) -> np.ndarray:
+    lat = np.radians(lat_deg)
+    lon = np.radians(lon_deg)
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+class GeoIndex:
+    """Instantané immuable : tableaux NumPy + grille (cellule -> indices)."""
+
+    def __init__(self, centers: List[Dict[str, Any]], cell_deg: float = 0.25):
+        self.cell_deg = cell_deg
+        self.centers = [c for c in centers if c.get("latitude") is not None and c.get("longitude") is not None]
+        count = len(self.centers)
+        self.lat = np.fromiter((float(c["latitude"]) for c in self.centers), dtype=np.float64, count=count)
+        self.lon = np.fromiter((float(c["longitude"]) for c in self.centers), dtype=np.float64, count=count)
+        self.xyz = _unit_vectors(self.lat, self.lon) if count else np.empty((0, 3))
+        types = [infer_facility_type(c.get("name", ""), c.get("type")) for c in self.centers]
+        self.types = np.array([FACILITY_TYPES.index(t) for t in types], dtype=np.int8)
+        self.type_counts = dict(Counter(types))
+
+        # Grille tous types (-1) et une grille par type : (type, ligne, colonne) -> indices
+        self.cells: Dict[Tuple[int, int, int], np.ndarray] = {}
+        if count:
+            rows = np.floor(self.lat / cell_deg).astype(np.int64)
+            cols = np.floor(self.lon / cell_deg).astype(np.int64)
+            for grid, members in [(-1, np.arange(count))] + [
+                (t, np.flatnonzero(self.types == t)) for t in np.unique(self.types)
+            ]:
+                order = members[np.lexsort((cols[members], rows[members]))]
+                keys = np.stack([rows[order], cols[order]], axis=1)
+                boundaries = np.flatnonzero(np.any(np.diff(keys, axis=0) != 0, axis=1)) + 1
+                for chunk in np.split(order, boundaries):
+                    self.cells[(int(grid), int(rows[chunk[0]]), int(cols[chunk[0]]))] = chunk
+            self.row_range = (int(rows.min()), int(rows.max()))
+            self.col_range = (int(cols.min()), int(cols.max()))
+
+    def __len__(self) -> int:
+        return len(self.centers)
+
+    @property
+    def cell_count(self) -> int:
+        return sum(1 for key in self.cells if key[0] == -1)
+
+    def _ring(self, grids: Sequence[int], row: int, col: int, radius: int) -> List[np.ndarray]:
+        """Cellules non vides à distance de Tchebychev `radius` de (row, col)."""
+        found = []
+        for r in range(row - radius, row + radius + 1):
+            step = 1 if r in (row - radius, row + radius) else max(1, 2 * radius)
+            for c in range(col - radius, col + radius + 1, step):
+                for grid in grids:
+                    cell = self.cells.get((grid, r, c))
+                    if cell is not None:
+                        found.append(cell)
+        return found
+
+    def _distances(self, candidates: np.ndarray, query: np.ndarray) -> np.ndarray:
+        # Distance orthodromique à partir de la corde entre vecteurs unitaires
+        chord = np.linalg.norm(self.xyz[candidates] - query, axis=1)
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, chord / 2))
+
+    def nearest(
+        self,
+        latitude: float,
+        longitude: float,
+        k: int = 3,
+        facility_types: Optional[Sequence[str]] = None,
+        max_distance_km: Optional[float] = None,
+    ) -> List[Tuple[int, float]]:
+        """(indice, distance km) des k plus proches, filtrés par type si demandé."""
+        if not self.centers or k <= 0 or not valid_coordinates(latitude, longitude):
+            return []
+        query = _unit_vectors(np.array([latitude]), np.array([longitude]))[0]
+        grids = [FACILITY_TYPES.index(t) for t in facility_types if t in FACILITY_TYPES] if facility_types else [-1]
+
+        row = math.floor(latitude / self.cell_deg)
+        col = math.floor(longitude / self.cell_deg)
+        # Marge entre le point et le bord de sa cellule (degrés), pour le critère d'arrêt
+        margin_deg = min(
+            latitude - row * self.cell_deg, (row + 1) * self.cell_deg - latitude,
+            longitude - col * self.cell_deg, (col + 1) * self.cell_deg - longitude,
+        )
+        max_radius = max(
+            abs(row - self.row_range[0]), abs(row - self.row_range[1]),
+            abs(col - self.col_range[0]), abs(col - self.col_range[1]),
+        )
+        ring_limit = math.ceil(RING_SCAN_MAX_KM / (self.cell_deg * KM_PER_DEG))
+        best_idx = np.empty(0, dtype=np.int64)
+        best_dist = np.empty(0)
+        for radius in range(min(max_radius, ring_limit) + 1):
+            cells = self._ring(grids, row, col, radius)
+            if cells:
+                candidates = np.concatenate(cells) if len(cells) > 1 else cells[0]
+                if candidates.size:
+                    dist = self._distances(candidates, query)
+                    best_idx = np.concatenate([best_idx, candidates])
+                    best_dist = np.concatenate([best_dist, dist])
+                    if best_dist.size > k:
+                        keep = np.argpartition(best_dist, k - 1)[:k]
+                        best_idx, best_dist = best_idx[keep], best_dist[keep]
+            # Minorant de la distance de tout point hors des anneaux déjà visités
+            edge_lat = min(89.0, abs(latitude) + (radius + 1) * self.cell_deg)
+            bound_km = (radius * self.cell_deg + margin_deg) * KM_PER_DEG * math.cos(math.radians(edge_lat))
+            if max_distance_km is not None and bound_km > max_distance_km:
+                break
+            if best_dist.size == k and best_dist.max() <= bound_km:
+                break
+        else:
+            if max_radius > ring_limit:
+                # Point loin de tous les centres : parcours complet plutôt que des milliers d'anneaux
+                candidates = np.arange(len(self.centers))
+                if grids != [-1]:
+                    candidates = candidates[np.isin(self.types, grids)]
+                best_idx, best_dist = candidates, self._distances(candidates, query)
+                if best_dist.size > k:
+                    keep = np.argpartition(best_dist, k - 1)[:k]
+                    best_idx, best_dist = best_idx[keep], best_dist[keep]
+
+        order = np.argsort(best_dist)
+        results = [(int(best_idx[i]), float(best_dist[i])) for i in order]
+        if max_distance_km is not None:
+            results = [(i, d) for i, d in results if d <= max_distance_km]
+        return results
+
+
+class HealthCenterIndex:
+    """Index rechargé en arrière-plan ; les recherches lisent l'instantané courant."""
+
+    def __init__(
+        self,
+        loader: Callable[[], Awaitable[List[Dict[str, Any]]]],
+        refresh_s: float = 300.0,
+        cell_deg: float = 0.25,
+    ):
+        self.loader = loader
+        self.refresh_s = refresh_s
+        self.cell_deg = cell_deg
+        self.index: Optional[GeoIndex] = None
+        self.refreshed_at = 0.0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.last_error: Optional[str] = None
+        self.queries = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls, loader: Callable[[], Awaitable[List[Dict[str, Any]]]]) -> "HealthCenterIndex":
+        return cls(
+            loader,
+            refresh_s=float(os.getenv("GEO_INDEX_REFRESH_S", "300")),
+            cell_deg=float(os.getenv("GEO_INDEX_CELL_DEG", "0.25")),
+        )
+
+    @property
+    def ready(self) -> bool:
+        return self.index is not None and len(self.index) > 0
+
+    async def refresh(self) -> None:
+        try:
+            centers = await self.loader()
+            # Construction hors de l'event loop, puis remplacement atomique de l'instantané
+            self.index = await asyncio.to_thread(GeoIndex, centers, self.cell_deg)
+        except Exception as e:
+            self.refresh_errors += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+        else:
+            self.refreshes += 1
+            self.refreshed_at = time.time()
+            self.last_error = None
+
+    def nearest(
+        self,
+        latitude: float,
+        longitude: float,
+        facility_type: Optional[str] = None,
+        k: int = 3,
+        max_distance_km: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Les k établissements les plus proches du type recommandé, palier par
+        palier (FACILITY_TIERS), complétés par les plus proches de tout type.
+        """
+        index = self.index
+        if index is None:
+            return []
+        self.queries += 1
+        hits: List[Tuple[int, float]] = []
+        for types in FACILITY_TIERS.get(facility_type or "", ()) + (None,):
+            if len(hits) >= k:
+                break
+            seen = {i for i, _ in hits}
+            found = index.nearest(latitude, longitude, k + len(hits), types, max_distance_km)
+            hits += [(i, d) for i, d in found if i not in seen][: k - len(hits)]
+
+        results = []
+        for i, distance in hits:
+            center = dict(index.centers[i])
+            center["distance"] = round(distance, 1)
+            center["facility_type"] = FACILITY_TYPES[index.types[i]]
+            results.append(center)
+        return results
+
+    async def _run(self) -> None:
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.refresh_s)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        index = self.index
+        return {
+            "ready": self.ready,
+            "size": len(index) if index is not None else 0,
+            "cells": index.cell_count if index is not None else 0,
+            "by_type": index.type_counts if index is not None else {},
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "last_error": self.last_error,
+            "age_s": round(time.time() - self.refreshed_at, 1) if self.refreshed_at else None,
+            "queries": self.queries,
+        }
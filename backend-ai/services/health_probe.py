@@ -0,0 +1,214 @@
+"""
+Sonde de santé Groq en arrière-plan + disjoncteur (circuit breaker)
+
+La sonde interroge Groq à intervalle régulier (liste des modèles : valide la
+clé et la connectivité sans consommer de quota de complétion) et garde le
+statut en mémoire : /health le sert en O(1). Le disjoncteur s'ouvre après
+des échecs consécutifs des complétions ou de la sonde (une erreur 4xx de la
+sonde, ex. clé refusée sur /models, n'est pas une panne) ; tant qu'il est
+ouvert, les complétions échouent en quelques microsecondes au lieu
+d'attendre le timeout.
+Avec plusieurs workers, l'ouverture est publiée dans l'état partagé : les
+autres workers l'adoptent au lieu d'accumuler chacun leurs propres échecs.
+"""
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from services.shared_state import SharedState
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Clé de l'état partagé : fin d'ouverture du circuit (horodatage epoch)
+SHARED_CIRCUIT_KEY = "groq:circuit_open_until"
+
+
+class CircuitOpenError(Exception):
+    """Groq est considéré indisponible : appel refusé sans contacter l'amont."""
+
+
+class CircuitBreaker:
+    """Disjoncteur fermé / ouvert / semi-ouvert autour des appels Groq."""
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout_s: float = 30.0,
+        shared: Optional[SharedState] = None,
+        sync_interval_s: float = 1.0,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self.shared = shared
+        self.sync_interval_s = sync_interval_s
+        self._synced_at = float("-inf")
+        self.adopted = 0
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self.rejected = 0
+        self.trips = 0
+
+    @classmethod
+    def from_env(cls, shared: Optional[SharedState] = None) -> "CircuitBreaker":
+        return cls(
+            failure_threshold=int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5")),
+            reset_timeout_s=float(os.getenv("CIRCUIT_RESET_S", "30")),
+            shared=shared,
+            sync_interval_s=float(os.getenv("CIRCUIT_SYNC_S", "1")),
+        )
+
+    async def sync(self) -> None:
+        """Adopte une ouverture décidée par un autre worker (lecture au plus toutes les `sync_interval_s`)."""
+        if self.shared is None or self.state != CLOSED:
+            return
+        now = time.monotonic()
+        if now - self._synced_at < self.sync_interval_s:
+            return
+        self._synced_at = now
+        raw = await self.shared.get(SHARED_CIRCUIT_KEY)
+        if raw is None or self.state != CLOSED:
+            return
+        remaining = float(raw) - time.time()
+        if remaining > 0:
+            self.state = OPEN
+            self.opened_at = time.monotonic() - max(0.0, self.reset_timeout_s - remaining)
+            self.adopted += 1
+
+    def before_call(self) -> None:
+        """Lève CircuitOpenError si l'appel doit être refusé."""
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout_s:
+            self.state = HALF_OPEN
+        if self.state == OPEN or (self.state == HALF_OPEN and self._trial_in_flight):
+            self.rejected += 1
+            raise CircuitOpenError("Service Groq indisponible (circuit ouvert)")
+        if self.state == HALF_OPEN:
+            # Un seul appel d'essai à la fois en semi-ouvert
+            self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        if self.state == HALF_OPEN and self.shared is not None:
+            self.shared.defer(self.shared.delete(SHARED_CIRCUIT_KEY))
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self._trial_in_flight = False
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.trip()
+
+    def record_neutral(self) -> None:
+        """Appel terminé sans verdict sur la santé de Groq (ex. 429, 400)."""
+        self._trial_in_flight = False
+
+    def trip(self) -> None:
+        if self.state != OPEN:
+            self.trips += 1
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        if self.shared is not None:
+            until = str(time.time() + self.reset_timeout_s).encode()
+            self.shared.defer(self.shared.set(SHARED_CIRCUIT_KEY, until, self.reset_timeout_s))
+
+    def half_open(self) -> None:
+        """La sonde a réussi : laisser passer un appel d'essai."""
+        if self.state == OPEN:
+            self.state = HALF_OPEN
+            self._trial_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+            "adopted_from_shared": self.adopted,
+        }
+
+
+class GroqHealthProbe:
+    """Sonde périodique de Groq ; statut mis en cache pour /health."""
+
+    def __init__(
+        self,
+        client: Any,
+        breaker: Optional[CircuitBreaker] = None,
+        interval_s: float = 30.0,
+        timeout_s: float = 5.0,
+        failure_threshold: int = 3,
+    ):
+        self.client = client
+        self.breaker = breaker
+        self.interval_s = interval_s
+        self.timeout_s = timeout_s
+        self.failure_threshold = failure_threshold
+        self.consecutive_failures = 0
+        self.status: Dict[str, Any] = {"status": "starting", "groq": "unknown", "checked_at": None}
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls, client: Any, breaker: Optional[CircuitBreaker] = None) -> "GroqHealthProbe":
+        return cls(
+            client,
+            breaker=breaker,
+            interval_s=float(os.getenv("GROQ_HEALTH_INTERVAL_S", "30")),
+            timeout_s=float(os.getenv("GROQ_HEALTH_TIMEOUT_S", "5")),
+            failure_threshold=int(os.getenv("GROQ_HEALTH_FAILURES", "3")),
+        )
+
+    async def probe_once(self) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.client.models.list(), timeout=self.timeout_s)
+        except Exception as e:
+            status_code = getattr(e, "status_code", None)
+            # 4xx (401/403 limité à /models, 404...) : erreur de la sonde, pas une panne de Groq
+            outage = not (isinstance(status_code, int) and status_code < 500)
+            if outage:
+                self.consecutive_failures += 1
+            self.status = {
+                "status": "error",
+                "groq": "disconnected" if outage else "probe_error",
+                "checked_at": datetime.now(timezone.utc).isoformat(),
+                "error": str(e) or type(e).__name__,
+                "error_type": type(e).__name__,
+                "consecutive_failures": self.consecutive_failures,
+            }
+            if outage and self.breaker is not None and self.consecutive_failures >= self.failure_threshold:
+                self.breaker.trip()
+        else:
+            self.consecutive_failures = 0
+            self.status = {
+                "status": "ok",
+                "groq": "connected",
+                "checked_at": datetime.now(timezone.utc).isoformat(),
+                "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+            }
+            if self.breaker is not None:
+                self.breaker.half_open()
+        return self.status
+
+    async def _run(self) -> None:
+        while True:
+            await self.probe_once()
+            await asyncio.sleep(self.interval_s)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
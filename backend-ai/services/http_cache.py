@@ -0,0 +1,52 @@
+"""
+ETag et requêtes conditionnelles
+
+L'ETag est l'empreinte du corps JSON sérialisé : deux réponses construites
+à partir du même résultat (entrée du cache de triage, tâche terminée) ont le
+même ETag. Il est faible (W/) car la représentation envoyée varie selon la
+compression négociée. Sur GET / HEAD, un If-None-Match qui correspond donne
+un 304 sans corps : le client qui interroge une tâche en boucle ne retélécharge
+le résultat que s'il a changé. Les POST renvoient l'ETag sans jamais répondre
+304 (RFC 9110 : une précondition échouée sur POST serait un 412).
+"""
+import hashlib
+from typing import Any, Dict, Optional
+
+import orjson
+from fastapi import Request, Response
+
+from services.observability import NOT_MODIFIED
+
+# Données médicales : cache privé, toujours revalidé
+CACHE_CONTROL = "private, no-cache"
+
+
+def etag(body: bytes) -> str:
+    return 'W/"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def matches(if_none_match: Optional[str], tag: str) -> bool:
+    """Comparaison faible d'If-None-Match (liste d'ETags ou *) avec `tag`."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = tag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+
+def json_response(
+    request: Request,
+    content: Any,
+    endpoint: str,
+    status_code: int = 200,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """Réponse JSON (orjson) avec ETag ; 304 si le client a déjà cette version (GET / HEAD)."""
+    body = orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    tag = etag(body)
+    headers = {"ETag": tag, "Cache-Control": CACHE_CONTROL, **(headers or {})}
+    if request.method in ("GET", "HEAD") and matches(request.headers.get("if-none-match"), tag):
+        NOT_MODIFIED.labels(endpoint).inc()
+        return Response(status_code=304, headers=headers)
+    return Response(body, status_code=status_code, headers=headers, media_type="application/json")
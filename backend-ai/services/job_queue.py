@@ -0,0 +1,333 @@
+"""
+Mode tâche (job) pour les analyses longues
+
+La soumission renvoie tout de suite un identifiant ; un pool borné de workers
+exécute l'analyse et le client interroge (ou attend, long-poll) le résultat.
+Une clé d'idempotence rattache les resoumissions (réseau mobile instable) à la
+tâche existante au lieu de relancer une génération. Tâches et résultats sont
+gardés dans SQLite avec une date d'expiration.
+
+Le fichier SQLite est commun aux workers (mode production multi-workers) :
+une tâche est réclamée atomiquement avant exécution, un seul worker la lance,
+et le long-poll d'une tâche exécutée par un autre worker interroge la base.
+La connexion n'est ouverte qu'au premier accès, dans le worker.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    idempotency_key TEXT,
+    request_hash TEXT NOT NULL,
+    request TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_idempotency ON jobs(kind, idempotency_key);
+CREATE INDEX IF NOT EXISTS jobs_expires_at ON jobs(expires_at);
+"""
+
+
+class JobQueueFull(Exception):
+    """Trop de tâches en attente : rejeter la soumission (503)."""
+
+
+class IdempotencyConflict(Exception):
+    """Clé d'idempotence déjà utilisée pour une requête différente (409)."""
+
+
+class JobFailed(Exception):
+    """Échec de la tâche ; `result` (réponse de repli) est tout de même conservé."""
+
+    def __init__(self, message: str, result: Optional[Dict[str, Any]] = None):
+        super().__init__(message)
+        self.result = result
+
+
+def request_hash(payload: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+
+class JobStore:
+    """Tâches persistées dans SQLite ; appels exécutés hors de l'event loop."""
+
+    def __init__(self, path: str = "jobs.sqlite3", ttl_s: float = 3600.0):
+        self.path = path
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        """Connexion ouverte au premier accès (jamais héritée d'un fork)."""
+        if self._conn is None:
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5.0)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(_SCHEMA)
+            self._conn = db
+        return self._conn
+
+    def _execute(self, sql: str, params: Tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._db.execute(sql, params)
+
+    @staticmethod
+    def _row_to_job(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job = dict(row)
+        job["request"] = json.loads(job["request"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._execute("SELECT * FROM jobs WHERE id = ? AND expires_at > ?", (job_id, time.time())).fetchone()
+        return self._row_to_job(row)
+
+    def create(self, kind: str, payload: Dict[str, Any], idempotency_key: Optional[str]) -> Tuple[Dict[str, Any], bool]:
+        """
+        Crée la tâche, ou retourne (tâche existante, False) pour une clé déjà vue.
+        Une tâche échouée ou expirée libère sa clé.
+        """
+        now = time.time()
+        digest = request_hash(payload)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if idempotency_key:
+                    row = self._db.execute(
+                        "SELECT * FROM jobs WHERE kind = ? AND idempotency_key = ?", (kind, idempotency_key)
+                    ).fetchone()
+                    if row is not None and row["expires_at"] > now and row["status"] != FAILED:
+                        if row["request_hash"] != digest:
+                            raise IdempotencyConflict(idempotency_key)
+                        self._db.execute("COMMIT")
+                        return self._row_to_job(row), False
+                    if row is not None:
+                        self._db.execute("DELETE FROM jobs WHERE id = ?", (row["id"],))
+                job_id = uuid.uuid4().hex
+                self._db.execute(
+                    "INSERT INTO jobs (id, kind, idempotency_key, request_hash, request, status, created_at, updated_at, expires_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, kind, idempotency_key, digest, json.dumps(payload, ensure_ascii=False), QUEUED, now, now, now + self.ttl_s),
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return self.get(job_id), True
+
+    def set_status(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        now = time.time()
+        self._execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ?, expires_at = ? WHERE id = ?",
+            (
+                status,
+                json.dumps(result, ensure_ascii=False) if result is not None else None,
+                error,
+                now,
+                # Le résultat reste disponible `ttl_s` après la fin de la tâche
+                now + self.ttl_s,
+                job_id,
+            ),
+        )
+
+    def claim(self, job_id: str) -> bool:
+        """Passe la tâche en cours si elle est encore en attente ; False si un autre worker l'a prise."""
+        cursor = self._execute(
+            "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status = ?", (RUNNING, time.time(), job_id, QUEUED)
+        )
+        return cursor.rowcount == 1
+
+    def requeue_stale(self, before: float) -> int:
+        """Remet en attente les tâches en cours depuis `before` (worker arrêté pendant l'exécution)."""
+        return self._execute(
+            "UPDATE jobs SET status = ?, updated_at = ? WHERE status = ? AND updated_at < ? AND expires_at > ?",
+            (QUEUED, time.time(), RUNNING, before, time.time()),
+        ).rowcount
+
+    def pending(self) -> list:
+        """Tâches en attente (redémarrage du service ou tâches remises en file)."""
+        rows = self._execute(
+            "SELECT * FROM jobs WHERE status = ? AND expires_at > ? ORDER BY created_at", (QUEUED, time.time())
+        ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def purge_expired(self) -> int:
+        return self._execute("DELETE FROM jobs WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class JobQueue:
+    """Pool borné de workers asyncio au-dessus d'un JobStore."""
+
+    def __init__(
+        self,
+        store: JobStore,
+        handlers: Dict[str, Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]],
+        workers: int = 4,
+        max_pending: int = 200,
+        purge_interval_s: float = 300.0,
+        stale_s: float = 300.0,
+        poll_interval_s: float = 0.25,
+    ):
+        self.store = store
+        self.handlers = handlers
+        self.workers = workers
+        self.max_pending = max_pending
+        self.purge_interval_s = purge_interval_s
+        self.stale_s = stale_s
+        self.poll_interval_s = poll_interval_s
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self._events: Dict[str, asyncio.Event] = {}
+        self._tasks: list = []
+        self.submitted = 0
+        self.attached = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.claimed_elsewhere = 0
+        self.requeued = 0
+
+    @classmethod
+    def from_env(cls, handlers: Dict[str, Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]]) -> "JobQueue":
+        store = JobStore(
+            path=os.getenv("JOB_STORE_PATH", "jobs.sqlite3"),
+            ttl_s=float(os.getenv("JOB_RESULT_TTL_S", "3600")),
+        )
+        return cls(
+            store,
+            handlers,
+            workers=int(os.getenv("JOB_WORKERS", "4")),
+            max_pending=int(os.getenv("JOB_QUEUE_MAX", "200")),
+            stale_s=float(os.getenv("JOB_STALE_S", "300")),
+        )
+
+    async def submit(self, kind: str, payload: Dict[str, Any], idempotency_key: Optional[str] = None) -> Tuple[Dict[str, Any], bool]:
+        """Retourne (tâche, créée) ; une clé déjà vue rattache à la tâche existante."""
+        if self._queue.qsize() >= self.max_pending:
+            self.rejected += 1
+            raise JobQueueFull(f"File de tâches pleine ({self.max_pending} en attente)")
+        job, created = await asyncio.to_thread(self.store.create, kind, payload, idempotency_key)
+        if created:
+            self.submitted += 1
+            self._events[job["id"]] = asyncio.Event()
+            self._queue.put_nowait(job["id"])
+        else:
+            self.attached += 1
+        return job, created
+
+    async def get(self, job_id: str, wait_s: float = 0.0) -> Optional[Dict[str, Any]]:
+        """État de la tâche ; attend jusqu'à `wait_s` qu'elle se termine (long-poll)."""
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if job is None or job["status"] in (DONE, FAILED) or wait_s <= 0:
+            return job
+        deadline = time.monotonic() + wait_s
+        while job is not None and job["status"] not in (DONE, FAILED):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            # Réveil immédiat si la tâche tourne ici ; sinon (autre worker) on interroge la base
+            event = self._events.get(job_id)
+            try:
+                if event is not None:
+                    await asyncio.wait_for(event.wait(), timeout=min(self.poll_interval_s, remaining))
+                else:
+                    await asyncio.sleep(min(self.poll_interval_s, remaining))
+            except asyncio.TimeoutError:
+                pass
+            job = await asyncio.to_thread(self.store.get, job_id)
+        return job
+
+    async def _work(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                job = await asyncio.to_thread(self.store.get, job_id)
+                if job is None or job["status"] in (DONE, FAILED):
+                    continue
+                if not await asyncio.to_thread(self.store.claim, job_id):
+                    self.claimed_elsewhere += 1
+                    continue
+                try:
+                    result = await self.handlers[job["kind"]](job["request"])
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.failed += 1
+                    fallback = e.result if isinstance(e, JobFailed) else None
+                    await asyncio.to_thread(self.store.set_status, job_id, FAILED, fallback, str(e))
+                else:
+                    self.completed += 1
+                    await asyncio.to_thread(self.store.set_status, job_id, DONE, result)
+            finally:
+                event = self._events.pop(job_id, None)
+                if event is not None:
+                    event.set()
+                self._queue.task_done()
+
+    async def _recover(self) -> None:
+        """Relance les tâches en attente et celles laissées en cours par un worker arrêté."""
+        self.requeued += await asyncio.to_thread(self.store.requeue_stale, time.time() - self.stale_s)
+        for job in await asyncio.to_thread(self.store.pending):
+            if job["id"] not in self._events:
+                self._events[job["id"]] = asyncio.Event()
+                self._queue.put_nowait(job["id"])
+
+    async def _purge(self) -> None:
+        while True:
+            await asyncio.sleep(self.purge_interval_s)
+            await asyncio.to_thread(self.store.purge_expired)
+            await self._recover()
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        # Tâches laissées par un arrêt précédent ; chaque worker peut les voir,
+        # la réclamation atomique (claim) garantit une seule exécution
+        await self._recover()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._purge()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "queue_depth": self._queue.qsize(),
+            "submitted": self.submitted,
+            "attached_idempotent": self.attached,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "claimed_elsewhere": self.claimed_elsewhere,
+            "requeued_stale": self.requeued,
+        }
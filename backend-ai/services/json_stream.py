@@ -0,0 +1,68 @@
+"""
+Parseur JSON incrémental pour les réponses en streaming
+
+Reçoit le texte du modèle morceau par morceau et renvoie chaque champ de
+premier niveau dès que sa valeur est fermée (`"red_flags": [...]` complet),
+sans attendre la fin de la complétion.
+"""
+import json
+from typing import Any, List, Tuple
+
+
+class JsonFieldStream:
+    """Extrait les champs de premier niveau d'un objet JSON reçu par morceaux."""
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start = None
+        self.started = False
+        self.finished = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Ajoute un morceau de texte ; retourne les champs complétés par ce morceau."""
+        self.buffer += chunk
+        fields: List[Tuple[str, Any]] = []
+        buf = self.buffer
+        while self._pos < len(buf) and not self.finished:
+            c = buf[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+            elif not self.started:
+                # Ignore tout ce qui précède l'objet (```json, texte parasite)
+                if c == "{":
+                    self.started = True
+                    self._depth = 1
+                    self._member_start = self._pos + 1
+            elif c == '"':
+                self._in_string = True
+            elif c in "{[":
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(buf[self._member_start:self._pos], fields)
+                    self.finished = True
+            elif c == "," and self._depth == 1:
+                self._emit(buf[self._member_start:self._pos], fields)
+                self._member_start = self._pos + 1
+            self._pos += 1
+        return fields
+
+    @staticmethod
+    def _emit(member: str, fields: List[Tuple[str, Any]]) -> None:
+        if not member.strip():
+            return
+        try:
+            parsed = json.loads("{" + member + "}")
+        except ValueError:
+            return
+        fields.extend(parsed.items())
@@ -0,0 +1,255 @@
+"""
+Moteur LLM asynchrone (Groq)
+
+Un seul client AsyncGroq partagé par le processus, une limite de concurrence
+configurable et un timeout par appel : l'event loop uvicorn n'est plus bloquée
+pendant une complétion, un worker peut donc garder des dizaines d'appels en vol.
+Le client est créé au premier appel, dans le worker qui s'en sert (après le
+fork en mode multi-workers), et non à l'import du module.
+"""
+import asyncio
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+from groq import (
+    APIConnectionError,
+    APIStatusError,
+    AsyncGroq,
+    DefaultAsyncHttpxClient,
+    InternalServerError,
+    RateLimitError,
+)
+
+from services.health_probe import CircuitBreaker
+from services.rate_limiter import (
+    PRIORITY_ASSISTANT,
+    GroqScheduler,
+    SchedulerOverloaded,
+    estimate_request_tokens,
+)
+from services.shared_state import SharedState
+
+
+class LLMTimeoutError(Exception):
+    """La complétion a dépassé le timeout configuré."""
+
+
+def _retry_after_s(error: RateLimitError, default: float = 2.0) -> float:
+    """Délai Retry-After annoncé par Groq sur un 429."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(name)
+        if value:
+            try:
+                return float(value) * scale
+            except ValueError:
+                pass
+    return default
+
+
+class _LazyAsyncGroq:
+    """Client AsyncGroq instancié au premier attribut demandé."""
+
+    def __init__(self, **options: Any):
+        self._options = options
+        self._client: Optional[AsyncGroq] = None
+        # Le chargement des certificats (~50 ms) est fait une fois, avant le fork, pas par chaque worker
+        self._ssl_context = httpx.create_ssl_context()
+
+    @property
+    def created(self) -> bool:
+        return self._client is not None
+
+    def __getattr__(self, name: str) -> Any:
+        if self._client is None:
+            self._client = AsyncGroq(http_client=DefaultAsyncHttpxClient(verify=self._ssl_context), **self._options)
+        return getattr(self._client, name)
+
+
+class LLMEngine:
+    """Client Groq asynchrone partagé avec limite de concurrence."""
+
+    def __init__(
+        self,
+        api_key: str,
+        max_concurrency: int = 32,
+        timeout_s: float = 30.0,
+        base_url: Optional[str] = None,
+        client: Optional[Any] = None,
+        scheduler: Optional[GroqScheduler] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.timeout_s = timeout_s
+        self.scheduler = scheduler
+        self.breaker = breaker
+        self.max_concurrency = max_concurrency
+        # Les retries sont gérés par nous (timeout global), pas par le SDK
+        self.client = client or _LazyAsyncGroq(api_key=api_key, base_url=base_url, max_retries=0)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+
+    @classmethod
+    def from_env(cls, api_key: str, shared: Optional[SharedState] = None) -> "LLMEngine":
+        return cls(
+            api_key=api_key,
+            max_concurrency=int(os.getenv("GROQ_MAX_CONCURRENCY", "32")),
+            timeout_s=float(os.getenv("GROQ_TIMEOUT_S", "30")),
+            base_url=os.getenv("GROQ_BASE_URL") or None,
+            scheduler=GroqScheduler.from_env(shared),
+            breaker=CircuitBreaker.from_env(shared),
+        )
+
+    async def complete(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.2,
+        max_tokens: int = 600,
+        timeout_s: Optional[float] = None,
+        priority: int = PRIORITY_ASSISTANT,
+        **kwargs: Any,
+    ):
+        """
+        Exécute une complétion : passage par l'ordonnanceur RPM/TPM (priorité),
+        limite de concurrence et timeout. Un 429 bloque la file jusqu'au
+        Retry-After puis la requête est retentée une fois.
+        """
+        timeout = timeout_s if timeout_s is not None else self.timeout_s
+        cost = estimate_request_tokens(messages, max_tokens)
+        for attempt in range(2):
+            # Circuit ouvert : échec immédiat, sans file d'attente ni appel amont
+            if self.breaker is not None:
+                await self.breaker.sync()
+                self.breaker.before_call()
+            try:
+                if self.scheduler is not None:
+                    await self.scheduler.acquire(cost, priority, model=model)
+                completion = await self._create(
+                    timeout,
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    **kwargs,
+                )
+            except RateLimitError as e:
+                self._record_outcome(e)
+                if self.scheduler is None:
+                    raise
+                retry_after = _retry_after_s(e)
+                # Refusé avant toute génération : la réservation TPM du modèle est rendue
+                self.scheduler.refund(cost, model)
+                self.scheduler.penalize(retry_after, model)
+                if attempt == 0:
+                    continue
+                raise SchedulerOverloaded(f"Groq 429 (Retry-After {retry_after}s)", retry_after) from e
+            except BaseException as e:
+                self._record_outcome(e)
+                raise
+            self._record_outcome(None)
+            if self.scheduler is not None:
+                usage = getattr(completion, "usage", None)
+                self.scheduler.settle(cost, getattr(usage, "total_tokens", None), model)
+            return completion
+
+    def _record_outcome(self, error: Optional[BaseException]) -> None:
+        """Informe le disjoncteur : seules les pannes de Groq comptent comme échecs."""
+        if self.breaker is None:
+            return
+        if error is None:
+            self.breaker.record_success()
+        elif isinstance(error, (LLMTimeoutError, APIConnectionError, InternalServerError)) or (
+            isinstance(error, APIStatusError) and error.status_code >= 500
+        ):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_neutral()
+
+    async def _create(self, timeout: float, **params: Any):
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                return await asyncio.wait_for(
+                    self.client.chat.completions.create(**params),
+                    timeout=timeout,
+                )
+            except asyncio.TimeoutError as e:
+                raise LLMTimeoutError(f"Complétion {params.get('model')} > {timeout}s") from e
+            finally:
+                self.in_flight -= 1
+
+    async def stream(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.2,
+        max_tokens: int = 600,
+        timeout_s: Optional[float] = None,
+        priority: int = PRIORITY_ASSISTANT,
+        **kwargs: Any,
+    ) -> AsyncIterator[str]:
+        """
+        Complétion en streaming (`stream=True`) : produit les fragments de texte
+        au fil de l'eau. Le timeout s'applique à la complétion entière.
+        """
+        timeout = timeout_s if timeout_s is not None else self.timeout_s
+        cost = estimate_request_tokens(messages, max_tokens)
+        if self.breaker is not None:
+            await self.breaker.sync()
+            self.breaker.before_call()
+        try:
+            if self.scheduler is not None:
+                await self.scheduler.acquire(cost, priority, model=model)
+        except BaseException as e:
+            self._record_outcome(e)
+            raise
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                stream = await asyncio.wait_for(
+                    self.client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        stream=True,
+                        **kwargs,
+                    ),
+                    timeout=timeout,
+                )
+                chunks = stream.__aiter__()
+                while True:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout=remaining)
+                    except StopAsyncIteration:
+                        break
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+                self._record_outcome(None)
+            except RateLimitError as e:
+                self._record_outcome(e)
+                if self.scheduler is None:
+                    raise
+                retry_after = _retry_after_s(e)
+                self.scheduler.refund(cost, model)
+                self.scheduler.penalize(retry_after, model)
+                raise SchedulerOverloaded(f"Groq 429 (Retry-After {retry_after}s)", retry_after) from e
+            except asyncio.TimeoutError as e:
+                self._record_outcome(LLMTimeoutError())
+                raise LLMTimeoutError(f"Streaming {model} > {timeout}s") from e
+            except BaseException as e:
+                self._record_outcome(e)
+                raise
+            finally:
+                self.in_flight -= 1
+
+    async def aclose(self) -> None:
+        if isinstance(self.client, _LazyAsyncGroq) and not self.client.created:
+            return
+        await self.client.close()
@@ -0,0 +1,212 @@
+"""
+Observabilité : logs structurés non bloquants + métriques Prometheus
+
+Les logs passent par un QueueHandler : le chemin de la requête ne fait qu'un
+put() en mémoire, l'écriture sur stdout est faite par un thread dédié
+(QueueListener). Les métriques (histogrammes par endpoint et par étape,
+compteurs de fallbacks / erreurs / tokens Groq) sont exposées sur /metrics.
+"""
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from prometheus_client import CollectorRegistry, Counter, Histogram
+from prometheus_client.core import GaugeMetricFamily
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 13, 21, 30)
+
+REGISTRY = CollectorRegistry()
+
+REQUEST_DURATION = Histogram(
+    "ai_request_duration_seconds",
+    "Durée totale des requêtes par endpoint",
+    ["endpoint", "status"],
+    buckets=LATENCY_BUCKETS,
+    registry=REGISTRY,
+)
+STAGE_DURATION = Histogram(
+    "ai_stage_duration_seconds",
+    "Durée par étape (prompt_build, upstream_completion, json_extraction, validation, enrichment)",
+    ["endpoint", "stage"],
+    buckets=LATENCY_BUCKETS,
+    registry=REGISTRY,
+)
+PROMPT_TOKENS = Histogram(
+    "ai_prompt_tokens",
+    "Tokens estimés du prompt par requête (part statique / variable) et variante",
+    ["endpoint", "variant", "part"],
+    buckets=(50, 100, 200, 400, 600, 800, 1000, 1500, 2000, 3000, 4000),
+    registry=REGISTRY,
+)
+FALLBACKS = Counter(
+    "ai_fallbacks_total",
+    "Réponses de repli servies à la place d'une analyse IA",
+    ["endpoint", "reason"],
+    registry=REGISTRY,
+)
+PARSE_FAILURES = Counter(
+    "ai_parse_failures_total",
+    "Réponses du modèle au JSON inexploitable",
+    ["endpoint"],
+    registry=REGISTRY,
+)
+JSON_PARSE_OUTCOMES = Counter(
+    "ai_json_parse_outcomes_total",
+    "Issue du parsing des réponses du modèle (clean, repaired, unrecoverable)",
+    ["endpoint", "outcome"],
+    registry=REGISTRY,
+)
+UPSTREAM_ERRORS = Counter(
+    "ai_upstream_errors_total",
+    "Erreurs des services amont (Groq, Backend API)",
+    ["upstream", "error_type"],
+    registry=REGISTRY,
+)
+GROQ_TOKENS = Counter(
+    "ai_groq_tokens_total",
+    "Tokens Groq consommés (completion.usage)",
+    ["endpoint", "model", "kind"],
+    registry=REGISTRY,
+)
+
+RESPONSE_BYTES = Counter(
+    "ai_response_bytes_total",
+    "Octets des corps de réponse compressés, avant (raw) et après (sent) compression",
+    ["encoding", "stage"],
+    registry=REGISTRY,
+)
+NOT_MODIFIED = Counter(
+    "ai_not_modified_total",
+    "Réponses 304 (If-None-Match égal à l'ETag courant)",
+    ["endpoint"],
+    registry=REGISTRY,
+)
+
+
+@contextmanager
+def stage(endpoint: str, name: str) -> Iterator[None]:
+    """Mesure la durée d'une étape du pipeline."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_DURATION.labels(endpoint, name).observe(time.perf_counter() - start)
+
+
+def record_usage(endpoint: str, model: str, usage: Any) -> None:
+    """Comptabilise les tokens prompt / completion renvoyés par Groq."""
+    if usage is None:
+        return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        value = getattr(usage, kind, None)
+        if value:
+            GROQ_TOKENS.labels(endpoint, model, kind.replace("_tokens", "")).inc(value)
+
+
+def record_prompt(endpoint: str, variant: str, static_tokens: int, variable_tokens: int) -> None:
+    """Comptabilise la taille estimée du prompt envoyé (préfixe statique / texte du patient)."""
+    PROMPT_TOKENS.labels(endpoint, variant, "static").observe(static_tokens)
+    PROMPT_TOKENS.labels(endpoint, variant, "variable").observe(variable_tokens)
+
+
+class StatsCollector:
+    """Expose les compteurs internes (dict de /api/ai/stats) en jauges Prometheus."""
+
+    def __init__(self, stats_fn: Callable[[], Dict[str, Any]], prefix: str = "ai"):
+        self.stats_fn = stats_fn
+        self.prefix = prefix
+
+    def collect(self):
+        for section, values in self.stats_fn().items():
+            if not isinstance(values, dict):
+                continue
+            yield from self._flatten(f"{self.prefix}_{section}", values)
+
+    def _flatten(self, name: str, values: Dict[str, Any]):
+        for key, value in values.items():
+            metric = f"{name}_{key}"
+            if isinstance(value, bool):
+                value = int(value)
+            if isinstance(value, (int, float)):
+                yield GaugeMetricFamily(metric, f"{name}.{key}", value=value)
+            elif isinstance(value, dict):
+                yield from self._flatten(metric, value)
+
+
+# --------------------------------------------------------------------------- #
+# Logs
+# --------------------------------------------------------------------------- #
+
+_RESERVED = set(vars(logging.makeLogRecord({})).keys()) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Une ligne JSON par événement, champs `extra=` inclus."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        payload.update({k: v for k, v in record.__dict__.items() if k not in _RESERVED})
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging(level: Optional[str] = None, fmt: Optional[str] = None) -> None:
+    """Branche le logger racine sur une file ; un thread écrit sur stdout."""
+    global _listener
+    if _listener is not None:
+        return
+    level = level or os.getenv("LOG_LEVEL", "INFO")
+    fmt = fmt or os.getenv("LOG_FORMAT", "json")
+
+    output = logging.StreamHandler(sys.stdout)
+    if fmt == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s - %(message)s"))
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+    root = logging.getLogger()
+    root.handlers = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def _restart_logging_after_fork() -> None:
+    """Le thread d'écriture ne survit pas au fork : nouvelle file et nouveau thread dans le worker."""
+    global _listener
+    if _listener is None:
+        return
+    handlers = _listener.handlers
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+    logging.getLogger().handlers = [logging.handlers.QueueHandler(log_queue)]
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_logging_after_fork)
+
+
+def shutdown_logging() -> None:
+    """Vide la file et arrête le thread d'écriture."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
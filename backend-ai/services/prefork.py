@@ -0,0 +1,100 @@
+"""
+Lancement multi-workers (préfork)
+
+Le processus parent importe l'application une seule fois, ouvre la socket
+d'écoute puis fork N workers uvicorn qui la partagent. Un worker hérite du
+code déjà importé (FastAPI, Groq, numpy, prompts, classifieur mappé) : il n'a
+plus qu'à démarrer son event loop et son lifespan, ce qui prend quelques
+millisecondes au lieu d'un import complet. Un worker qui meurt est relancé ;
+SIGTERM / SIGINT arrêtent proprement tous les workers (un second signal les tue).
+
+Tout ce qui ne survit pas à un fork (client Groq, connexion SQLite, Redis,
+thread de logs) est créé dans le worker, au premier usage ou dans le lifespan.
+"""
+import importlib
+import logging
+import os
+import signal
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger("santekene.ai")
+
+# Importés paresseusement au premier appel réseau (httpx, SDK Groq) : chargés avant le fork
+PRELOAD_MODULES = ("anyio._backends._asyncio",)
+
+# Renseignés dans le worker juste après le fork
+worker_id: Optional[int] = None
+forked_at: Optional[float] = None
+
+
+def serve(app: Any, host: str = "0.0.0.0", port: int = 8000, workers: int = 2, **options: Any) -> None:
+    """Sert `app` (objet ASGI déjà importé) avec `workers` processus forkés."""
+    import uvicorn
+
+    config = uvicorn.Config(app, host=host, port=port, **options)
+    # Protocoles HTTP et boucle (uvloop) importés une fois dans le parent
+    config.load()
+    config.setup_event_loop()
+    for module in PRELOAD_MODULES:
+        importlib.import_module(module)
+    sock = config.bind_socket()
+    children: Dict[int, tuple] = {}
+    stopping = 0
+
+    def spawn(slot: int) -> None:
+        global worker_id, forked_at
+        pid = os.fork()
+        if pid == 0:
+            forked_at = time.perf_counter()
+            worker_id = slot
+            # Les gestionnaires du parent ne doivent pas s'exécuter dans le worker
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            code = 0
+            try:
+                uvicorn.Server(config).run(sockets=[sock])
+            except BaseException:
+                logger.exception("❌ Worker arrêté sur erreur", extra={"worker": slot})
+                code = 1
+            finally:
+                logging.shutdown()
+                os._exit(code)
+        children[pid] = (slot, time.monotonic())
+
+    def stop(signum: int, frame: Any) -> None:
+        nonlocal stopping
+        stopping += 1
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM if stopping == 1 else signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    logger.info("🚀 Démarrage multi-workers", extra={"workers": workers, "host": host, "port": port, "pid": os.getpid()})
+    for slot in range(workers):
+        spawn(slot)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        slot, started = children.pop(pid, (None, 0.0))
+        if slot is None or stopping:
+            continue
+        logger.warning(
+            "⚠️  Worker mort, relance",
+            extra={"worker": slot, "pid": pid, "exit_code": os.waitstatus_to_exitcode(status)},
+        )
+        # Un worker qui meurt au démarrage ne doit pas faire tourner le parent en boucle
+        if time.monotonic() - started < 1.0:
+            time.sleep(1.0)
+        if not stopping:
+            spawn(slot)
+
+    sock.close()
+    logger.info("👋 Workers arrêtés")
@@ -0,0 +1,390 @@
+"""
+Ordonnanceur des appels Groq (limites RPM / TPM)
+
+Deux seaux à jetons (requêtes/minute et tokens/minute) par modèle, comme
+les limites de Groq : le 8B et le 70B ne puisent pas dans le même quota. Les
+demandes attendent dans une file à priorité : le triage patient passe avant
+l'assistant médecin, lui-même avant les tâches de fond ; une demande bloquée
+sur un modèle ne retient pas celles d'un autre modèle. Si l'attente prévue
+dépasse le délai maximal, la demande est rejetée tout de suite (503) au lieu
+d'aller chercher un 429 chez Groq. Un Retry-After reçu de Groq bloque le
+modèle concerné jusqu'à l'échéance ; les tokens réservés par l'appel refusé
+sont rendus.
+
+Avec plusieurs workers, les seaux RPM/TPM et le Retry-After sont aussi tenus
+dans l'état partagé (Redis) : une demande servie par la file locale débite
+ensuite le quota commun, et attend s'il est épuisé par les autres workers.
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from services.shared_state import SharedState
+
+# Priorités (plus petit = plus prioritaire)
+PRIORITY_TRIAGE = 0
+PRIORITY_ASSISTANT = 1
+PRIORITY_BACKGROUND = 2
+
+# Clés de l'état partagé entre workers (suffixées par le modèle)
+SHARED_RPM_KEY = "groq:rpm"
+SHARED_TPM_KEY = "groq:tpm"
+SHARED_HOLD_KEY = "groq:retry_after"
+
+PRIORITY_NAMES = {
+    PRIORITY_TRIAGE: "triage",
+    PRIORITY_ASSISTANT: "assistant",
+    PRIORITY_BACKGROUND: "background",
+}
+
+
+class SchedulerOverloaded(Exception):
+    """L'attente prévue dépasse le délai maximal : rejeter la requête (503)."""
+
+    def __init__(self, message: str, retry_after_s: float):
+        super().__init__(message)
+        self.retry_after_s = retry_after_s
+
+
+def estimate_request_tokens(messages: List[Dict[str, str]], max_tokens: int) -> int:
+    """Coût estimé d'un appel : prompt (~4 caractères par token) + max_tokens."""
+    prompt_chars = sum(len(m.get("content") or "") for m in messages)
+    return math.ceil(prompt_chars / 4) + 4 * len(messages) + max_tokens
+
+
+def parse_model_limits(raw: str) -> Dict[str, Tuple[float, float]]:
+    """"llama-3.1-8b-instant=30:6000,llama-3.3-70b-versatile=30:12000" -> {modèle: (rpm, tpm)}"""
+    limits: Dict[str, Tuple[float, float]] = {}
+    for item in raw.split(","):
+        model, _, values = item.strip().partition("=")
+        rpm, _, tpm = values.partition(":")
+        if model and rpm and tpm:
+            limits[model.strip()] = (float(rpm), float(tpm))
+    return limits
+
+
+class TokenBucket:
+    """Seau à jetons rempli en continu (`rate_per_min` jetons par minute)."""
+
+    def __init__(self, rate_per_min: float):
+        self.capacity = float(rate_per_min)
+        self.refill_per_s = rate_per_min / 60.0
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_s)
+        self.updated_at = now
+
+    def time_until(self, amount: float) -> float:
+        """Secondes avant que `amount` jetons soient disponibles."""
+        if self.unlimited:
+            return 0.0
+        self._refill()
+        # Une demande plus grosse que le seau ne doit pas bloquer la file pour toujours
+        amount = min(amount, self.capacity)
+        missing = amount - self.tokens
+        return max(0.0, missing / self.refill_per_s)
+
+    def take(self, amount: float) -> None:
+        if self.unlimited:
+            return
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def give_back(self, amount: float) -> None:
+        if self.unlimited:
+            return
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class _ModelQuota:
+    """Seaux RPM / TPM et Retry-After d'un modèle."""
+
+    __slots__ = ("requests", "tokens", "blocked_until")
+
+    def __init__(self, rpm: float, tpm: float):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.blocked_until = 0.0
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "cost", "model", "future", "enqueued_at")
+
+    def __init__(self, priority: int, seq: int, cost: int, model: str, future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.cost = cost
+        self.model = model
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class GroqScheduler:
+    """File à priorité + seaux RPM/TPM par modèle devant les appels Groq."""
+
+    def __init__(
+        self,
+        rpm: float = 30,
+        tpm: float = 12000,
+        max_wait_s: float = 10.0,
+        shared: Optional[SharedState] = None,
+        model_limits: Optional[Dict[str, Tuple[float, float]]] = None,
+    ):
+        # Limites par défaut, et limites propres à certains modèles (GROQ_MODEL_LIMITS)
+        self.rpm = rpm
+        self.tpm = tpm
+        self.model_limits = dict(model_limits or {})
+        self._share = 1
+        self._quotas: Dict[str, _ModelQuota] = {}
+        self.max_wait_s = max_wait_s
+        self.shared = shared
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Métriques
+        self.granted = 0
+        self.rejected = 0
+        self.rate_limited = 0
+        self.max_depth = 0
+        self._waits: Deque[float] = deque(maxlen=1000)
+        self.wait_total_s = 0.0
+        self.shared_waits = 0
+        self.refunded_tokens = 0
+
+    @classmethod
+    def from_env(cls, shared: Optional[SharedState] = None) -> "GroqScheduler":
+        return cls(
+            rpm=float(os.getenv("GROQ_RPM", "30")),
+            tpm=float(os.getenv("GROQ_TPM", "12000")),
+            max_wait_s=float(os.getenv("GROQ_QUEUE_MAX_WAIT_S", "10")),
+            shared=shared,
+            model_limits=parse_model_limits(os.getenv("GROQ_MODEL_LIMITS", "")),
+        )
+
+    def share_between(self, workers: int) -> None:
+        """Sans état partagé, chaque worker ne dispose que de sa part du quota Groq."""
+        if workers > 1:
+            self._share = workers
+            self._quotas.clear()
+
+    def quota(self, model: str) -> _ModelQuota:
+        """Seaux du modèle, créés au premier appel."""
+        quota = self._quotas.get(model)
+        if quota is None:
+            rpm, tpm = self.model_limits.get(model, (self.rpm, self.tpm))
+            quota = self._quotas[model] = _ModelQuota(rpm / self._share, tpm / self._share)
+        return quota
+
+    # ------------------------------------------------------------------ #
+
+    def _time_until_granted(self, model: str, count: int, cost: int) -> float:
+        """Attente avant de pouvoir servir `count` requêtes de `model` totalisant `cost` tokens."""
+        quota = self.quota(model)
+        blocked = max(0.0, quota.blocked_until - time.monotonic())
+        return max(blocked, quota.requests.time_until(count), quota.tokens.time_until(cost))
+
+    def estimate_wait(self, cost: int, priority: int, model: str = "") -> float:
+        ahead = [w for w in self._queue if w.model == model and w.priority <= priority and not w.future.done()]
+        return self._time_until_granted(model, len(ahead) + 1, sum(w.cost for w in ahead) + cost)
+
+    async def acquire(
+        self,
+        cost: int,
+        priority: int = PRIORITY_ASSISTANT,
+        max_wait_s: Optional[float] = None,
+        model: str = "",
+    ) -> float:
+        """Attend son tour et réserve les jetons du modèle ; retourne le temps d'attente."""
+        max_wait = self.max_wait_s if max_wait_s is None else max_wait_s
+        expected = self.estimate_wait(cost, priority, model)
+        if expected > max_wait:
+            self.rejected += 1
+            raise SchedulerOverloaded(
+                f"File Groq saturée (attente estimée {expected:.1f}s > {max_wait}s)",
+                retry_after_s=expected,
+            )
+
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(priority, next(self._seq), cost, model, loop.create_future())
+        heapq.heappush(self._queue, waiter)
+        self.max_depth = max(self.max_depth, len(self._queue))
+        self._dispatch()
+        granted = False
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=max_wait)
+            granted = True
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise SchedulerOverloaded(
+                f"Attente Groq > {max_wait}s", retry_after_s=self._time_until_granted(model, 1, cost)
+            )
+        finally:
+            if not waiter.future.done():
+                waiter.future.cancel()
+                self._dispatch()
+            elif not granted and not waiter.future.cancelled():
+                # Jetons attribués à l'instant du timeout ou de l'annulation : la demande part sans eux
+                self._release(model, cost)
+
+        if self.shared is not None:
+            try:
+                await self._acquire_shared(model, cost, waiter.enqueued_at + max_wait)
+            except BaseException:
+                # Jetons locaux rendus : la demande n'est finalement pas servie
+                self._release(model, cost)
+                raise
+
+        waited = time.monotonic() - waiter.enqueued_at
+        self._waits.append(waited)
+        self.wait_total_s += waited
+        return waited
+
+    def _release(self, model: str, cost: int) -> None:
+        """Rend une réservation locale (RPM + TPM) qui ne sera pas utilisée."""
+        quota = self.quota(model)
+        quota.requests.give_back(1)
+        quota.tokens.give_back(cost)
+        self.refunded_tokens += cost
+        self._dispatch()
+
+    def _shared_buckets(self, model: str, cost: float) -> List[tuple]:
+        quota = self.quota(model)
+        return [
+            (f"{key}:{model}", amount, bucket.capacity, bucket.refill_per_s)
+            for key, amount, bucket in ((SHARED_RPM_KEY, 1, quota.requests), (SHARED_TPM_KEY, cost, quota.tokens))
+            if not bucket.unlimited
+        ]
+
+    async def _acquire_shared(self, model: str, cost: int, deadline: float) -> None:
+        """Débite le quota commun à tous les workers, en attendant s'il est épuisé."""
+        buckets = self._shared_buckets(model, cost)
+        while True:
+            wait = await self.shared.take(buckets, hold_key=f"{SHARED_HOLD_KEY}:{model}")
+            if wait <= 0:
+                return
+            if time.monotonic() + wait > deadline:
+                self.rejected += 1
+                raise SchedulerOverloaded(
+                    f"Quota Groq partagé épuisé (attente estimée {wait:.1f}s)", retry_after_s=wait
+                )
+            self.shared_waits += 1
+            await asyncio.sleep(wait)
+
+    def _dispatch(self) -> None:
+        """Sert, par ordre de priorité, les demandes dont le modèle a des jetons disponibles."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        # Un modèle dont la première demande attend bloque ses suivantes, pas les autres modèles
+        blocked: Dict[str, float] = {}
+        pending: List[_Waiter] = []
+        for waiter in sorted(self._queue):
+            if waiter.future.done():
+                continue
+            if waiter.model in blocked:
+                pending.append(waiter)
+                continue
+            wait = self._time_until_granted(waiter.model, 1, waiter.cost)
+            if wait > 0:
+                blocked[waiter.model] = wait
+                pending.append(waiter)
+                continue
+            quota = self.quota(waiter.model)
+            quota.requests.take(1)
+            quota.tokens.take(waiter.cost)
+            self.granted += 1
+            waiter.future.set_result(None)
+        # Liste triée : c'est aussi un tas valide
+        self._queue = pending
+        if blocked:
+            self._timer = asyncio.get_running_loop().call_later(min(blocked.values()), self._dispatch)
+
+    def settle(self, estimated: int, actual: Optional[int], model: str = "") -> None:
+        """Rend au seau TPM du modèle les tokens réservés mais non consommés."""
+        if actual is not None and actual < estimated:
+            tokens = self.quota(model).tokens
+            tokens.give_back(estimated - actual)
+            if self.shared is not None and not tokens.unlimited:
+                self.shared.defer(
+                    self.shared.take(
+                        [(f"{SHARED_TPM_KEY}:{model}", actual - estimated, tokens.capacity, tokens.refill_per_s)],
+                        force=True,
+                    )
+                )
+            self._dispatch()
+
+    def refund(self, estimated: int, model: str = "") -> None:
+        """Appel refusé par Groq (429) : aucun token consommé, la réservation est rendue."""
+        self.refunded_tokens += estimated
+        self.settle(estimated, 0, model)
+
+    def penalize(self, retry_after_s: float, model: str = "") -> None:
+        """Groq a répondu 429 : plus aucun appel à ce modèle avant Retry-After."""
+        self.rate_limited += 1
+        quota = self.quota(model)
+        quota.blocked_until = max(quota.blocked_until, time.monotonic() + retry_after_s)
+        # Les requêtes de la minute en cours ne sont plus disponibles
+        quota.requests.tokens = min(quota.requests.tokens, 0.0)
+        if self.shared is not None:
+            # Les autres workers respectent aussi le Retry-After
+            self.shared.defer(self.shared.hold(f"{SHARED_HOLD_KEY}:{model}", retry_after_s))
+
+    # ------------------------------------------------------------------ #
+
+    @property
+    def depth(self) -> int:
+        return sum(1 for w in self._queue if not w.future.done())
+
+    def depth_by_priority(self) -> Dict[str, int]:
+        depths = {name: 0 for name in PRIORITY_NAMES.values()}
+        for w in self._queue:
+            if not w.future.done():
+                depths[PRIORITY_NAMES.get(w.priority, str(w.priority))] += 1
+        return depths
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._waits)
+
+        def pct(p: float) -> float:
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))], 4) if waits else 0.0
+
+        return {
+            "queue_depth": self.depth,
+            "queue_depth_by_priority": self.depth_by_priority(),
+            "max_queue_depth": self.max_depth,
+            "granted": self.granted,
+            "rejected": self.rejected,
+            "rate_limited_429": self.rate_limited,
+            "wait_s_p50": pct(0.50),
+            "wait_s_p95": pct(0.95),
+            "wait_s_max": round(waits[-1], 4) if waits else 0.0,
+            "wait_s_total": round(self.wait_total_s, 4),
+            "shared_waits": self.shared_waits,
+            "refunded_tokens": self.refunded_tokens,
+            # Liste (et non dict) : les noms de modèles ne sont pas des noms de métriques valides
+            "models": [
+                {
+                    "model": model,
+                    "rpm_available": None if quota.requests.unlimited else round(quota.requests.tokens, 2),
+                    "tpm_available": None if quota.tokens.unlimited else round(quota.tokens.tokens, 1),
+                    "blocked_for_s": round(max(0.0, quota.blocked_until - time.monotonic()), 2),
+                }
+                for model, quota in self._quotas.items()
+            ],
+        }
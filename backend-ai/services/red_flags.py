@@ -0,0 +1,220 @@
+"""
+Détection locale des signes d'urgence vitale (fast path du triage)
+
+Les règles URGENT du prompt de triage sont déterministes : douleur thoracique
++ essoufflement, hémorragie qui ne s'arrête pas, perte de conscience,
+convulsions, fracture ouverte, brûlure grave. Une seule expression régulière
+précompilée (un groupe nommé par signe clinique) parcourt le texte replié
+(sans accents, minuscules) en quelques microsecondes, sans appel au LLM.
+
+La réponse instantanée est URGENT ; l'analyse du LLM qui l'affine ensuite
+peut la corriger (faux positif), sans descendre sous HIGH.
+"""
+import re
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional
+
+from services.triage_cache import fold_accents
+
+# Signes cliniques élémentaires -> motifs (texte replié, apostrophes = espaces)
+CONCEPTS: Dict[str, List[str]] = {
+    "chest_pain": [
+        r"douleurs? (\w+ ){0,2}(thoraci\w+|(a|dans|sur) la poitrine|au (coeur|thorax))",
+        r"mal (a|dans) la poitrine",
+        r"mal au (coeur|thorax)",
+        r"(oppression|serrement|poids) (thoraci\w+|(a|dans|sur) la poitrine)",
+        r"poitrine (qui |me )?(serre|brule|fait (tres )?mal)",
+    ],
+    "dyspnea": [
+        r"essouffl\w*",
+        r"(difficultes?|du mal|peine|gene) a respirer",
+        r"(n )?(arrive|peux|peut|parvient) (plus|pas) a respirer",
+        r"respir\w+ (difficile\w*|mal)",
+        r"souffle court",
+        r"manque d air",
+        r"etouff\w*",
+        r"dyspnee",
+    ],
+    "hemorrhage": [
+        r"hemorragi\w*",
+        # "Saigne beaucoup" seul (nez, règles) n'est pas une urgence : il faut un saignement qui ne cesse pas
+        r"saign\w*[^.;!?\n]{0,40}?(ne s arrete pas|ne s arrete plus|sans arret|ne cesse pas|en continu|continuellement)",
+        r"(perd|perte de|perdu|pisse) (beaucoup|enormement) (de )?sang",
+        r"sang (qui )?(coule|gicle) (beaucoup|sans arret|partout)",
+    ],
+    "unconscious": [
+        r"perte de (conscience|connaissance)",
+        r"(perdu|perd) (conscience|connaissance)",
+        r"evanoui\w*",
+        r"inconscient\w*",
+        r"ne (repond|reagit) plus",
+        r"syncope",
+        r"\bcoma\b",
+        r"tombe\w* dans les pommes",
+    ],
+    "seizure": [
+        r"convuls\w*",
+        r"crises? (d )?epilep\w*",
+        r"crises? convulsiv\w*",
+    ],
+    "open_fracture": [
+        r"fractures? ouvertes?",
+        r"\bos (qui )?(sort|depasse|transperce)",
+        r"\bos (visible|a l air)",
+    ],
+    "major_burn": [
+        r"brul\w+ (grave|graves|etendue\w*|profonde\w*|importante\w*|severe\w*|tres grave\w*)",
+        r"grands? brules?",
+        r"brule\w* (sur )?(tout le corps|une grande partie)",
+        r"brulures? (au|du) (3e|troisieme) degre",
+    ],
+}
+
+# Négation juste avant le signe ("pas de convulsions", "sans essoufflement")
+_NEGATION_RE = re.compile(r"\b(pas|sans|aucune?|jamais|ni|non)\b(\s+\w+){0,2}\s*$")
+# Signes ponctuels : un épisode passé ("évanouie hier", "crise l'an dernier") n'est pas une urgence actuelle
+EVENT_CONCEPTS = frozenset({"hemorrhage", "unconscious", "seizure"})
+_PAST_RE = re.compile(
+    r"(?<!depuis )\b(avant hier|hier|l an (dernier|passe)|l annee (derniere|passee)|"
+    r"la semaine (derniere|passee)|le mois (dernier|passe)|il y a (\d+|un|une|deux|trois|quelques|plusieurs) "
+    r"(jours?|semaines?|mois|ans?|annees?)|antecedents?|autrefois|quand (j|il|elle) etai(s|t) (petite?|enfant))\b"
+)
+_CLAUSE_SPLIT_RE = re.compile(r"[.;,!?\n]")
+_APOSTROPHE_RE = re.compile(r"[’'`´]")
+_SPACE_RE = re.compile(r"\s+")
+
+_MATCHER = re.compile(
+    "|".join(f"(?P<{name}>{'|'.join(patterns)})" for name, patterns in CONCEPTS.items())
+)
+
+
+@dataclass(frozen=True)
+class RedFlagRule:
+    rule_id: str
+    requires: FrozenSet[str]
+    diagnosis: str
+    specialties: List[str]
+    recommendations: List[str]
+    facility_reason: str
+
+
+_CALL_EMERGENCY = "Appelez immédiatement les secours ou rendez-vous aux urgences les plus proches"
+
+RULES: List[RedFlagRule] = [
+    RedFlagRule(
+        "douleur_thoracique_essoufflement",
+        frozenset({"chest_pain", "dyspnea"}),
+        "Douleur à la poitrine avec difficulté à respirer : cela peut venir du cœur ou des poumons et doit être vu tout de suite.",
+        ["Cardiologie", "Urgences et traumatologie"],
+        [_CALL_EMERGENCY, "Restez assis au calme, ne faites aucun effort", "Ne restez pas seul en attendant les secours"],
+        "Urgence possible du cœur ou des poumons",
+    ),
+    RedFlagRule(
+        "hemorragie_grave",
+        frozenset({"hemorrhage"}),
+        "Saignement important qui ne s'arrête pas : il faut une prise en charge immédiate.",
+        ["Urgences et traumatologie"],
+        [_CALL_EMERGENCY, "Appuyez fortement sur la plaie avec un linge propre", "Allongez la personne et surélevez les jambes"],
+        "Saignement grave à arrêter rapidement",
+    ),
+    RedFlagRule(
+        "perte_de_conscience",
+        frozenset({"unconscious"}),
+        "Perte de connaissance : la cause doit être recherchée sans attendre.",
+        ["Urgences et traumatologie", "Neurologie"],
+        [_CALL_EMERGENCY, "Mettez la personne sur le côté (position latérale de sécurité)", "Vérifiez qu'elle respire"],
+        "Perte de connaissance à évaluer en urgence",
+    ),
+    RedFlagRule(
+        "convulsions",
+        frozenset({"seizure"}),
+        "Convulsions : la personne doit être examinée en urgence.",
+        ["Urgences et traumatologie", "Neurologie"],
+        [_CALL_EMERGENCY, "Éloignez les objets dangereux, ne mettez rien dans la bouche", "Placez la personne sur le côté après la crise"],
+        "Crise convulsive à évaluer en urgence",
+    ),
+    RedFlagRule(
+        "fracture_ouverte",
+        frozenset({"open_fracture"}),
+        "Fracture avec plaie ouverte : risque d'infection et de saignement, soins urgents nécessaires.",
+        ["Orthopédie et traumatologie", "Urgences et traumatologie"],
+        [_CALL_EMERGENCY, "Ne bougez pas le membre blessé", "Couvrez la plaie avec un linge propre"],
+        "Fracture ouverte à opérer rapidement",
+    ),
+    RedFlagRule(
+        "brulure_grave",
+        frozenset({"major_burn"}),
+        "Brûlure grave ou étendue : elle doit être soignée aux urgences.",
+        ["Urgences et traumatologie", "Dermatologie"],
+        [_CALL_EMERGENCY, "Refroidissez la brûlure à l'eau tiède pendant 15 minutes", "Ne mettez ni huile, ni pommade, ni dentifrice"],
+        "Brûlure grave nécessitant des soins urgents",
+    ),
+]
+
+
+def _prepare(text: str) -> str:
+    return _SPACE_RE.sub(" ", _APOSTROPHE_RE.sub(" ", fold_accents(text)))
+
+
+def _clause(text: str, start: int, end: int) -> str:
+    """Proposition (entre deux ponctuations) qui contient text[start:end]."""
+    head = _CLAUSE_SPLIT_RE.split(text[:start])[-1]
+    tail = _CLAUSE_SPLIT_RE.split(text[end:], maxsplit=1)[0]
+    return head + text[start:end] + tail
+
+
+def detect_concepts(text: str) -> FrozenSet[str]:
+    """Signes cliniques présents (non niés) dans le texte."""
+    prepared = _prepare(text)
+    found = set()
+    for match in _MATCHER.finditer(prepared):
+        # Négation dans la même proposition, juste avant le signe
+        before = _CLAUSE_SPLIT_RE.split(prepared[max(0, match.start() - 30):match.start()])[-1]
+        if _NEGATION_RE.search(before):
+            continue
+        if match.lastgroup in EVENT_CONCEPTS and _PAST_RE.search(_clause(prepared, match.start(), match.end())):
+            continue
+        found.add(match.lastgroup)
+    return frozenset(found)
+
+
+def match_red_flags(text: str) -> List[RedFlagRule]:
+    """Règles d'urgence vitale déclenchées par le texte, dans l'ordre de RULES."""
+    concepts = detect_concepts(text)
+    if not concepts:
+        return []
+    return [rule for rule in RULES if rule.requires <= concepts]
+
+
+def red_flag_result(rules: List[RedFlagRule]) -> Optional[dict]:
+    """JSON de triage URGENT (même schéma que la réponse du modèle)."""
+    if not rules:
+        return None
+    primary = rules[0]
+    specialties: List[str] = []
+    for rule in rules:
+        specialties += [s for s in rule.specialties if s not in specialties]
+    return {
+        "severity": "urgent",
+        "diagnosis": primary.diagnosis,
+        "recommendations": list(primary.recommendations),
+        "specialties": specialties,
+        "urgency_level": 4,
+        "recommended_facility_type": "URGENCES",
+        "facility_reason": primary.facility_reason,
+        "red_flags": [rule.rule_id for rule in rules],
+    }
+
+
+def apply_red_flag_floor(result: dict, rules: List[RedFlagRule]) -> dict:
+    """
+    Résultat du LLM après une détection locale : sa gravité est conservée
+    (il peut écarter un faux positif) mais jamais en dessous de HIGH.
+    """
+    result["red_flags"] = [rule.rule_id for rule in rules]
+    if result.get("severity") not in ("high", "urgent"):
+        result["severity"] = "high"
+        result["urgency_level"] = 3
+        if result.get("recommended_facility_type") not in ("URGENCES", "HOPITAL"):
+            result["recommended_facility_type"] = "HOPITAL"
+    return result
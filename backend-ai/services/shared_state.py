@@ -0,0 +1,307 @@
+"""
+État partagé entre workers
+
+En production (APP_ENV=production) le service tourne sur plusieurs processus :
+sans état commun, chaque worker aurait son propre cache de triage, ses propres
+seaux RPM/TPM (N fois le quota Groq) et son propre disjoncteur. Une interface
+minimale, deux implémentations (STATE_BACKEND) :
+
+- memory : dictionnaires du processus, pour un seul worker ;
+- redis : Redis ou compatible (Valkey, KeyDB), le même que le Backend API.
+  Les seaux à jetons sont débités par un script Lua (atomique entre workers,
+  horloge du serveur Redis). Une panne Redis est comptée et journalisée puis
+  dégrade vers l'état local du worker : jamais d'erreur 500 pour autant.
+
+Le paquet `redis` n'est importé qu'à la première commande, dans le worker
+(après le fork) : il ne pèse ni sur le démarrage ni sur le mode memory.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Coroutine, Dict, Optional, Sequence, Set, Tuple
+from urllib.parse import quote
+
+logger = logging.getLogger("santekene.ai")
+
+# (clé, quantité, capacité, recharge par seconde)
+Bucket = Tuple[str, float, float, float]
+
+_TAKE_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local force = ARGV[1] == '1'
+local wait = 0
+local n = #KEYS - 1
+if not force then
+    local held = tonumber(redis.call('GET', KEYS[n + 1]) or '0')
+    if held > now then
+        wait = held - now
+    end
+end
+local levels = {}
+for i = 1, n do
+    local amount = tonumber(ARGV[2 + (i - 1) * 3])
+    local capacity = tonumber(ARGV[3 + (i - 1) * 3])
+    local rate = tonumber(ARGV[4 + (i - 1) * 3])
+    local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    levels[i] = tokens
+    local missing = math.min(amount, capacity) - tokens
+    if not force and missing > 0 then
+        wait = math.max(wait, missing / rate)
+    end
+end
+if wait > 0 then
+    return tostring(wait)
+end
+for i = 1, n do
+    local amount = tonumber(ARGV[2 + (i - 1) * 3])
+    local capacity = tonumber(ARGV[3 + (i - 1) * 3])
+    local rate = tonumber(ARGV[4 + (i - 1) * 3])
+    local tokens = math.min(capacity, levels[i] - math.min(amount, capacity))
+    redis.call('HSET', KEYS[i], 'tokens', tostring(tokens), 'ts', tostring(now))
+    redis.call('PEXPIRE', KEYS[i], math.ceil(capacity / rate * 1000) + 60000)
+end
+return '0'
+"""
+
+_HOLD_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local seconds = tonumber(ARGV[1])
+local held = tonumber(redis.call('GET', KEYS[1]) or '0')
+if now + seconds > held then
+    redis.call('SET', KEYS[1], tostring(now + seconds), 'PX', math.ceil(seconds * 1000))
+end
+return 1
+"""
+
+
+class SharedState:
+    """Interface commune ; `distributed` = visible des autres workers."""
+
+    backend = "none"
+    distributed = False
+
+    def __init__(self) -> None:
+        self._deferred: Set[asyncio.Task] = set()
+
+    @classmethod
+    def from_env(cls) -> "SharedState":
+        backend = os.getenv("STATE_BACKEND", "memory").lower()
+        if backend == "redis":
+            return RedisState(
+                url=os.getenv("REDIS_URL") or _redis_url_from_parts(),
+                prefix=os.getenv("REDIS_PREFIX", "santekene:ai:"),
+                timeout_s=float(os.getenv("REDIS_TIMEOUT_S", "0.25")),
+            )
+        if backend != "memory":
+            raise ValueError(f"STATE_BACKEND inconnu : {backend} (memory ou redis)")
+        return MemoryState()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: bytes, ttl_s: float) -> None:
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    async def take(self, buckets: Sequence[Bucket], hold_key: Optional[str] = None, force: bool = False) -> float:
+        """
+        Débite tous les seaux ou aucun. Retourne 0 si les jetons sont pris,
+        sinon l'attente (s) avant qu'ils le soient ; une suspension en cours
+        sur `hold_key` (Retry-After) compte comme une attente. `force` débite
+        sans condition (quantité négative = restitution).
+        """
+        raise NotImplementedError
+
+    async def hold(self, key: str, seconds: float) -> None:
+        """Suspend les seaux gardés par `key` pendant `seconds` (sans raccourcir une suspension en cours)."""
+        raise NotImplementedError
+
+    def defer(self, coro: Coroutine[Any, Any, Any]) -> None:
+        """Écriture en arrière-plan : l'appelant (synchrone ou pressé) n'attend pas Redis."""
+        try:
+            task = asyncio.get_running_loop().create_task(coro)
+        except RuntimeError:
+            coro.close()
+            return
+        self._deferred.add(task)
+        task.add_done_callback(self._deferred.discard)
+
+    async def aclose(self) -> None:
+        if self._deferred:
+            await asyncio.gather(*self._deferred, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.backend, "distributed": self.distributed}
+
+
+class MemoryState(SharedState):
+    """État du processus : mêmes sémantiques que Redis, sans partage."""
+
+    backend = "memory"
+
+    def __init__(self, max_keys: int = 10000):
+        super().__init__()
+        self.max_keys = max_keys
+        self._values: Dict[str, Tuple[float, bytes]] = {}
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._holds: Dict[str, float] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._values[key]
+            return None
+        return entry[1]
+
+    async def set(self, key: str, value: bytes, ttl_s: float) -> None:
+        now = time.monotonic()
+        if len(self._values) >= self.max_keys and key not in self._values:
+            self._values = {k: v for k, v in self._values.items() if v[0] >= now}
+            if len(self._values) >= self.max_keys:
+                self._values.pop(next(iter(self._values)))
+        self._values[key] = (now + ttl_s, value)
+
+    async def delete(self, key: str) -> None:
+        self._values.pop(key, None)
+
+    async def take(self, buckets: Sequence[Bucket], hold_key: Optional[str] = None, force: bool = False) -> float:
+        now = time.monotonic()
+        wait = 0.0
+        if not force and hold_key is not None:
+            wait = max(0.0, self._holds.get(hold_key, 0.0) - now)
+        levels = []
+        for key, amount, capacity, rate in buckets:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + max(0.0, now - updated_at) * rate)
+            levels.append(tokens)
+            missing = min(amount, capacity) - tokens
+            if not force and missing > 0:
+                wait = max(wait, missing / rate)
+        if wait > 0:
+            return wait
+        for (key, amount, capacity, _), tokens in zip(buckets, levels):
+            self._buckets[key] = (min(capacity, tokens - min(amount, capacity)), now)
+        return 0.0
+
+    async def hold(self, key: str, seconds: float) -> None:
+        self._holds[key] = max(self._holds.get(key, 0.0), time.monotonic() + seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "keys": len(self._values), "buckets": len(self._buckets)}
+
+
+class RedisState(SharedState):
+    """État dans Redis, partagé par tous les workers (et toutes les machines)."""
+
+    backend = "redis"
+    distributed = True
+
+    def __init__(self, url: str = "redis://localhost:6379/0", prefix: str = "santekene:ai:", timeout_s: float = 0.25):
+        super().__init__()
+        self.url = url
+        self.prefix = prefix
+        self.timeout_s = timeout_s
+        self._client: Any = None
+        self._take_script: Any = None
+        self._hold_script: Any = None
+        self.commands = 0
+        self.errors = 0
+        self._last_error_log = 0.0
+
+    def _redis(self) -> Any:
+        if self._client is None:
+            import redis.asyncio as redis
+
+            self._client = redis.from_url(
+                self.url,
+                socket_timeout=self.timeout_s,
+                socket_connect_timeout=self.timeout_s,
+                health_check_interval=30,
+            )
+            self._take_script = self._client.register_script(_TAKE_SCRIPT)
+            self._hold_script = self._client.register_script(_HOLD_SCRIPT)
+        return self._client
+
+    def _failed(self, operation: str, error: Exception) -> None:
+        self.errors += 1
+        now = time.monotonic()
+        # Une panne Redis touche chaque requête : un log toutes les 30 s suffit
+        if now - self._last_error_log >= 30:
+            self._last_error_log = now
+            logger.warning(
+                "⚠️  État partagé indisponible, repli sur l'état local du worker",
+                extra={"operation": operation, "error": str(error) or type(error).__name__, "errors": self.errors},
+            )
+
+    async def get(self, key: str) -> Optional[bytes]:
+        self.commands += 1
+        try:
+            return await self._redis().get(self.prefix + key)
+        except Exception as e:
+            self._failed("get", e)
+            return None
+
+    async def set(self, key: str, value: bytes, ttl_s: float) -> None:
+        self.commands += 1
+        try:
+            await self._redis().set(self.prefix + key, value, px=max(1, int(ttl_s * 1000)))
+        except Exception as e:
+            self._failed("set", e)
+
+    async def delete(self, key: str) -> None:
+        self.commands += 1
+        try:
+            await self._redis().delete(self.prefix + key)
+        except Exception as e:
+            self._failed("delete", e)
+
+    async def take(self, buckets: Sequence[Bucket], hold_key: Optional[str] = None, force: bool = False) -> float:
+        self.commands += 1
+        keys = [self.prefix + key for key, _, _, _ in buckets]
+        keys.append(self.prefix + (hold_key or "_"))
+        args: list = ["1" if force else "0"]
+        for _, amount, capacity, rate in buckets:
+            args.extend((repr(float(amount)), repr(float(capacity)), repr(float(rate))))
+        try:
+            self._redis()
+            return float(await self._take_script(keys=keys, args=args))
+        except Exception as e:
+            # Sans Redis, seuls les seaux locaux du worker s'appliquent
+            self._failed("take", e)
+            return 0.0
+
+    async def hold(self, key: str, seconds: float) -> None:
+        self.commands += 1
+        try:
+            self._redis()
+            await self._hold_script(keys=[self.prefix + key], args=[repr(float(seconds))])
+        except Exception as e:
+            self._failed("hold", e)
+
+    async def aclose(self) -> None:
+        await super().aclose()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "commands": self.commands, "errors": self.errors}
+
+
+def _redis_url_from_parts() -> str:
+    """URL construite depuis REDIS_HOST / REDIS_PORT / REDIS_PASSWORD (variables du Backend API)."""
+    host = os.getenv("REDIS_HOST", "localhost")
+    port = os.getenv("REDIS_PORT", "6379")
+    password = os.getenv("REDIS_PASSWORD")
+    auth = f":{quote(password, safe='')}@" if password else ""
+    return f"redis://{auth}{host}:{port}/{os.getenv('REDIS_DB', '0')}"
@@ -0,0 +1,77 @@
+"""
+Coalescence des requêtes LLM identiques (singleflight)
+
+Pendant un pic (épidémie, démo), des soumissions identiques arrivent dans la
+même seconde. Le premier appelant lance la complétion ; les suivants ayant la
+même empreinte de prompt attendent ce même appel et reçoivent une copie du
+résultat parsé, au lieu de consommer chacun du quota Groq. L'appel tourne
+dans sa propre tâche : il survit à l'annulation de n'importe quel appelant et
+n'est abandonné que lorsque plus personne ne l'attend.
+"""
+import asyncio
+import copy
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict
+
+
+def fingerprint(**params: Any) -> str:
+    """Empreinte stable d'un appel (modèle, messages, paramètres)."""
+    payload = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """Un seul appel amont en vol par clé ; les appelants concurrents le partagent."""
+
+    def __init__(self):
+        # clé -> [tâche partagée, nombre d'appelants en attente]
+        self._inflight: Dict[str, list] = {}
+        self.issued = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        entry = self._inflight.get(key)
+        if entry is not None and entry[0] is task:
+            del self._inflight[key]
+
+    def _done(self, key: str, task: asyncio.Task) -> None:
+        self._forget(key, task)
+        # Évite "Task exception was never retrieved" quand plus personne n'attend
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._inflight.get(key)
+        if entry is None:
+            # L'appel tourne dans sa propre tâche : annuler le premier appelant
+            # (client déconnecté, flux de lot abandonné) n'annule pas les autres
+            task = asyncio.ensure_future(fn())
+            entry = self._inflight[key] = [task, 0]
+            task.add_done_callback(lambda t: self._done(key, t))
+            self.issued += 1
+        else:
+            self.coalesced += 1
+        task = entry[0]
+        entry[1] += 1
+        try:
+            result = await asyncio.shield(task)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not task.done():
+                # Plus aucun appelant : l'appel amont est abandonné
+                self._forget(key, task)
+                task.cancel()
+                self.abandoned += 1
+        return copy.deepcopy(result)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.issued + self.coalesced
+        return {
+            "issued": self.issued,
+            "coalesced": self.coalesced,
+            "abandoned": self.abandoned,
+            "in_flight": len(self._inflight),
+            "coalesced_ratio": round(self.coalesced / total, 4) if total else 0.0,
+        }
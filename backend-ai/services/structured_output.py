@@ -0,0 +1,232 @@
+"""
+Sortie JSON structurée du modèle
+
+Les complétions sont demandées en mode JSON Groq (`response_format`) ; le texte
+est parsé avec orjson puis validé par des modèles Pydantic compilés une fois
+au chargement (valeurs par défaut, coercition des types, champs inconnus
+conservés). Une sortie coupée par `max_tokens` est réparée en ne gardant que
+les valeurs complètes avant de conclure à un JSON inexploitable.
+"""
+from typing import Any, Dict, Iterable, List, Literal, Optional, Tuple
+
+import orjson
+from pydantic import BaseModel, ConfigDict, field_validator
+from pydantic_core import PydanticUseDefault
+
+# Paramètre Groq : la réponse est contrainte à un objet JSON
+JSON_MODE = {"type": "json_object"}
+
+# Champs sans lesquels une sortie réparée ne vaut pas mieux qu'une réponse de repli
+TRIAGE_REQUIRED = ("severity", "diagnosis")
+ASSISTANT_REQUIRED = ("differential_diagnosis",)
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def extract_json_text(text: str) -> str:
+    """Retire les balises ```json et le texte parasite avant l'objet."""
+    if "```json" in text:
+        text = text.split("```json")[1].split("```")[0]
+    elif "```" in text:
+        text = text.split("```")[1].split("```")[0]
+    start = text.find("{")
+    return text[start:].strip() if start >= 0 else text.strip()
+
+
+def repair_json(text: str) -> Optional[str]:
+    """
+    Coupe le texte après la dernière valeur complète et referme les objets et
+    tableaux ouverts. Une chaîne, une clé ou un nombre inachevé est abandonné
+    plutôt que complété. Retourne None si rien n'est récupérable.
+    """
+    stack: List[str] = []
+    expect_key = False
+    in_string = escape = string_is_key = False
+    cut: Optional[Tuple[int, str]] = None
+
+    def closing() -> str:
+        return "".join(_CLOSERS[c] for c in reversed(stack))
+
+    for i, c in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                in_string = False
+                if not string_is_key:
+                    cut = (i + 1, closing())
+            continue
+        if c == '"':
+            in_string = True
+            string_is_key = expect_key
+        elif c in "{[":
+            stack.append(c)
+            expect_key = c == "{"
+            cut = (i + 1, closing())
+        elif c in "}]":
+            if not stack or _CLOSERS[stack.pop()] != c:
+                break
+            if not stack:
+                # Objet complet suivi de texte parasite
+                return text[: i + 1]
+            expect_key = False
+            cut = (i + 1, closing())
+        elif c == ":":
+            expect_key = False
+        elif c == ",":
+            expect_key = bool(stack) and stack[-1] == "{"
+        elif not c.isspace() and i + 1 < len(text) and (text[i + 1] in ",}]" or text[i + 1].isspace()):
+            # Fin d'un nombre ou d'un littéral (true, false, null)
+            cut = (i + 1, closing())
+
+    if cut is None:
+        return None
+    position, closers = cut
+    return text[:position] + closers
+
+
+def loads_object(text: str, required: Iterable[str] = ()) -> Tuple[Dict[str, Any], bool]:
+    """
+    Parse un objet JSON ; retourne (objet, réparé). Lève ValueError si le texte
+    reste inexploitable après réparation ou si la réparation perd un champ de
+    `required`.
+    """
+    text = extract_json_text(text)
+    try:
+        result = orjson.loads(text)
+        repaired = False
+    except orjson.JSONDecodeError as error:
+        fixed = repair_json(text)
+        if fixed is None:
+            raise ValueError(str(error)) from error
+        try:
+            result = orjson.loads(fixed)
+        except orjson.JSONDecodeError:
+            raise ValueError(str(error)) from error
+        missing = [key for key in required if key not in result] if isinstance(result, dict) else []
+        if missing:
+            raise ValueError(f"JSON tronqué, champs perdus : {', '.join(missing)}") from error
+        repaired = True
+    if not isinstance(result, dict):
+        raise ValueError(f"Objet JSON attendu, reçu {type(result).__name__}")
+    return result, repaired
+
+
+def failed_generation(error: Exception) -> Optional[str]:
+    """Texte rejeté par le mode JSON Groq (400 json_validate_failed), à réparer."""
+    body = getattr(error, "body", None)
+    if isinstance(body, dict):
+        body = body.get("error", body)
+    if isinstance(body, dict) and body.get("code") == "json_validate_failed":
+        return body.get("failed_generation") or None
+    return None
+
+
+def dumps(value: Any) -> str:
+    """Sérialisation orjson (UTF-8, sans échappement des accents)."""
+    return orjson.dumps(value).decode()
+
+
+def _text(value: Any) -> str:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        value = str(value)
+    if not isinstance(value, str) or not value.strip():
+        raise PydanticUseDefault()
+    return value.strip()
+
+
+def _text_list(value: Any) -> List[str]:
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list):
+        raise PydanticUseDefault()
+    items = [item.strip() if isinstance(item, str) else str(item) for item in value if item is not None]
+    items = [item for item in items if item]
+    if not items:
+        raise PydanticUseDefault()
+    return items
+
+
+class _ModelOutput(BaseModel):
+    """Champs invalides ou vides -> valeur par défaut ; champs inconnus conservés."""
+
+    model_config = ConfigDict(extra="allow")
+
+
+class TriageOutput(_ModelOutput):
+    severity: Literal["low", "moderate", "high", "urgent"] = "moderate"
+    diagnosis: str = "Évaluation médicale recommandée"
+    recommendations: List[str] = ["Consulter un professionnel de santé"]
+    specialties: List[str] = ["Médecine générale"]
+    urgency_level: int = 2
+    recommended_facility_type: Literal["URGENCES", "HOPITAL", "CENTRE_SANTE", "CABINET", "PHARMACIE"] = "CENTRE_SANTE"
+    facility_reason: str = "Consultation médicale recommandée"
+
+    @field_validator("severity", mode="before")
+    @classmethod
+    def _severity(cls, value: Any) -> str:
+        value = _text(value).lower()
+        if value not in ("low", "moderate", "high", "urgent"):
+            raise PydanticUseDefault()
+        return value
+
+    @field_validator("diagnosis", "facility_reason", mode="before")
+    @classmethod
+    def _texts(cls, value: Any) -> str:
+        return _text(value)
+
+    @field_validator("recommendations", "specialties", mode="before")
+    @classmethod
+    def _lists(cls, value: Any) -> List[str]:
+        return _text_list(value)
+
+    @field_validator("urgency_level", mode="before")
+    @classmethod
+    def _urgency(cls, value: Any) -> int:
+        try:
+            level = int(value)
+        except (TypeError, ValueError):
+            raise PydanticUseDefault()
+        if isinstance(value, bool) or not 1 <= level <= 4:
+            raise PydanticUseDefault()
+        return level
+
+    @field_validator("recommended_facility_type", mode="before")
+    @classmethod
+    def _facility(cls, value: Any) -> str:
+        value = _text(value).upper().replace(" ", "_").replace("É", "E")
+        if value not in ("URGENCES", "HOPITAL", "CENTRE_SANTE", "CABINET", "PHARMACIE"):
+            raise PydanticUseDefault()
+        return value
+
+
+class AssistantOutput(_ModelOutput):
+    differential_diagnosis: List[str] = ["Analyse insuffisante - Veuillez fournir plus de détails"]
+    recommended_tests: List[str] = ["Examens cliniques standards"]
+    treatment_suggestions: List[str] = ["Consultation recommandée"]
+    red_flags: List[str] = []
+    precautions: List[str] = ["Surveillance clinique"]
+    follow_up: str = "Suivi à déterminer selon évolution"
+    confidence_level: str = "moyen"
+    confidence_label: str = "Confiance moyenne"
+    explanation: str = "Analyse basée sur les symptômes fournis"
+    disclaimer: str = "Cette analyse est une aide à la décision. Le diagnostic final reste de la responsabilité du médecin."
+
+    @field_validator(
+        "differential_diagnosis", "recommended_tests", "treatment_suggestions", "red_flags", "precautions", mode="before"
+    )
+    @classmethod
+    def _lists(cls, value: Any) -> List[str]:
+        return _text_list(value)
+
+    @field_validator("follow_up", "confidence_label", "explanation", "disclaimer", mode="before")
+    @classmethod
+    def _texts(cls, value: Any) -> str:
+        return _text(value)
+
+    @field_validator("confidence_level", mode="before")
+    @classmethod
+    def _confidence(cls, value: Any) -> str:
+        return _text(value).lower()
@@ -0,0 +1,316 @@
+"""
+Transcription audio découpée et parallèle
+
+L'enregistrement reçu (fichier temporaire « spooled » du multipart, jamais lu
+d'un bloc) est décodé en PCM mono 16 kHz : ffmpeg pour les formats compressés
+(webm/opus du navigateur), le module `wave` pour le WAV. Les enregistrements
+longs sont coupés dans les silences en segments d'environ `target_chunk_s`,
+transcrits en parallèle par le backend choisi (Groq Whisper, ou une
+implémentation locale pour les tests) puis recollés dans l'ordre. Sans
+décodeur disponible, le fichier est envoyé tel quel en un seul segment.
+"""
+import asyncio
+import io
+import logging
+import os
+import shutil
+import time
+import wave
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger("santekene.ai.transcription")
+
+SAMPLE_RATE = 16000
+_READ_BLOCK = 64 * 1024
+
+
+class AudioTooLong(Exception):
+    """Enregistrement au-delà de la durée maximale acceptée (413)."""
+
+
+class TranscriptionBackend:
+    """Interface : transcrit un segment audio encodé (WAV, ou fichier d'origine non décodé)."""
+
+    name = "base"
+
+    async def transcribe(self, audio: Union[bytes, BinaryIO], filename: str) -> str:
+        raise NotImplementedError
+
+
+class GroqWhisperBackend(TranscriptionBackend):
+    """Groq Whisper via le client AsyncGroq partagé."""
+
+    name = "groq"
+
+    def __init__(self, client: Any, model: str = "whisper-large-v3-turbo", language: Optional[str] = "fr", timeout_s: float = 60.0):
+        self.client = client
+        self.model = model
+        self.language = language
+        self.timeout_s = timeout_s
+
+    async def transcribe(self, audio: Union[bytes, BinaryIO], filename: str) -> str:
+        params = {"file": (filename, audio), "model": self.model, "temperature": 0.0, "timeout": self.timeout_s}
+        if self.language:
+            params["language"] = self.language
+        transcription = await self.client.audio.transcriptions.create(**params)
+        return getattr(transcription, "text", "") or ""
+
+
+class StubBackend(TranscriptionBackend):
+    """Remplaçant local (tests, bancs d'essai) : texte fixe ou durée du segment."""
+
+    name = "stub"
+
+    def __init__(self, text: Optional[str] = None, latency_s: float = 0.0):
+        self.text = text
+        self.latency_s = latency_s
+
+    async def transcribe(self, audio: Union[bytes, BinaryIO], filename: str) -> str:
+        if self.latency_s:
+            await asyncio.sleep(self.latency_s)
+        if self.text is not None:
+            return self.text
+        if not isinstance(audio, bytes):
+            audio.seek(0, os.SEEK_END)
+            return f"[enregistrement de {audio.tell()} octets]"
+        with wave.open(io.BytesIO(audio), "rb") as wav:
+            return f"[segment de {wav.getnframes() / wav.getframerate():.1f} s]"
+
+
+def frame_energy_db(samples: np.ndarray, frame: int) -> np.ndarray:
+    """Niveau RMS (dBFS) de chaque trame de `frame` échantillons."""
+    count = len(samples) // frame
+    if count == 0:
+        return np.zeros(0)
+    frames = samples[: count * frame].astype(np.float32).reshape(count, frame) / 32768.0
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-9))
+
+
+def split_on_silence(
+    samples: np.ndarray,
+    sample_rate: int = SAMPLE_RATE,
+    target_chunk_s: float = 30.0,
+    max_chunk_s: float = 60.0,
+    min_silence_s: float = 0.4,
+    silence_db: float = -40.0,
+    frame_s: float = 0.02,
+) -> List[Tuple[int, int]]:
+    """
+    Bornes (début, fin) en échantillons des segments. Une fois `target_chunk_s`
+    atteint, on coupe au milieu du prochain silence d'au moins `min_silence_s` ;
+    à `max_chunk_s` on coupe au silence le plus marqué du segment. Les segments
+    entièrement silencieux sont écartés.
+    """
+    frame = max(1, int(sample_rate * frame_s))
+    energy = frame_energy_db(samples, frame)
+    if len(energy) == 0:
+        return [(0, len(samples))] if len(samples) else []
+    silent = energy < silence_db
+    target, longest = int(target_chunk_s / frame_s), int(max_chunk_s / frame_s)
+    min_run = max(1, int(min_silence_s / frame_s))
+
+    cuts = [0]
+    start, run = 0, 0
+    for i, is_silent in enumerate(silent):
+        run = run + 1 if is_silent else 0
+        if i - start >= target and run >= min_run and (i + 1 == len(silent) or not silent[i + 1]):
+            cut = i - run // 2
+            cuts.append(cut)
+            start, run = cut, 0
+        elif i - start >= longest:
+            window = energy[start + target: i + 1]
+            cut = start + target + int(np.argmin(window)) if len(window) else i
+            cuts.append(cut)
+            start, run = cut, 0
+    bounds = [(a * frame, b * frame) for a, b in zip(cuts, cuts[1:] + [len(silent)])]
+    bounds[-1] = (bounds[-1][0], len(samples))
+    return [(a, b) for a, b in bounds if b > a and not silent[a // frame: max(a // frame + 1, b // frame)].all()]
+
+
+def encode_wav(samples: np.ndarray, sample_rate: int = SAMPLE_RATE) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+def _read_wav(fileobj: BinaryIO) -> Optional[Tuple[np.ndarray, int]]:
+    """PCM 16 bits mono d'un WAV (canaux moyennés) ; None si ce n'est pas un WAV exploitable."""
+    fileobj.seek(0)
+    try:
+        with wave.open(fileobj, "rb") as wav:
+            if wav.getsampwidth() != 2:
+                return None
+            channels, rate = wav.getnchannels(), wav.getframerate()
+            samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype="<i2")
+    except (wave.Error, EOFError):
+        return None
+    finally:
+        fileobj.seek(0)
+    if channels > 1:
+        samples = samples[: len(samples) // channels * channels].reshape(-1, channels).mean(axis=1).astype(np.int16)
+    return samples, rate
+
+
+class Transcriber:
+    """Décodage, découpage aux silences et transcription parallèle des segments."""
+
+    def __init__(
+        self,
+        backend: TranscriptionBackend,
+        concurrency: int = 4,
+        target_chunk_s: float = 30.0,
+        max_chunk_s: float = 60.0,
+        max_duration_s: float = 600.0,
+        silence_db: float = -40.0,
+        ffmpeg: Optional[str] = None,
+    ):
+        self.backend = backend
+        self.concurrency = concurrency
+        self.target_chunk_s = target_chunk_s
+        self.max_chunk_s = max_chunk_s
+        self.max_duration_s = max_duration_s
+        self.silence_db = silence_db
+        self.ffmpeg = ffmpeg
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.requests = 0
+        self.chunks = 0
+        self.passthrough = 0
+        self.audio_seconds = 0.0
+        self.errors = 0
+
+    @classmethod
+    def from_env(cls, client: Any) -> "Transcriber":
+        if os.getenv("TRANSCRIBE_BACKEND", "groq") == "stub":
+            backend: TranscriptionBackend = StubBackend(os.getenv("TRANSCRIBE_STUB_TEXT"))
+        else:
+            backend = GroqWhisperBackend(
+                client,
+                model=os.getenv("TRANSCRIBE_MODEL", "whisper-large-v3-turbo"),
+                language=os.getenv("TRANSCRIBE_LANGUAGE", "fr") or None,
+            )
+        return cls(
+            backend,
+            concurrency=int(os.getenv("TRANSCRIBE_CONCURRENCY", "4")),
+            target_chunk_s=float(os.getenv("TRANSCRIBE_CHUNK_S", "30")),
+            max_chunk_s=float(os.getenv("TRANSCRIBE_MAX_CHUNK_S", "60")),
+            max_duration_s=float(os.getenv("TRANSCRIBE_MAX_DURATION_S", "600")),
+            silence_db=float(os.getenv("TRANSCRIBE_SILENCE_DB", "-40")),
+            ffmpeg=shutil.which(os.getenv("FFMPEG_PATH", "ffmpeg")),
+        )
+
+    async def _decode_ffmpeg(self, fileobj: BinaryIO) -> Optional[np.ndarray]:
+        """Décode via ffmpeg (entrée lue par blocs depuis le fichier temporaire)."""
+        process = await asyncio.create_subprocess_exec(
+            self.ffmpeg, "-nostdin", "-loglevel", "error", "-i", "pipe:0",
+            "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1",
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        )
+        max_bytes = int(self.max_duration_s * SAMPLE_RATE) * 2
+
+        async def feed():
+            try:
+                fileobj.seek(0)
+                while True:
+                    block = await asyncio.to_thread(fileobj.read, _READ_BLOCK)
+                    if not block:
+                        break
+                    process.stdin.write(block)
+                    await process.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                process.stdin.close()
+
+        async def collect():
+            pcm = bytearray()
+            while True:
+                block = await process.stdout.read(_READ_BLOCK)
+                if not block:
+                    return pcm
+                pcm += block
+                if len(pcm) > max_bytes:
+                    process.kill()
+                    raise AudioTooLong(f"Enregistrement trop long (> {self.max_duration_s:.0f} s)")
+
+        try:
+            _, pcm, stderr = await asyncio.gather(feed(), collect(), process.stderr.read())
+        finally:
+            if process.returncode is None:
+                try:
+                    process.kill()
+                except ProcessLookupError:
+                    pass
+            await process.wait()
+        if process.returncode != 0 or not pcm:
+            logger.warning("⚠️  Décodage ffmpeg impossible", extra={"stderr": stderr.decode(errors="replace")[-300:]})
+            return None
+        return np.frombuffer(bytes(pcm[: len(pcm) // 2 * 2]), dtype="<i2")
+
+    async def _decode(self, fileobj: BinaryIO) -> Optional[Tuple[np.ndarray, int]]:
+        decoded = await asyncio.to_thread(_read_wav, fileobj)
+        if decoded is not None:
+            return decoded
+        if self.ffmpeg:
+            samples = await self._decode_ffmpeg(fileobj)
+            if samples is not None:
+                return samples, SAMPLE_RATE
+        return None
+
+    async def _transcribe_chunk(self, audio: Union[bytes, BinaryIO], filename: str) -> str:
+        async with self._semaphore:
+            return (await self.backend.transcribe(audio, filename)).strip()
+
+    async def transcribe(self, fileobj: BinaryIO, filename: str = "recording.webm") -> Dict[str, Any]:
+        """Transcrit l'enregistrement ; retourne texte recollé, durée et nombre de segments."""
+        self.requests += 1
+        start = time.perf_counter()
+        decoded = await self._decode(fileobj)
+        if decoded is None:
+            # Format non décodable ici : Whisper reçoit le fichier tel quel, en un seul segment
+            self.passthrough += 1
+            fileobj.seek(0)
+            segments = [(fileobj, filename)]
+            duration_s = None
+        else:
+            samples, rate = decoded
+            duration_s = len(samples) / rate
+            if duration_s > self.max_duration_s:
+                raise AudioTooLong(f"Enregistrement trop long ({duration_s:.0f} s > {self.max_duration_s:.0f} s)")
+            bounds = await asyncio.to_thread(
+                split_on_silence, samples, rate, self.target_chunk_s, self.max_chunk_s, silence_db=self.silence_db
+            )
+            segments = [(encode_wav(samples[a:b], rate), f"segment-{i:03d}.wav") for i, (a, b) in enumerate(bounds)]
+            self.audio_seconds += duration_s
+
+        try:
+            texts = await asyncio.gather(*(self._transcribe_chunk(audio, name) for audio, name in segments))
+        except Exception:
+            self.errors += 1
+            raise
+        self.chunks += len(segments)
+        return {
+            "transcription": " ".join(text for text in texts if text),
+            "duration_s": round(duration_s, 2) if duration_s is not None else None,
+            "chunks": len(segments),
+            "backend": self.backend.name,
+            "elapsed_s": round(time.perf_counter() - start, 3),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend.name,
+            "ffmpeg": bool(self.ffmpeg),
+            "concurrency": self.concurrency,
+            "requests": self.requests,
+            "chunks": self.chunks,
+            "passthrough": self.passthrough,
+            "audio_seconds": round(self.audio_seconds, 1),
+            "errors": self.errors,
+        }
@@ -0,0 +1,159 @@
+"""
+Cache des réponses de triage
+
+Clé = symptômes normalisés (accents et casse repliés, mots vides retirés,
+tokens triés) : "mal de tête et fièvre" et "Fièvre, mal de tête" partagent
+la même entrée. Dès qu'une négation ou un quantificateur est présent, l'ordre
+des mots est conservé : "pas de convulsions, beaucoup de fièvre" et
+"convulsions, pas beaucoup de fièvre" n'ont pas le même sens. Seul le JSON du modèle est stocké ; l'enrichissement
+(médecins, centres proches) reste calculé à chaque requête.
+
+Avec plusieurs workers, le cache local (L1) est doublé d'un second niveau
+dans l'état partagé (L2, Redis) : un triage calculé par un worker profite aux
+autres. Les clés du L2 sont hachées : le texte des symptômes n'y figure pas.
+"""
+import copy
+import hashlib
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import orjson
+
+from services.shared_state import SharedState
+
+# Mots vides français (déjà sans accents) qui ne changent pas le sens clinique.
+# La négation ("pas", "ne", "sans") et l'intensité ("tres") sont conservées.
+STOPWORDS = frozenset("""
+a au aux avec ce ces cet cette d dans de des du elle en est et il j je
+l la le les leur lui m ma mais me mes moi mon nous on ou par pour qu
+que qui s sa se ses son sur t ta te tes toi ton tu un une vos votre
+vous y ai as avoir suis etre
+""".split())
+
+# Négations et quantificateurs : leur portée dépend de l'ordre des mots
+ORDER_SENSITIVE = frozenset("""
+pas ne n sans aucun aucune jamais ni non rien plus peu beaucoup tres trop
+moins presque
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def fold_accents(text: str) -> str:
+    """Supprime les accents et replie la casse ("Fièvre" -> "fievre")."""
+    text = text.replace("œ", "oe").replace("Œ", "OE").replace("æ", "ae").replace("Æ", "AE")
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def normalize_symptoms(text: str) -> str:
+    """Forme canonique d'un texte de symptômes, utilisée comme clé de cache."""
+    tokens = [t for t in _TOKEN_RE.findall(fold_accents(text)) if t not in STOPWORDS]
+    if ORDER_SENSITIVE.isdisjoint(tokens):
+        return " ".join(sorted(set(tokens)))
+    return " ".join(tokens)
+
+
+class TTLCache:
+    """Cache LRU borné en taille, avec expiration (TTL) et compteurs."""
+
+    def __init__(self, max_size: int = 1024, ttl_s: float = 3600.0):
+        self.max_size = max_size
+        self.ttl_s = ttl_s
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        # Copie : l'appelant ajoute des champs (UI, enrichissement) au résultat
+        return copy.deepcopy(value)
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        self._data[key] = (time.monotonic() + self.ttl_s, copy.deepcopy(value))
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl_s": self.ttl_s,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class SharedTriageCache:
+    """TTLCache du worker (L1) devant l'état partagé entre workers (L2)."""
+
+    def __init__(self, local: TTLCache, shared: Optional[SharedState] = None, prefix: str = "triage:"):
+        self.local = local
+        self.shared = shared
+        self.prefix = prefix
+        self.shared_hits = 0
+        self.shared_misses = 0
+
+    def _shared_key(self, key: str) -> str:
+        return self.prefix + hashlib.sha256(key.encode()).hexdigest()[:32]
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self.local.get(key)
+        if value is not None or self.shared is None:
+            return value
+        raw = await self.shared.get(self._shared_key(key))
+        if raw is None:
+            self.shared_misses += 1
+            return None
+        self.shared_hits += 1
+        value = orjson.loads(raw)
+        self.local.set(key, value)
+        return value
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        self.local.set(key, value)
+        if self.shared is not None:
+            # Écriture L2 en arrière-plan : la réponse n'attend pas Redis
+            self.shared.defer(self.shared.set(self._shared_key(key), orjson.dumps(value), self.local.ttl_s))
+
+    def clear(self) -> None:
+        self.local.clear()
+
+    def __len__(self) -> int:
+        return len(self.local)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.local.stats(),
+            "shared": self.shared is not None,
+            "shared_hits": self.shared_hits,
+            "shared_misses": self.shared_misses,
+        }
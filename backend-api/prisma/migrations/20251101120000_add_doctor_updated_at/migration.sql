@@ -0,0 +1,5 @@
+-- AlterTable
+ALTER TABLE `doctor` ADD COLUMN `updatedAt` DATETIME(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3);
+
+-- CreateIndex
+CREATE INDEX `Doctor_updatedAt_idx` ON `Doctor`(`updatedAt`);
@@ -65,6 +65,68 @@ export const getRecommendedDoctors = async (req: Request, res: Response) => {
   }
 };
 
+/**
+ * Export des médecins pour l'index de spécialités du Backend IA
+ * ?since=ISO : seulement les fiches modifiées depuis (mise à jour incrémentale) ;
+ * `ids` liste toujours tous les médecins pour détecter les suppressions
+ */
+export const exportDoctors = async (req: Request, res: Response) => {
+  try {
+    const { since } = req.query;
+    const generatedAt = new Date();
+    const sinceDate = typeof since === 'string' ? new Date(since) : null;
+
+    if (sinceDate && isNaN(sinceDate.getTime())) {
+      return res.status(400).json({ error: 'Paramètre since invalide (date ISO attendue)' });
+    }
+
+    const doctors = await prisma.doctor.findMany({
+      where: sinceDate
+        ? {
+            OR: [
+              { updatedAt: { gt: sinceDate } },
+              { user: { updatedAt: { gt: sinceDate } } },
+            ],
+          }
+        : undefined,
+      include: {
+        user: {
+          select: {
+            id: true,
+            name: true,
+            email: true,
+            phone: true,
+          },
+        },
+      },
+      orderBy: { id: 'asc' },
+    });
+    const ids = await prisma.doctor.findMany({ select: { id: true }, orderBy: { id: 'asc' } });
+
+    return res.status(200).json({
+      doctors: doctors.map(doctor => ({
+        id: doctor.id,
+        userId: doctor.userId,
+        name: doctor.user.name,
+        specialty: doctor.speciality,
+        email: doctor.user.email,
+        phone: doctor.user.phone,
+        licenseNumber: doctor.licenseNumber,
+        structure: doctor.structure,
+        location: doctor.location,
+        doctorPhone: doctor.phone,
+        available: true,
+      })),
+      ids: ids.map(d => d.id),
+      incremental: Boolean(sinceDate),
+      generatedAt: generatedAt.toISOString(),
+    });
+  } catch (error) {
+    console.error('❌ Erreur export médecins:', error);
+    return res.status(500).json({ error: 'Erreur serveur' });
+  }
+};
+
 /**
  * Récupérer les hôpitaux recommandés basés sur la localisation
  */
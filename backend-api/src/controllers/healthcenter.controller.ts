@@ -1,5 +1,6 @@
 import { Request, Response } from 'express';
 import axios from 'axios';
+import { prisma } from '../services/prisma.service.js';
 
 interface OverpassElement {
   type: string;
@@ -220,3 +221,41 @@ export const getNearestHealthCenters = async (req: Request, res: Response) => {
   // Rediriger vers getAllHealthCenters qui fait la même chose
   return getAllHealthCenters(req, res);
 };
+
+/**
+ * Export complet des centres de santé géolocalisés (table HealthCenter)
+ * Utilisé par le Backend IA pour construire son index spatial local
+ */
+export const exportHealthCenters = async (req: Request, res: Response) => {
+  try {
+    const healthCenters = await prisma.healthCenter.findMany({
+      where: {
+        latitude: { not: null },
+        longitude: { not: null },
+      },
+      select: {
+        id: true,
+        name: true,
+        address: true,
+        city: true,
+        country: true,
+        latitude: true,
+        longitude: true,
+        phone: true,
+        email: true,
+        website: true,
+        updatedAt: true,
+      },
+      orderBy: { id: 'asc' },
+    });
+
+    return res.status(200).json({
+      healthCenters,
+      count: healthCenters.length,
+      generatedAt: new Date().toISOString(),
+    });
+  } catch (error) {
+    console.error('❌ Erreur export des centres de santé:', error);
+    return res.status(500).json({ error: 'Erreur serveur' });
+  }
+};
@@ -51,6 +51,20 @@ export const authorize = (...roles: string[]) => {
   };
 };
 
+// Appels de service à service (Backend IA) : jeton partagé AI_SERVICE_TOKEN
+export const protectService = (req: Request, res: Response, next: NextFunction) => {
+  const expected = process.env.AI_SERVICE_TOKEN;
+  const token = req.headers['x-service-token'];
+
+  if (!expected) {
+    return res.status(503).json({ message: 'AI_SERVICE_TOKEN non configuré sur le serveur.' });
+  }
+  if (typeof token !== 'string' || token !== expected) {
+    return res.status(401).json({ message: 'Accès non autorisé, jeton de service invalide.' });
+  }
+  next();
+};
+
 // Alias pour compatibilité
 export const authMiddleware = protect;
 
@@ -1,9 +1,12 @@
 import { Router } from 'express';
-import { getRecommendedDoctors, getRecommendedHealthCenters } from '../controllers/ai.controller.js';
-import { protect } from '../middleware/auth.middleware.js';
+import { exportDoctors, getRecommendedDoctors, getRecommendedHealthCenters } from '../controllers/ai.controller.js';
+import { protect, protectService } from '../middleware/auth.middleware.js';
 
 const router = Router();
 
+// Export pour l'index local du Backend IA (jeton de service, pas de JWT utilisateur)
+router.get('/doctors/export', protectService, exportDoctors); // GET /api/ai/doctors/export?since=2025-01-01T00:00:00Z
+
 // Toutes les routes nécessitent une authentification
 router.use(protect);
 
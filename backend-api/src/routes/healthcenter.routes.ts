@@ -1,5 +1,6 @@
 import { Router } from 'express';
 import {
+  exportHealthCenters,
   getAllHealthCenters,
   getHealthCenterById,
   getNearestHealthCenters,
@@ -10,6 +11,7 @@ const router = Router();
 // Routes publiques (pas besoin d'authentification pour voir les centres de santé)
 router.get('/', getAllHealthCenters); // GET /api/healthcenters?search=hopital&lat=12.6&lon=-8&limit=20
 router.get('/nearest', getNearestHealthCenters); // GET /api/healthcenters/nearest?lat=12.6&lon=-8&limit=10
+router.get('/export', exportHealthCenters); // GET /api/healthcenters/export (index spatial du Backend IA)
 router.get('/:id', getHealthCenterById); // GET /api/healthcenters/1
 
 export default router;
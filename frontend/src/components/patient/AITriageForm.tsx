@@ -53,6 +53,20 @@ const AITriageForm = ({ setTriageResults }: AITriageFormProps) => {
     }
   };
 
+  const appendPosition = async (formData: URLSearchParams | FormData) => {
+    if (!navigator.geolocation) return;
+    try {
+      const position = await new Promise<GeolocationPosition>((resolve, reject) => {
+        navigator.geolocation.getCurrentPosition(resolve, reject, { timeout: 5000 });
+      });
+      formData.append('latitude', position.coords.latitude.toString());
+      formData.append('longitude', position.coords.longitude.toString());
+      console.log('📍 Géolocalisation ajoutée');
+    } catch (geoError) {
+      console.log('📍 Géolocalisation non disponible:', geoError);
+    }
+  };
+
   const sendAudioForTranscription = async (audioBlob: Blob) => {
     setIsLoading(true);
     setError(null);
@@ -60,6 +74,9 @@ const AITriageForm = ({ setTriageResults }: AITriageFormProps) => {
       console.log('🎙️ Envoi audio pour transcription...');
       const formData = new FormData();
       formData.append('audio_file', audioBlob, 'recording.webm');
+      // Transcription et triage dans la même requête
+      formData.append('triage', 'true');
+      await appendPosition(formData);
 
       const aiApiUrl = process.env.NEXT_PUBLIC_AI_API_URL || 'http://localhost:8000';
       const response = await fetch(`${aiApiUrl}/api/ai/transcribe`, {
@@ -75,8 +92,12 @@ const AITriageForm = ({ setTriageResults }: AITriageFormProps) => {
       console.log('✅ Transcription reçue:', data.transcription);
       setSymptomsText(data.transcription);
       
-      // Envoyer directement pour analyse
-      await sendSymptomsForTriage(data.transcription);
+      if (data.triage) {
+        setTriageResults(data.triage);
+      } else {
+        // Envoyer directement pour analyse
+        await sendSymptomsForTriage(data.transcription);
+      }
     } catch (err: any) {
       console.error("❌ Erreur transcription:", err);
       setError(err.message || "Erreur lors de la transcription audio.");
@@ -96,18 +117,7 @@ const AITriageForm = ({ setTriageResults }: AITriageFormProps) => {
       formData.append('symptoms', text);
 
       // Ajouter la géolocalisation si disponible
-      if (navigator.geolocation) {
-        try {
-          const position = await new Promise<GeolocationPosition>((resolve, reject) => {
-            navigator.geolocation.getCurrentPosition(resolve, reject, { timeout: 5000 });
-          });
-          formData.append('latitude', position.coords.latitude.toString());
-          formData.append('longitude', position.coords.longitude.toString());
-          console.log('📍 Géolocalisation ajoutée');
-        } catch (geoError) {
-          console.log('📍 Géolocalisation non disponible:', geoError);
-        }
-      }
+      await appendPosition(formData);
 
       const aiApiUrl = process.env.NEXT_PUBLIC_AI_API_URL || 'http://localhost:8000';
       console.log('🌐 Appel API:', `${aiApiUrl}/api/ai/triage`);
@@ -20,16 +20,28 @@ class AITriageResult {
     required this.summary,
   });
 
+  // Mirrors SEVERITY_DISPLAY in backend-ai/main.py: compact responses
+  // (?compact=true) omit the derived label and color fields.
+  static const Map<String, List<String>> _severityDisplay = {
+    'urgent': ['🚨 URGENT', 'red'],
+    'high': ['⚠️  Élevé', 'orange'],
+    'moderate': ['🟡 Modéré', 'yellow'],
+    'low': ['✅ Faible', 'green'],
+  };
+
   factory AITriageResult.fromJson(Map<String, dynamic> json) {
+    final severity = json['severity'] ?? 'moderate';
+    final display = _severityDisplay[severity] ?? _severityDisplay['moderate']!;
+    final diagnosis = json['diagnosis'] ?? 'Evaluation needed';
     return AITriageResult(
-      severity: json['severity'] ?? 'moderate',
-      diagnosis: json['diagnosis'] ?? 'Evaluation needed',
+      severity: severity,
+      diagnosis: diagnosis,
       recommendations: List<String>.from(json['recommendations'] ?? []),
       specialties: List<String>.from(json['specialties'] ?? []),
       urgencyLevel: json['urgency_level'] ?? 2,
-      urgencyLabel: json['urgency_label'] ?? '🟡 Modéré',
-      urgencyColor: json['urgency_color'] ?? 'yellow',
-      summary: json['summary'] ?? 'Evaluation needed',
+      urgencyLabel: json['urgency_label'] ?? display[0],
+      urgencyColor: json['urgency_color'] ?? display[1],
+      summary: json['summary'] ?? diagnosis,
     );
   }
 }
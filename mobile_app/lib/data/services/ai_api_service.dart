@@ -10,8 +10,10 @@ class AiApiService {
 
   Future<AITriageResult> getTriage(String symptoms) async {
     try {
+      // Compact mode: canonical fields only, labels are derived locally
+      // (smaller payload on 2G/3G links)
       final response = await http.post(
-        Uri.parse('$_baseUrl/triage'),
+        Uri.parse('$_baseUrl/triage?compact=true'),
         headers: {'Content-Type': 'application/x-www-form-urlencoded'},
         body: {'symptoms': symptoms},
       );